@@ -64,6 +64,10 @@ def _format_chunks_for_prompt(chunks: List[Dict]) -> str:
     for i, chunk in enumerate(chunks, 1):
         lines.append(f"--- Chunk {i} ---")
         lines.append(f"Source: {chunk['filename']}, Page {chunk['page']}")
+        others = chunk.get("sources", [])[1:]
+        if others:
+            # Deduplicated chunk: the same text appears in other documents too
+            lines.append("Also appears in: " + "; ".join(f"{s['filename']}, Page {s['page']}" for s in others))
         lines.append(f"Type: {chunk['doc_type']}, Year: {chunk.get('year', 'N/A')}")
         lines.append(f"Relevance Score: {chunk['relevance_score']}")
         lines.append(f"Text:\n{chunk['chunk_text']}")
@@ -135,6 +139,24 @@ def _parse_intent(response_text: str) -> Tuple[str, str]:
     return intent, cleaned
 
 
+def _chunk_citation(chunk: Dict, source: Optional[Dict] = None) -> Dict:
+    """Citation for a retrieved chunk, attributed to `source` (default: the chunk's own file)."""
+    if source is None or (source["filename"] == chunk["filename"] and source["page"] == chunk["page"]):
+        document, page, drive_link = chunk["filename"], chunk["page"], chunk.get("drive_link")
+    else:
+        document, page, drive_link = source["filename"], source["page"], source.get("drive_link")
+    return {
+        "document": document,
+        "doc_type": chunk["doc_type"],
+        "year": chunk.get("year"),
+        "page": page,
+        "chunk_text": chunk["chunk_text"][:300] + "..." if len(chunk["chunk_text"]) > 300 else chunk["chunk_text"],
+        "relevance_score": chunk["relevance_score"],
+        "drive_link": drive_link,
+        "sources": chunk.get("sources", []),
+    }
+
+
 def _parse_citations(response_text: str, retrieved_chunks: List[Dict]) -> List[Dict]:
     """
     Extract [Source: filename, Page X] citations from response
@@ -154,24 +176,22 @@ def _parse_citations(response_text: str, retrieved_chunks: List[Dict]) -> List[D
         seen.add(key)
 
         best_match = None
+        best_source = None
         for chunk in retrieved_chunks:
-            if cited_filename in chunk["filename"] or chunk["filename"] in cited_filename:
-                if cited_page and str(chunk["page"]) == cited_page:
-                    best_match = chunk
-                    break
-                elif not best_match:
-                    best_match = chunk
+            # A deduplicated chunk can be cited under any of its sources
+            sources = chunk.get("sources") or [{"filename": chunk["filename"], "page": chunk["page"]}]
+            for source in sources:
+                if cited_filename in source["filename"] or source["filename"] in cited_filename:
+                    if cited_page and str(source["page"]) == cited_page:
+                        best_match, best_source = chunk, source
+                        break
+                    elif not best_match:
+                        best_match, best_source = chunk, source
+            if best_source is not None and cited_page and str(best_source["page"]) == cited_page:
+                break
 
         if best_match:
-            citations.append({
-                "document": best_match["filename"],
-                "doc_type": best_match["doc_type"],
-                "year": best_match.get("year"),
-                "page": best_match["page"],
-                "chunk_text": best_match["chunk_text"][:300] + "..." if len(best_match["chunk_text"]) > 300 else best_match["chunk_text"],
-                "relevance_score": best_match["relevance_score"],
-                "drive_link": best_match.get("drive_link"),
-            })
+            citations.append(_chunk_citation(best_match, best_source))
         else:
             citations.append({
                 "document": cited_filename,
@@ -216,7 +236,8 @@ async def process_query(
         }
 
     # 2. Retrieve
-    chunks = retriever.retrieve(query)
+    # Blocking OpenSearch / Bedrock calls: keep them off the event loop
+    chunks = await asyncio.get_running_loop().run_in_executor(None, retriever.retrieve, query)
 
     # 3. Confidence
     confidence_level, confidence_score = retriever.compute_confidence(chunks)
@@ -280,18 +301,10 @@ async def process_query(
     # If no citations were parsed but we have chunks, add them as implicit citations
     if not citations and chunks:
         for chunk in chunks[:3]:
-            citations.append({
-                "document": chunk["filename"],
-                "doc_type": chunk["doc_type"],
-                "year": chunk.get("year"),
-                "page": chunk["page"],
-                "chunk_text": chunk["chunk_text"][:300] + "..." if len(chunk["chunk_text"]) > 300 else chunk["chunk_text"],
-                "relevance_score": chunk["relevance_score"],
-                "drive_link": chunk.get("drive_link"),
-            })
+            citations.append(_chunk_citation(chunk))
 
     # 7. Output guardrails
-    retrieved_filenames = [c["filename"] for c in chunks]
+    retrieved_filenames = [s["filename"] for c in chunks for s in c.get("sources") or [c]]
     output_guard = guardrails.check_output(cleaned_answer, retrieved_filenames)
 
     # Add low-confidence disclaimer
@@ -0,0 +1,252 @@
+"""
+Ingestion throughput benchmark.
+
+Generates a synthetic PDF / DOCX / PPTX corpus, then runs a full
+ingestion.run_ingestion over it (the same staged pipeline production uses) with
+Bedrock and OpenSearch replaced by the fake_aws stand-ins (configurable latency),
+and reports docs/sec, chunks/sec, per-stage pipeline stats and peak RSS.
+
+    python benchmark.py --docs 200 --mix pdf:2,docx:1,pptx:1 --pages 20
+    python benchmark.py --docs 50 --embed-latency-ms 150 --json > run.json
+
+Shared boilerplate pages (--boilerplate) exercise near-duplicate collapsing.
+Compare runs on the same machine with the same arguments (and --seed).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import logging
+import resource
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+from docx import Document as DocxDocument
+from pptx import Presentation
+
+import config
+import fake_aws
+import indexer
+import ingestion
+
+_WORDS = (
+    "client delivered manufacturing execution system rollout plant automation digital twin "
+    "predictive maintenance supply chain visibility analytics dashboard integration cloud "
+    "migration ERP SAP modernization outcome reduced downtime improved throughput yield "
+    "quality compliance traceability pilot phase scale program stakeholder workshop "
+    "roadmap architecture platform vendor partnership pricing proposal scope timeline "
+    "milestone deliverable savings revenue growth efficiency benchmark KPI operations "
+    "retail banking healthcare logistics energy utilities automotive pharma aerospace"
+).split()
+_REGIONS = ["Chennai", "Bangalore", "Europe", "North America", "Middle East", "APAC"]
+_DOC_TYPES = ["Case Study", "Proposal", "Sales Deck", "Capability Brief"]
+
+
+# ── Synthetic corpus ────────────────────────────────────────────────────────
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    sentences, left = [], words
+    while left > 0:
+        n = min(left, rng.randint(8, 18))
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(n))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        left -= n
+    return " ".join(sentences)
+
+
+def _page_texts(rng: random.Random, pages: int, words: int, boilerplate: List[str], share: float) -> List[str]:
+    return [
+        rng.choice(boilerplate) if boilerplate and rng.random() < share else _paragraph(rng, words)
+        for _ in range(pages)
+    ]
+
+
+def _write_pdf(path: str, pages: List[str]):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, page.rect.width - 40, page.rect.height - 40), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def _write_docx(path: str, pages: List[str]):
+    doc = DocxDocument()
+    for text in pages:
+        words = text.split()
+        for i in range(0, len(words), 60):
+            doc.add_paragraph(" ".join(words[i:i + 60]))
+    doc.save(path)
+
+
+def _write_pptx(path: str, pages: List[str]):
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # title + content
+    for n, text in enumerate(pages, 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {n}"
+        words = text.split()
+        slide.placeholders[1].text = "\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+    prs.save(path)
+
+
+_WRITERS = {"pdf": _write_pdf, "docx": _write_docx, "pptx": _write_pptx}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'pdf:2,docx:1' → normalized weights per extension."""
+    weights = {}
+    for part in mix.split(","):
+        ext, _, weight = part.strip().partition(":")
+        if ext not in _WRITERS:
+            raise ValueError(f"Unknown format '{ext}' in --mix (expected pdf, docx, pptx)")
+        weights[ext] = float(weight or 1)
+    total = sum(weights.values())
+    return {ext: w / total for ext, w in weights.items()}
+
+
+def generate_corpus(out_dir: str, docs: int, mix: Dict[str, float], pages: int, words: int,
+                    boilerplate: float, seed: int) -> List[str]:
+    """Write `docs` synthetic documents into out_dir; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    pool = [_paragraph(rng, words) for _ in range(max(3, pages // 3))] if boilerplate > 0 else []
+    formats = list(mix)
+    paths = []
+    for i in range(docs):
+        ext = rng.choices(formats, weights=[mix[f] for f in formats])[0]
+        n_pages = max(1, int(rng.gauss(pages, pages / 4)))
+        name = f"{rng.choice(_DOC_TYPES)} {i:05d} {rng.choice(_REGIONS)} {rng.randint(2019, 2025)}.{ext}"
+        path = os.path.join(out_dir, name)
+        _WRITERS[ext](path, _page_texts(rng, n_pages, words, pool, boilerplate))
+        paths.append(path)
+    return paths
+
+
+# ── Run ─────────────────────────────────────────────────────────────────────
+
+def _peak_rss_mb() -> Tuple[float, float]:
+    """Peak resident set size of this process and of its (waited-for) children, in MB."""
+    per_mb = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / per_mb, 1), round(children / per_mb, 1)
+
+
+def _use_state_dir(state_dir: str):
+    """Keep the run's manifest, sync state, caches and downloads out of the real .state/."""
+    config.MANIFEST_PATH = os.path.join(state_dir, "manifest.json")
+    config.DRIVE_SYNC_STATE_PATH = os.path.join(state_dir, "drive_sync.json")
+    config.DOWNLOAD_TMP_DIR = os.path.join(state_dir, "downloads")
+    config.EMBED_CACHE_PATH = os.path.join(state_dir, "embeddings.sqlite")
+    config.EXTRACT_CACHE_PATH = os.path.join(state_dir, "extractions.sqlite")
+
+
+def run(corpus_dir: str, embed_latency_ms: float, bulk_latency_ms: float, jitter: float,
+        state_dir: Optional[str] = None) -> Dict:
+    """Full ingestion run (ingestion.run_ingestion) over corpus_dir against local stand-ins; returns the report."""
+    bedrock = fake_aws.FakeBedrockRuntime(latency_ms=embed_latency_ms, jitter=jitter)
+    opensearch = fake_aws.FakeOpenSearch(bulk_latency_ms=bulk_latency_ms, jitter=jitter)
+    indexer.use_clients(opensearch=opensearch, bedrock=bedrock)
+    config.GOOGLE_DRIVE_FOLDER_IDS = []  # always the local corpus, even with Drive credentials around
+    config.LOCAL_DOCS_DIR = corpus_dir
+
+    _use_state_dir(state_dir or tempfile.mkdtemp(prefix="ingest-bench-state-"))
+    try:
+        start = time.perf_counter()
+        result = ingestion.run_ingestion(full=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        if not state_dir:
+            shutil.rmtree(os.path.dirname(config.MANIFEST_PATH), ignore_errors=True)
+
+    details = result["details"]
+    live = indexer.current_generation()
+    indexed = len(opensearch.docs.get(live, {})) if live else 0
+    chunks = sum(d["chunks"] for d in details if d["status"] == "indexed")
+    rss_self, rss_children = _peak_rss_mb()
+    return {
+        "documents": len(details),
+        "documents_without_text": sum(1 for d in details if d["status"] == "no_text"),
+        "documents_failed": sum(1 for d in details if d["status"].startswith("error")),
+        "chunks": chunks,
+        "indexed_chunks": indexed,
+        "deduplicated_chunks": result["changes"].get("deduplicated_chunks", 0),
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_second": round(len(details) / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0,
+        "stages": result["stages"],
+        "bedrock": {"calls": bedrock.calls, "latency_seconds": round(bedrock.latency_seconds, 2)},
+        "opensearch": {
+            "bulk_requests": opensearch.calls["bulk"],
+            "bulk_mb": round(opensearch.bulk_bytes / (1024 * 1024), 2),
+            "latency_seconds": round(opensearch.latency_seconds, 2),
+        },
+        "peak_rss_mb": {"self": rss_self, "children": rss_children},
+    }
+
+
+def _print_report(report: Dict, settings: Dict):
+    print(f"\nCorpus: {report['documents']} docs ({settings['mix']}), {report['chunks']} chunks "
+          f"({report['deduplicated_chunks']} folded) -> {report['indexed_chunks']} indexed, "
+          f"{report['documents_failed']} failed")
+    print(f"Latency: embed {settings['embed_latency_ms']} ms/call, bulk {settings['bulk_latency_ms']} ms/request\n")
+    print(f"  {'stage':<10}{'workers':>8}{'docs/s':>9}{'busy s':>9}{'starved s':>11}{'blocked s':>11}")
+    for stage in report["stages"]:
+        print(f"  {stage['stage']:<10}{stage['workers']:>8}{stage['per_second']:>9.2f}{stage['busy_seconds']:>9.2f}"
+              f"{stage['starved_seconds']:>11.2f}{stage['backpressure_seconds']:>11.2f}")
+    print(f"  {'total':<10}{report['elapsed_seconds']:>8.2f} s\n")
+    print(f"  docs/sec     {report['docs_per_second']:>10.2f}")
+    print(f"  chunks/sec   {report['chunks_per_second']:>10.2f}")
+    print(f"  Titan calls  {report['bedrock']['calls']:>10d}")
+    print(f"  bulk reqs    {report['opensearch']['bulk_requests']:>10d}  ({report['opensearch']['bulk_mb']} MB)")
+    print(f"  peak RSS     {report['peak_rss_mb']['self']:>10.1f} MB  (children {report['peak_rss_mb']['children']} MB)")
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--docs", type=int, default=50, help="documents to generate")
+    parser.add_argument("--mix", default="pdf:2,docx:1,pptx:1", help="format weights, e.g. pdf:2,docx:1,pptx:1")
+    parser.add_argument("--pages", type=int, default=12, help="mean pages (PDF/DOCX) or slides (PPTX) per document")
+    parser.add_argument("--words", type=int, default=250, help="words per page")
+    parser.add_argument("--boilerplate", type=float, default=0.15,
+                        help="share of pages drawn from a shared pool of repeated pages")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--embed-latency-ms", type=float, default=80, help="simulated Titan latency per call")
+    parser.add_argument("--bulk-latency-ms", type=float, default=40, help="simulated OpenSearch _bulk latency")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± fraction applied to simulated latencies")
+    parser.add_argument("--corpus-dir", help="where to write the corpus (kept); default: a temp dir, removed")
+    parser.add_argument("--state-dir", help="manifest / cache dir (kept, so a rerun measures warm caches); "
+                                            "default: a temp dir, removed")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="ingest-bench-")
+    try:
+        t0 = time.perf_counter()
+        generate_corpus(
+            corpus_dir, args.docs, parse_mix(args.mix), args.pages, args.words, args.boilerplate, args.seed,
+        )
+        generated = time.perf_counter() - t0
+        report = run(corpus_dir, args.embed_latency_ms, args.bulk_latency_ms, args.jitter, args.state_dir)
+        report["generate_seconds"] = round(generated, 2)
+        report["settings"] = {k: v for k, v in vars(args).items() if k != "json"}
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, report["settings"])
+    return report
+
+
+if __name__ == "__main__":
+    main()
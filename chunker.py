@@ -2,47 +2,27 @@
 Text chunking with metadata extraction.
 
 Chunk size: 500-700 tokens (~600 target) with 100-token overlap.
-Uses sentence boundaries.
+Uses sentence boundaries; sentences that are too long on their own (slides,
+bullet lists) fall back to line, clause and token-window splits, so no chunk
+exceeds MAX_CHUNK_TOKENS or MAX_CHUNK_CHARS.
 """
 import re
 import logging
 import hashlib
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import tiktoken
 
 import config
+import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
 _enc = tiktoken.get_encoding("cl100k_base")
 
 # ── Region keyword map ──────────────────────────────────────────────────────
-REGION_KEYWORDS = {
-    "south india": [
-        "tamil nadu", "chennai", "karnataka", "bangalore", "bengaluru",
-        "kerala", "kochi", "thiruvananthapuram", "andhra pradesh",
-        "hyderabad", "telangana", "south india", "coimbatore", "mysore",
-        "madurai", "visakhapatnam", "vijayawada",
-    ],
-    "north india": [
-        "delhi", "ncr", "uttar pradesh", "haryana", "gurgaon", "gurugram",
-        "noida", "punjab", "rajasthan", "north india", "lucknow", "jaipur",
-        "chandigarh",
-    ],
-    "west india": [
-        "mumbai", "maharashtra", "pune", "gujarat", "ahmedabad",
-        "surat", "goa", "west india",
-    ],
-    "east india": [
-        "kolkata", "west bengal", "odisha", "bhubaneswar",
-        "bihar", "jharkhand", "east india",
-    ],
-}
-
-
-def _count_tokens(text: str) -> int:
-    return len(_enc.encode(text))
+# Re-exported for callers that still read the vocabulary from here
+REGION_KEYWORDS = keyword_matcher.REGION_KEYWORDS
 
 
 def _split_sentences(text: str) -> List[str]:
@@ -51,28 +31,71 @@ def _split_sentences(text: str) -> List[str]:
     return [s.strip() for s in parts if s.strip()]
 
 
+# Fallback splitters for "sentences" over the piece caps, tried in order:
+# line breaks (slides, bullet lists), then clause punctuation / inline bullets
+_FALLBACK_SPLITTERS = [
+    re.compile(r'\s*\n\s*'),
+    re.compile(r'(?<=[;:,])\s+|\s+(?=[•▪●◦\-–—]\s)'),
+]
+
+
+def _piece_caps() -> Tuple[int, int]:
+    """
+    Max (tokens, chars) for one sentence piece. A chunk is the carried-over
+    overlap plus pieces, so pieces leave room for the overlap under the hard cap.
+    """
+    max_tokens = min(config.CHUNK_SIZE_TOKENS, config.MAX_CHUNK_TOKENS - config.CHUNK_OVERLAP_TOKENS)
+    return max(1, max_tokens), config.MAX_CHUNK_CHARS
+
+
+def _fit_sentences(sentences: List[str]) -> List[Tuple[str, int]]:
+    """
+    Tokenize sentences once (batched) and split any that exceed the piece caps.
+    Returns (piece, token count) pairs in reading order.
+    """
+    max_tokens, max_chars = _piece_caps()
+    pieces: List[Tuple[str, int]] = []
+    for sentence, tokens in zip(sentences, _enc.encode_batch(sentences)):
+        if len(tokens) <= max_tokens and len(sentence) <= max_chars:
+            pieces.append((sentence, len(tokens)))
+        else:
+            pieces.extend(_split_oversized(sentence, tokens, 0))
+    return pieces
+
+
+def _split_oversized(text: str, tokens: List[int], level: int) -> List[Tuple[str, int]]:
+    """Split an oversized piece on lines, then clauses, then fixed token windows."""
+    max_tokens, max_chars = _piece_caps()
+    for i in range(level, len(_FALLBACK_SPLITTERS)):
+        parts = [p.strip() for p in _FALLBACK_SPLITTERS[i].split(text) if p.strip()]
+        if len(parts) < 2:
+            continue
+        pieces: List[Tuple[str, int]] = []
+        for part, part_tokens in zip(parts, _enc.encode_batch(parts)):
+            if len(part_tokens) <= max_tokens and len(part) <= max_chars:
+                pieces.append((part, len(part_tokens)))
+            else:
+                pieces.extend(_split_oversized(part, part_tokens, i + 1))
+        return pieces
+    return _window_split(tokens)
+
+
+def _window_split(tokens: List[int]) -> List[Tuple[str, int]]:
+    """Last resort: fixed token windows, each also cut to the character cap."""
+    max_tokens, max_chars = _piece_caps()
+    texts: List[str] = []
+    for i in range(0, len(tokens), max_tokens):
+        window = _enc.decode(tokens[i:i + max_tokens]).strip()
+        texts.extend(t for t in (window[j:j + max_chars].strip() for j in range(0, len(window), max_chars)) if t)
+    return [(t, len(toks)) for t, toks in zip(texts, _enc.encode_batch(texts))]
+
+
 def _extract_doc_type(filename: str) -> str:
     """Classify document type from filename keywords."""
     fn = filename.lower()
-    if any(kw in fn for kw in ("case study", "case-study", "case_study", "case studies",
-                                "success story", "success stories", " ss ", "ss_",
-                                "gadgeon ss", "gadgeon_ss")):
-        return "case_study"
-    if any(kw in fn for kw in ("whitepaper", "white paper", "white-paper")):
-        return "whitepaper"
-    if any(kw in fn for kw in ("proposal",)):
-        return "proposal"
-    if any(kw in fn for kw in ("pitch", "deck")):
-        return "pitch_deck"
-    if any(kw in fn for kw in ("offering", "services", "overview", "corp overview",
-                                "engineering stack", "delivery model",
-                                "execution", "governance", "engineering",
-                                "monitoring", "analytics", "platform",
-                                "medical device", "e-mobility", "edge",
-                                "remote", "radar", "robotic", "drone",
-                                "pharma", "telehealth", "iot", "ai",
-                                "product engineering")):
-        return "service_presentation"
+    doc_type = keyword_matcher.FILENAME_DOC_TYPE_MATCHER.first(fn)
+    if doc_type:
+        return doc_type
     # Check file extension for whitepapers (docx files are typically whitepapers in this corpus)
     if fn.endswith(".docx"):
         return "whitepaper"
@@ -91,28 +114,24 @@ def _extract_year(filename: str, text_prefix: str = "") -> Optional[str]:
 
 
 def _extract_regions(text: str) -> List[str]:
-    """Scan text for region identifiers."""
-    lower = text.lower()
-    found = set()
-    for region, keywords in REGION_KEYWORDS.items():
-        for kw in keywords:
-            if kw in lower:
-                found.add(region)
-                break
-    return sorted(found)
-
-
-def chunk_document(doc: Dict) -> List[Dict]:
+    """Scan text for region identifiers (whole words, one pass)."""
+    return sorted(keyword_matcher.REGION_MATCHER.labels(text))
+
+
+def chunk_document(doc: Dict, file_id: Optional[str] = None) -> List[Dict]:
     """
     Chunk a document extracted by extractor.py.
 
     Args:
         doc: {"filename": str, "pages": [{"page": int, "text": str}], "full_text": str}
+        file_id: source file id (Drive id / local path); chunk ids are derived from it,
+            so same-named files in different folders never share ids. Defaults to the filename.
 
     Returns:
         List of chunk dicts with metadata.
     """
     filename = doc["filename"]
+    file_id = file_id or filename
     pages = doc["pages"]
     full_text = doc["full_text"]
 
@@ -126,63 +145,111 @@ def chunk_document(doc: Dict) -> List[Dict]:
         page_num = page_info["page"]
         page_text = page_info["text"]
         sentences = _split_sentences(page_text)
+        if not sentences:
+            continue
 
-        current_chunk_sentences: List[str] = []
-        current_tokens = 0
+        # Tokenize every sentence of the page once (overlap reuses these counts);
+        # oversized sentences come back already split under the caps
+        pieces = _fit_sentences(sentences)
 
-        for sentence in sentences:
-            sent_tokens = _count_tokens(sentence)
-
-            if current_tokens + sent_tokens > config.CHUNK_SIZE_TOKENS and current_chunk_sentences:
+        current_chunk: List[Tuple[str, int]] = []  # (sentence, token count)
+        current_tokens = 0
+        current_chars = 0  # length of " ".join(current_chunk)
+
+        for sentence, sent_tokens in pieces:
+            too_long = (
+                current_tokens + sent_tokens > config.CHUNK_SIZE_TOKENS
+                or current_chars + 1 + len(sentence) > config.MAX_CHUNK_CHARS
+            )
+            if too_long and current_chunk:
                 # Emit chunk
-                chunk_text = " ".join(current_chunk_sentences)
-                chunk_id = _make_chunk_id(filename, page_num, len(chunks))
-                chunks.append({
-                    "chunk_id": chunk_id,
-                    "chunk_text": chunk_text,
-                    "filename": filename,
-                    "doc_type": doc_type,
-                    "year": year,
-                    "page": page_num,
-                    "regions": regions,
-                    "token_count": _count_tokens(chunk_text),
-                })
+                chunks.append(_make_chunk(
+                    " ".join(s for s, _ in current_chunk), file_id, filename, page_num, len(chunks),
+                    doc_type, year, regions,
+                ))
 
                 # Overlap: keep last sentences up to CHUNK_OVERLAP_TOKENS
-                overlap_sentences: List[str] = []
+                overlap: List[Tuple[str, int]] = []
                 overlap_tokens = 0
-                for s in reversed(current_chunk_sentences):
-                    st = _count_tokens(s)
+                for s, st in reversed(current_chunk):
                     if overlap_tokens + st > config.CHUNK_OVERLAP_TOKENS:
                         break
-                    overlap_sentences.insert(0, s)
+                    overlap.insert(0, (s, st))
                     overlap_tokens += st
 
-                current_chunk_sentences = overlap_sentences
+                # Never let the carried-over overlap push the next chunk past the char cap
+                while overlap and _joined_len(overlap) + 1 + len(sentence) > config.MAX_CHUNK_CHARS:
+                    overlap_tokens -= overlap.pop(0)[1]
+
+                current_chunk = overlap
                 current_tokens = overlap_tokens
+                current_chars = _joined_len(overlap)
 
-            current_chunk_sentences.append(sentence)
+            current_chars += len(sentence) + (1 if current_chunk else 0)
+            current_chunk.append((sentence, sent_tokens))
             current_tokens += sent_tokens
 
         # Emit remaining text
-        if current_chunk_sentences:
-            chunk_text = " ".join(current_chunk_sentences)
-            chunk_id = _make_chunk_id(filename, page_num, len(chunks))
-            chunks.append({
-                "chunk_id": chunk_id,
-                "chunk_text": chunk_text,
-                "filename": filename,
-                "doc_type": doc_type,
-                "year": year,
-                "page": page_num,
-                "regions": regions,
-                "token_count": _count_tokens(chunk_text),
-            })
+        if current_chunk:
+            chunks.append(_make_chunk(
+                " ".join(s for s, _ in current_chunk), file_id, filename, page_num, len(chunks),
+                doc_type, year, regions,
+            ))
+
+    # Joined text tokenizes differently from its sentences, so count it exactly,
+    # in one batched call for the whole document
+    for chunk, tokens in zip(chunks, _enc.encode_batch([c["chunk_text"] for c in chunks])):
+        chunk["token_count"] = len(tokens)
+    chunks = _enforce_token_cap(chunks)
 
     logger.info("Chunked %s → %d chunks (type=%s, year=%s)", filename, len(chunks), doc_type, year)
     return chunks
 
 
-def _make_chunk_id(filename: str, page: int, idx: int) -> str:
-    raw = f"{filename}::p{page}::c{idx}"
+def _joined_len(pieces: List[Tuple[str, int]]) -> int:
+    return sum(len(s) for s, _ in pieces) + max(0, len(pieces) - 1)
+
+
+def _enforce_token_cap(chunks: List[Dict]) -> List[Dict]:
+    """
+    Safety net for the rare chunk whose joined text tokenizes past
+    MAX_CHUNK_TOKENS: re-split it into token windows and renumber chunk ids.
+    """
+    if all(c["token_count"] <= config.MAX_CHUNK_TOKENS for c in chunks):
+        return chunks
+
+    capped: List[Dict] = []
+    for chunk in chunks:
+        if chunk["token_count"] <= config.MAX_CHUNK_TOKENS:
+            parts = [(chunk["chunk_text"], chunk["token_count"])]
+        else:
+            parts = _window_split(_enc.encode(chunk["chunk_text"]))
+        for text, count in parts:
+            new = _make_chunk(
+                text, chunk["file_id"], chunk["filename"], chunk["page"], len(capped),
+                chunk["doc_type"], chunk["year"], chunk["regions"],
+            )
+            new["token_count"] = count
+            capped.append(new)
+    return capped
+
+
+def _make_chunk(chunk_text: str, file_id: str, filename: str, page: int, idx: int,
+                doc_type: str, year: Optional[str], regions: List[str]) -> Dict:
+    """Build a chunk dict; token_count is filled in by chunk_document."""
+    return {
+        "chunk_id": _make_chunk_id(file_id, page, idx),
+        "chunk_text": chunk_text,
+        "file_id": file_id,
+        "filename": filename,
+        "doc_type": doc_type,
+        "year": year,
+        "page": page,
+        "regions": regions,
+        "token_count": 0,
+    }
+
+
+def _make_chunk_id(file_id: str, page: int, idx: int) -> str:
+    raw = f"{file_id}::p{page}::c{idx}"
     return hashlib.sha256(raw.encode()).hexdigest()[:16]
@@ -20,6 +20,10 @@ if _env_file.exists():
 GOOGLE_DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID", "1_1Fu2G7b4FXIoRUW1Nvo04kifbpdgYh2")
 GOOGLE_DRIVE_FOLDER_IDS = [fid.strip() for fid in GOOGLE_DRIVE_FOLDER_ID.split(",") if fid.strip()]
 SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE", "service_account.json")
+DRIVE_CRAWL_WORKERS = int(os.getenv("DRIVE_CRAWL_WORKERS", "8"))        # concurrent listing requests
+DRIVE_PARENTS_PER_QUERY = int(os.getenv("DRIVE_PARENTS_PER_QUERY", "20"))  # folders per files.list query
+DRIVE_PAGE_SIZE = 1000                                                  # files.list maximum
+DRIVE_MAX_RETRIES = int(os.getenv("DRIVE_MAX_RETRIES", "6"))            # backoff on 429 / 5xx / rate-limit 403
 
 # AWS credentials
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
@@ -33,21 +37,58 @@ BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "us.anthropic.claude-3-5-sonnet
 # Amazon Bedrock (Embeddings)
 BEDROCK_EMBED_MODEL_ID = os.getenv("BEDROCK_EMBED_MODEL_ID", "amazon.titan-embed-text-v2:0")
 EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "16"))     # upper bound for the AIMD limiter
+EMBED_INITIAL_CONCURRENCY = int(os.getenv("EMBED_INITIAL_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = 6                  # per text, on ThrottlingException & co.
+# Two-tier mode: kNN runs on compact 256/512-d vectors, the top candidates are rescored
+# exactly against the full EMBEDDING_DIMENSIONS vectors (0 = search on full vectors)
+EMBEDDING_SEARCH_DIMENSIONS = int(os.getenv("EMBEDDING_SEARCH_DIMENSIONS", "0"))
+EMBEDDING_RESCORE_CANDIDATES = int(os.getenv("EMBEDDING_RESCORE_CANDIDATES", "30"))
 
 # Amazon OpenSearch Serverless
 OPENSEARCH_ENDPOINT = os.getenv("OPENSEARCH_ENDPOINT", "")
-OPENSEARCH_INDEX_NAME = os.getenv("OPENSEARCH_INDEX_NAME", "sales-copilot")
+OPENSEARCH_INDEX_NAME = os.getenv("OPENSEARCH_INDEX_NAME", "sales-copilot")  # alias over versioned generations
+INDEX_GENERATIONS_TO_KEEP = 2        # live + previous (for rollback)
+INDEX_READY_TIMEOUT_SECONDS = 60
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(5 * 1024 * 1024)))  # serialized size per _bulk request
+BULK_MAX_DOCS = 500
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))            # _bulk requests in flight
+BULK_MAX_RETRIES = 5                   # per document, on 429 / 502-504
+
+# kNN index (faiss HNSW). Mapping settings apply to new generations: rebuild with /ingest?full=true
+KNN_ENCODER = os.getenv("KNN_ENCODER", "none").lower()                 # none | fp16 | byte (scalar quantization)
+KNN_HNSW_M = int(os.getenv("KNN_HNSW_M", "16"))                         # graph degree: recall vs memory
+KNN_EF_CONSTRUCTION = int(os.getenv("KNN_EF_CONSTRUCTION", "128"))      # build-time candidate list
+KNN_EF_SEARCH = int(os.getenv("KNN_EF_SEARCH", "0"))                    # query-time candidate list (0 = engine default)
+KNN_OVERSAMPLE = float(os.getenv("KNN_OVERSAMPLE", "1.0"))              # ask kNN for top_k × this, keep top_k
+
+# Extraction
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "150"))  # split PDFs with more pages
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", str(os.cpu_count() or 1)))     # page ranges per PDF
 
 # Chunking
 CHUNK_SIZE_TOKENS = 600        # target 500-700
 CHUNK_OVERLAP_TOKENS = 100
-MAX_CHUNK_CHARS = 3000         # safety cap
+MAX_CHUNK_TOKENS = 800         # hard cap (Titan v2 accepts 8k, but prompts add up)
+MAX_CHUNK_CHARS = 3000         # hard cap
+
+# Near-duplicate chunk collapsing before embedding (MinHash + LSH)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))   # estimated Jaccard of word shingles
+DEDUP_NUM_PERM = 128                                           # MinHash signature length
+DEDUP_SHINGLE_WORDS = 5
 
 # Retrieval
 VECTOR_TOP_K = 15
 BM25_TOP_K = 15
 FINAL_TOP_K = 5
 RRF_K = 60
+# Send the kNN and BM25 searches as one _msearch round trip (unfiltered fallbacks go
+# in a second one, only when needed); false runs them as separate concurrent searches
+RETRIEVE_MSEARCH = os.getenv("RETRIEVE_MSEARCH", "true").lower() == "true"
+# Separate searches: start the unfiltered fallbacks with the filtered ones (lower tail latency,
+# more OpenSearch queries) instead of once a filtered leg comes back empty
+RETRIEVE_EAGER_FALLBACK = os.getenv("RETRIEVE_EAGER_FALLBACK", "false").lower() == "true"
 
 # Confidence thresholds
 HIGH_CONFIDENCE_THRESHOLD = 0.80
@@ -62,6 +103,45 @@ MAX_QUERY_LENGTH = 1000
 
 # Concurrency
 MAX_CONCURRENT_LLM_CALLS = 5
+INGEST_DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "8"))   # threads (network-bound)
+INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", str(os.cpu_count() or 1)))  # 0 = inline
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))       # documents embedded concurrently
+INGEST_INDEX_WORKERS = int(os.getenv("INGEST_INDEX_WORKERS", "2"))       # documents bulk-indexed concurrently
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))             # max documents buffered between stages
+INGEST_JOB_HISTORY = 20                                                 # finished jobs kept for GET /ingest/{job_id}
 
 # Local fallback
 LOCAL_DOCS_DIR = "local_docs"
+LOCAL_WATCH_ENABLED = os.getenv("LOCAL_WATCH_ENABLED", "false").lower() == "true"  # auto-ingest on change
+LOCAL_WATCH_DEBOUNCE_SECONDS = float(os.getenv("LOCAL_WATCH_DEBOUNCE_SECONDS", "2"))  # quiet period before a run
+LOCAL_WATCH_POLL_SECONDS = float(os.getenv("LOCAL_WATCH_POLL_SECONDS", "2"))          # polling fallback interval
+
+# Ingestion state (manifest of indexed files for incremental re-ingest)
+STATE_DIR = os.getenv("STATE_DIR", ".state")
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", os.path.join(STATE_DIR, "manifest.json"))
+MANIFEST_CHECKPOINT_SECONDS = 10   # save progress during long runs
+
+# Drive delta sync (Changes API cursor + last listing, instead of a crawl per run)
+DRIVE_DELTA_SYNC = os.getenv("DRIVE_DELTA_SYNC", "true").lower() == "true"
+DRIVE_SYNC_STATE_PATH = os.getenv("DRIVE_SYNC_STATE_PATH", os.path.join(STATE_DIR, "drive_sync.json"))
+
+# Downloads (streamed to disk so large files never sit in memory)
+DOWNLOAD_TMP_DIR = os.getenv("DOWNLOAD_TMP_DIR", os.path.join(STATE_DIR, "downloads"))
+DOWNLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Embedding cache (content-addressed, survives reindexing)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(STATE_DIR, "embeddings.sqlite"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "2048"))
+
+# Extraction cache (extracted pages by file content hash, so re-chunking skips parsing)
+EXTRACT_CACHE_ENABLED = os.getenv("EXTRACT_CACHE_ENABLED", "true").lower() == "true"
+EXTRACT_CACHE_PATH = os.getenv("EXTRACT_CACHE_PATH", os.path.join(STATE_DIR, "extractions.sqlite"))
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "1024"))
+
+# Query embedding cache (repeated questions skip the Titan round trip): in-process
+# LRU with a TTL, plus an optional SQLite tier shared by the workers on a host
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "86400"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")  # e.g. .state/query_embeddings.sqlite
@@ -0,0 +1,241 @@
+"""
+Near-duplicate chunk detection (MinHash + LSH).
+
+Decks reuse the same boilerplate slides across many files. Before embedding,
+chunks whose word-shingle Jaccard similarity reaches config.DEDUP_THRESHOLD (and
+whose doc_type / year / regions match) are collapsed into one canonical chunk;
+the canonical keeps a `sources` list with the (filename, page) of every copy so
+citations can still point at all of them.
+
+Signatures use one-permutation MinHash (each shingle hashed once into one of
+DEDUP_NUM_PERM bins, empty bins densified from their neighbour): O(shingles) per
+chunk instead of O(shingles × permutations), which keeps it cheap in pure Python.
+"""
+import re
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+_MAX64 = (1 << 64) - 1
+
+Signature = Tuple[int, ...]
+
+
+# ── Signatures ──────────────────────────────────────────────────────────────
+
+def _shingles(text: str) -> Set[str]:
+    words = _TOKEN.findall(text.lower())
+    n = config.DEDUP_SHINGLE_WORDS
+    if len(words) <= n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def signature(text: str) -> Signature:
+    """One-permutation MinHash signature of the text's word shingles."""
+    bins = config.DEDUP_NUM_PERM
+    sig = [_MAX64] * bins
+    for shingle in _shingles(text):
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        b, value = h % bins, h // bins
+        if value < sig[b]:
+            sig[b] = value
+
+    # Densify: an empty bin borrows the next non-empty bin's value (offset by the
+    # distance, so borrowed values don't collide with real ones)
+    if _MAX64 in sig and any(v != _MAX64 for v in sig):
+        dense = list(sig)
+        for i in range(bins):
+            if sig[i] != _MAX64:
+                continue
+            for step in range(1, bins):
+                v = sig[(i + step) % bins]
+                if v != _MAX64:
+                    dense[i] = v + step * _MAX64
+                    break
+        sig = dense
+    return tuple(sig)
+
+
+def signatures(texts: List[str]) -> List[Signature]:
+    """Signatures for a batch of texts (picklable entry point for worker processes)."""
+    return [signature(t) for t in texts]
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity: fraction of equal bins."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _compact(sig: Signature) -> array:
+    """
+    Low 32 bits of each bin: ~0.5 KB instead of ~5 KB of Python ints. A chance
+    collision on a bin is ~2^-32, so similarity() is practically unchanged.
+    """
+    return array("I", (v & 0xFFFFFFFF for v in sig))
+
+
+def _band_layout(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    (bands, rows) for LSH. Picks the most selective layout whose S-curve midpoint
+    (1/bands)^(1/rows) still sits well below the threshold, so true near-duplicates
+    are almost never missed; candidates are verified against the threshold anyway.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= 0.8 * threshold:
+            best = (bands, rows)
+    return best
+
+
+# ── Run-scoped index ────────────────────────────────────────────────────────
+
+class ChunkDeduplicator:
+    """
+    LSH index of the canonical chunks seen in one ingestion run.
+
+    add_document() folds each incoming chunk into an existing canonical when one is
+    similar enough and has the same filter metadata (doc_type, year, regions, so
+    every copy stays reachable through metadata-filtered search), otherwise
+    registers it as a new canonical. Per canonical only its chunk_id, sources, LSH
+    bucket entries, a 32-bit-per-bin signature and the filter metadata are kept, so
+    memory stays small as the corpus grows (the chunk text goes on with the chunk).
+    Canonicals that gain sources after they were handed on for indexing are
+    reported by late_sources().
+    Files whose chunks were folded into another file's canonical are peers: if one
+    of them changes, the others have to be reprocessed too (see manifest peers).
+    """
+
+    def __init__(self, threshold: float = None):
+        self.threshold = threshold if threshold is not None else config.DEDUP_THRESHOLD
+        self.bands, self.rows = _band_layout(config.DEDUP_NUM_PERM, self.threshold)
+        # band hash → record index, or a list of them once a bucket is shared
+        self._buckets: List[Dict[int, object]] = [{} for _ in range(self.bands)]
+        self._records: List[Optional[Dict]] = []
+        self._peers: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.folded = 0
+
+    def _band_hashes(self, sig: Signature) -> Tuple[int, ...]:
+        r = self.rows
+        return tuple(hash(sig[band * r:(band + 1) * r]) for band in range(self.bands))
+
+    @staticmethod
+    def _filter_key(chunk: Dict) -> Tuple:
+        return chunk["doc_type"], chunk.get("year"), tuple(sorted(chunk.get("regions") or ()))
+
+    def _best_match(self, bands: Tuple[int, ...], sig: array, filter_key: Tuple) -> Optional[Dict]:
+        seen: Set[int] = set()
+        best, best_score = None, self.threshold
+        for band, key in enumerate(bands):
+            found = self._buckets[band].get(key, ())
+            for idx in (found,) if isinstance(found, int) else found:
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                record = self._records[idx]
+                if record is None or record["filter"] != filter_key:
+                    continue
+                score = similarity(sig, record["sig"])
+                if score >= best_score:
+                    best, best_score = record, score
+        return best
+
+    def add_document(self, file_id: str, chunks: List[Dict], sigs: List[Signature]) -> List[Dict]:
+        """Returns the document's chunks that remain canonical (to embed and index)."""
+        kept: List[Tuple[Dict, Dict]] = []
+        with self._lock:
+            for chunk, sig in zip(chunks, sigs):
+                source = {"filename": chunk["filename"], "page": chunk["page"]}
+                bands, sig = self._band_hashes(sig), _compact(sig)
+                filter_key = self._filter_key(chunk)
+                match = self._best_match(bands, sig, filter_key)
+                if match is not None:
+                    match["sources"].append(source)
+                    match["members"].append(file_id)
+                    match["dirty"] = match["dirty"] or match["emitted"]
+                    if match["owner"] != file_id:
+                        self._peers.setdefault(file_id, set()).add(match["owner"])
+                        self._peers.setdefault(match["owner"], set()).add(file_id)
+                    self.folded += 1
+                    continue
+
+                record = {
+                    "chunk_id": chunk["chunk_id"], "sources": [source], "sig": sig,
+                    "filter": filter_key, "owner": file_id, "members": [file_id],
+                    "emitted": False, "dirty": False,
+                }
+                self._records.append(record)
+                idx = len(self._records) - 1
+                for band, key in enumerate(bands):
+                    bucket = self._buckets[band]
+                    found = bucket.get(key)
+                    if found is None:
+                        bucket[key] = idx
+                    elif isinstance(found, int):
+                        bucket[key] = [found, idx]
+                    else:
+                        found.append(idx)
+                kept.append((chunk, record))
+            for chunk, record in kept:
+                chunk["sources"] = list(record["sources"])
+                record["emitted"] = True
+        return [chunk for chunk, _ in kept]
+
+    def discard_document(self, file_id: str) -> Set[str]:
+        """
+        Forget a file that failed after dedup: its canonicals will not be indexed.
+        Returns the other files that had chunks folded into them (now uncovered).
+        """
+        orphaned: Set[str] = set()
+        with self._lock:
+            for idx, record in enumerate(self._records):
+                if record is None:
+                    continue
+                if record["owner"] == file_id:
+                    orphaned.update(m for m in record["members"] if m != file_id)
+                    self._records[idx] = None
+                elif file_id in record["members"]:
+                    keep = [i for i, m in enumerate(record["members"]) if m != file_id]
+                    record["members"] = [record["members"][i] for i in keep]
+                    record["sources"] = [record["sources"][i] for i in keep]
+                    record["dirty"] = True
+            for peer in self._peers.pop(file_id, set()):
+                self._peers.get(peer, set()).discard(file_id)
+        return orphaned
+
+    def late_sources(self) -> Dict[str, List[Dict]]:
+        """chunk_id → full sources for canonicals whose sources changed after indexing."""
+        with self._lock:
+            return {
+                r["chunk_id"]: list(r["sources"])
+                for r in self._records if r is not None and r["dirty"]
+            }
+
+    def peers(self, file_id: str) -> List[str]:
+        with self._lock:
+            return sorted(self._peers.get(file_id, ()))
+
+
+def deduplicate(chunks: List[Dict]) -> List[Dict]:
+    """Collapse near-duplicates in a flat chunk list (grouped per source file)."""
+    dedup = ChunkDeduplicator()
+    kept = []
+    by_file: Dict[str, List[Dict]] = {}
+    for chunk in chunks:
+        by_file.setdefault(chunk.get("file_id") or chunk["filename"], []).append(chunk)
+    for file_id, file_chunks in by_file.items():
+        sigs = signatures([c["chunk_text"] for c in file_chunks])
+        kept.extend(dedup.add_document(file_id, file_chunks, sigs))
+    logger.info("Dedup: %d chunks → %d canonical (%d folded)", len(chunks), len(kept), dedup.folded)
+    return kept
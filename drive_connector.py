@@ -1,12 +1,18 @@
 """
 Google Drive file listing & download, with local fallback.
-Supports Shared Drives and recursive subfolder scanning.
+Supports Shared Drives, concurrent breadth-first subfolder crawling and delta
+sync through the Drive Changes API.
 """
-import io
 import os
+import json
 import logging
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set, Tuple
 
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
@@ -37,18 +43,69 @@ GOOGLE_APPS_EXT = {
     "application/vnd.google-apps.presentation": ".pptx",
 }
 
-_service = None
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+LOCAL_EXTENSIONS = {".pdf", ".docx", ".pptx"}
+
+# Only request the fields ingestion uses (smaller pages, faster listing)
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime, size, md5Checksum, webViewLink)"
+
+# Fields read from changes.list (parents decide whether a change is in scope)
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, changes(fileId, removed, "
+    "file(id, name, mimeType, modifiedTime, size, md5Checksum, webViewLink, parents, trashed))"
+)
+
+SYNC_STATE_VERSION = 1
+
+# Temp downloads are named with this prefix so cleanup never touches other files in DOWNLOAD_TMP_DIR
+_DOWNLOAD_PREFIX = "ingest-dl-"
+
+_local = threading.local()
+_creds = None
+_creds_lock = threading.Lock()
+_service_override = None
+
+
+def use_service(service):
+    """
+    Route all Drive calls to `service` (e.g. fake_drive.FakeDriveService) instead
+    of the real API; None restores the default. Drive is then treated as configured.
+    """
+    global _service_override
+    _service_override = service
+
+
+def drive_enabled() -> bool:
+    """True when files come from Google Drive (credentials or an injected service)."""
+    if _service_override is not None:
+        return True
+    return bool(config.GOOGLE_DRIVE_FOLDER_IDS) and os.path.exists(config.SERVICE_ACCOUNT_FILE)
 
 
 def _build_service():
-    """Build Google Drive API service from service account credentials."""
-    global _service
-    if _service is None:
-        creds = service_account.Credentials.from_service_account_file(
-            config.SERVICE_ACCOUNT_FILE, scopes=SCOPES
-        )
-        _service = build("drive", "v3", credentials=creds, cache_discovery=False)
-    return _service
+    """
+    Drive API service for the calling thread. The underlying httplib2 transport
+    is not thread-safe, so each thread gets its own (credentials are shared).
+    """
+    global _creds
+    if _service_override is not None:
+        return _service_override
+    service = getattr(_local, "service", None)
+    if service is None:
+        with _creds_lock:
+            if _creds is None:
+                _creds = service_account.Credentials.from_service_account_file(
+                    config.SERVICE_ACCOUNT_FILE, scopes=SCOPES
+                )
+        service = build("drive", "v3", credentials=_creds, cache_discovery=False)
+        _local.service = service
+    return service
+
+
+def _execute(request):
+    """Run a Drive request, retrying 429 / 5xx / rate-limit 403s with randomized exponential backoff."""
+    return request.execute(num_retries=config.DRIVE_MAX_RETRIES)
 
 
 def list_drive_files(folder_id: str = None) -> List[Dict]:
@@ -57,63 +114,267 @@ def list_drive_files(folder_id: str = None) -> List[Dict]:
     Supports Shared Drives via supportsAllDrives flag.
     """
     folder_id = folder_id or config.GOOGLE_DRIVE_FOLDER_ID
-    service = _build_service()
-    all_files = []
-    _list_recursive(service, folder_id, all_files)
+    all_files = crawl_folders([folder_id])
     logger.info("Found %d supported files in Drive folder %s", len(all_files), folder_id)
     return all_files
 
 
-def _list_recursive(service, folder_id: str, results: List[Dict]):
-    """Recursively scan folder and subfolders."""
+def _children_query(parent_ids: List[str]) -> str:
+    parents = " or ".join(f"'{pid}' in parents" for pid in parent_ids)
+    mimes = " or ".join(f"mimeType = '{m}'" for m in sorted(SUPPORTED_MIME_TYPES | {FOLDER_MIME}))
+    return f"({parents}) and ({mimes}) and trashed = false"
+
+
+def _list_children(parent_ids: List[str]) -> Tuple[List[str], List[Dict]]:
+    """List the direct children of several folders at once; returns (subfolder ids, files)."""
+    service = _build_service()
+    folders, files = [], []
     page_token = None
     while True:
-        resp = (
-            service.files()
-            .list(
-                q=f"'{folder_id}' in parents and trashed = false",
-                fields="nextPageToken, files(id, name, mimeType, modifiedTime, webViewLink)",
-                pageSize=100,
+        resp = _execute(
+            service.files().list(
+                q=_children_query(parent_ids),
+                fields=LIST_FIELDS,
+                pageSize=config.DRIVE_PAGE_SIZE,
                 pageToken=page_token,
                 supportsAllDrives=True,
                 includeItemsFromAllDrives=True,
             )
-            .execute()
         )
         for f in resp.get("files", []):
-            if f["mimeType"] == "application/vnd.google-apps.folder":
-                # Recurse into subfolder
-                _list_recursive(service, f["id"], results)
+            if f["mimeType"] == FOLDER_MIME:
+                folders.append(f["id"])
             elif f["mimeType"] in SUPPORTED_MIME_TYPES:
                 # Fix name for Google Docs/Slides (add extension)
                 if f["mimeType"] in GOOGLE_APPS_EXT and "." not in f["name"]:
                     f["name"] = f["name"] + GOOGLE_APPS_EXT[f["mimeType"]]
-                results.append(f)
+                files.append(f)
         page_token = resp.get("nextPageToken")
         if not page_token:
             break
+    return folders, files
+
+
+def crawl_folders(root_ids: List[str], folders_out: Optional[Set[str]] = None) -> List[Dict]:
+    """
+    Breadth-first crawl of one or more folder trees.
+
+    Up to DRIVE_CRAWL_WORKERS listing requests run concurrently, and each one
+    covers up to DRIVE_PARENTS_PER_QUERY folders ('a' in parents or 'b' in parents).
+    An inaccessible root folder is skipped with a warning. Any other failure
+    aborts the crawl: a partial listing would make present files look removed.
+    Files reachable through several folders are returned once. The ids of all
+    crawled folders are added to folders_out when given.
+    """
+    results: List[Dict] = []
+    seen_files: Set[str] = set()
+    seen_folders: Set[str] = set(root_ids)
+    pending = deque()
+    requests = 0
+
+    with ThreadPoolExecutor(max_workers=config.DRIVE_CRAWL_WORKERS, thread_name_prefix="drive-crawl") as pool:
+        # Roots get one request each so a failure can be pinned on (and skip) that root
+        running = {pool.submit(_list_children, [rid]): [rid] for rid in dict.fromkeys(root_ids)}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                parents = running.pop(future)
+                requests += 1
+                try:
+                    folders, files = future.result()
+                except Exception as e:
+                    if len(parents) == 1 and parents[0] in root_ids:
+                        logger.warning("Drive folder %s not accessible, skipping (%s)", parents[0], e)
+                        continue
+                    raise
+                for f in files:
+                    if f["id"] not in seen_files:
+                        seen_files.add(f["id"])
+                        results.append(f)
+                for folder_id in folders:
+                    if folder_id not in seen_folders:
+                        seen_folders.add(folder_id)
+                        pending.append(folder_id)
+
+            while pending and len(running) < config.DRIVE_CRAWL_WORKERS:
+                batch = [pending.popleft() for _ in range(min(config.DRIVE_PARENTS_PER_QUERY, len(pending)))]
+                running[pool.submit(_list_children, batch)] = batch
+
+    logger.info("Crawled %d Drive folder(s) in %d listing request(s)", len(seen_folders), requests)
+    if folders_out is not None:
+        folders_out.update(seen_folders)
+    return results
 
 
-def download_drive_file(file_meta: Dict) -> bytes:
-    """Download a single file from Drive. Handles native Google Docs export."""
+# ── Delta sync (Drive Changes API) ──────────────────────────────────────────
+
+def _load_sync_state() -> Optional[Dict]:
+    path = Path(config.DRIVE_SYNC_STATE_PATH)
+    if not path.exists():
+        return None
+    try:
+        state = json.loads(path.read_text())
+    except Exception as e:
+        logger.warning("Could not read Drive sync state %s (%s), crawling instead", path, e)
+        return None
+    if state.get("version") != SYNC_STATE_VERSION:
+        return None
+    return state
+
+
+def _save_sync_state(state: Dict):
+    """Atomically write the sync state (write to temp file, then rename)."""
+    path = Path(config.DRIVE_SYNC_STATE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+def get_start_page_token() -> str:
+    """Changes API cursor for "now"."""
+    resp = _execute(_build_service().changes().getStartPageToken(supportsAllDrives=True))
+    return resp["startPageToken"]
+
+
+def list_changes(page_token: str) -> Tuple[List[Dict], str]:
+    """All changes since page_token; returns (changes, next start page token)."""
+    service = _build_service()
+    changes: List[Dict] = []
+    while True:
+        resp = _execute(
+            service.changes().list(
+                pageToken=page_token,
+                fields=CHANGE_FIELDS,
+                pageSize=config.DRIVE_PAGE_SIZE,
+                includeRemoved=True,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+        )
+        changes.extend(resp.get("changes", []))
+        if "newStartPageToken" in resp:
+            return changes, resp["newStartPageToken"]
+        page_token = resp["nextPageToken"]
+
+
+def _full_sync(roots: List[str]) -> Dict:
+    # Take the cursor first so changes made during the crawl show up next time
+    page_token = get_start_page_token()
+    folders: Set[str] = set()
+    files = crawl_folders(roots, folders)
+    return {
+        "version": SYNC_STATE_VERSION,
+        "roots": roots,
+        "page_token": page_token,
+        "folders": sorted(folders),
+        "files": {f["id"]: f for f in files},
+    }
+
+
+def _listing_entry(f: Dict) -> Dict:
+    entry = {k: f[k] for k in ("id", "name", "mimeType", "modifiedTime", "size", "md5Checksum", "webViewLink") if k in f}
+    if entry["mimeType"] in GOOGLE_APPS_EXT and "." not in entry["name"]:
+        entry["name"] = entry["name"] + GOOGLE_APPS_EXT[entry["mimeType"]]
+    return entry
+
+
+def _apply_changes(state: Dict, changes: List[Dict]) -> bool:
+    """
+    Apply Drive changes to the stored listing in place. Returns False when the
+    folder tree itself lost a branch (a known folder trashed, deleted or moved
+    out), which needs a full crawl to resolve.
+    """
+    roots = set(state["roots"])
+    folders = set(state["folders"])
+    files = state["files"]
+    new_folders: List[str] = []
+
+    for change in changes:
+        file_id = change.get("fileId")
+        f = change.get("file") or {}
+        gone = change.get("removed") or f.get("trashed")
+        in_scope = not gone and bool(folders.intersection(f.get("parents", [])))
+
+        if file_id in folders:
+            if gone or (file_id not in roots and not in_scope):
+                logger.info("Drive folder %s was removed or moved, crawling instead", file_id)
+                return False
+            continue
+        if f.get("mimeType") == FOLDER_MIME:
+            if in_scope:
+                # A folder created in (or moved into) the tree: its contents are not
+                # reported as changes, so crawl it
+                folders.add(file_id)
+                new_folders.append(file_id)
+            continue
+
+        if in_scope and f.get("mimeType") in SUPPORTED_MIME_TYPES:
+            files[file_id] = _listing_entry(f)
+        else:
+            files.pop(file_id, None)
+
+    if new_folders:
+        crawled: Set[str] = set()
+        for f in crawl_folders(new_folders, crawled):
+            files[f["id"]] = f
+        folders |= crawled
+    state["folders"] = sorted(folders)
+    return True
+
+
+def sync_files(full_scan: bool = False) -> List[Dict]:
+    """
+    Current listing of the configured Drive folders, kept up to date with the
+    Changes API: a handful of changes.list calls instead of a crawl. Falls back to
+    a full crawl on first use, when the configured folders change, when a known
+    folder is removed, or when full_scan is set.
+    """
+    roots = list(dict.fromkeys(config.GOOGLE_DRIVE_FOLDER_IDS))
+    state = None if full_scan else _load_sync_state()
+    if state is not None and state.get("roots") != roots:
+        logger.info("Configured Drive folders changed, crawling instead of syncing")
+        state = None
+
+    if state is not None:
+        changes, page_token = list_changes(state["page_token"])
+        if _apply_changes(state, changes):
+            state["page_token"] = page_token
+            logger.info("Drive delta sync: %d change(s) since the last run", len(changes))
+        else:
+            state = None
+
+    if state is None:
+        state = _full_sync(roots)
+    _save_sync_state(state)
+    return list(state["files"].values())
+
+
+def download_drive_file_to_disk(file_meta: Dict) -> str:
+    """Stream a Drive file into a temp file under config.DOWNLOAD_TMP_DIR; returns its path."""
     service = _build_service()
     file_id = file_meta["id"]
     mime = file_meta["mimeType"]
 
-    buf = io.BytesIO()
-
     if mime in EXPORT_MIME:
         request = service.files().export_media(fileId=file_id, mimeType=EXPORT_MIME[mime])
     else:
         request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
 
-    downloader = MediaIoBaseDownload(buf, request)
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
-
-    buf.seek(0)
-    return buf.read()
+    os.makedirs(config.DOWNLOAD_TMP_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(
+        dir=config.DOWNLOAD_TMP_DIR, prefix=_DOWNLOAD_PREFIX, suffix=Path(file_meta["name"]).suffix,
+    )
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=config.DOWNLOAD_CHUNK_BYTES)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk(num_retries=config.DRIVE_MAX_RETRIES)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
 
 
 # ── Local fallback connector ────────────────────────────────────────────────
@@ -122,7 +383,6 @@ def list_local_files(docs_dir: str = None) -> List[Dict]:
     """List files in the local_docs/ directory with Drive-like metadata shape."""
     docs_dir = docs_dir or config.LOCAL_DOCS_DIR
     results = []
-    supported_exts = {".pdf", ".docx", ".pptx"}
 
     docs_path = Path(docs_dir)
     if not docs_path.exists():
@@ -130,13 +390,15 @@ def list_local_files(docs_dir: str = None) -> List[Dict]:
         return results
 
     for fp in sorted(docs_path.rglob("*")):
-        if fp.is_file() and fp.suffix.lower() in supported_exts:
+        if fp.is_file() and fp.suffix.lower() in LOCAL_EXTENSIONS:
+            stat = fp.stat()
             results.append(
                 {
-                    "id": fp.name,
+                    "id": fp.relative_to(docs_path).as_posix(),  # unique even when names repeat across subfolders
                     "name": fp.name,
                     "mimeType": _ext_to_mime(fp.suffix.lower()),
-                    "modifiedTime": None,
+                    "modifiedTime": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat(),
+                    "size": stat.st_size,
                     "webViewLink": None,
                     "_local_path": str(fp),
                 }
@@ -146,13 +408,12 @@ def list_local_files(docs_dir: str = None) -> List[Dict]:
     return results
 
 
-def download_local_file(file_meta: Dict, docs_dir: str = None) -> bytes:
-    """Read a file from the local_docs/ directory."""
+def local_file_path(file_meta: Dict, docs_dir: str = None) -> str:
+    """Path of a file in the local_docs/ directory."""
     if "_local_path" in file_meta:
-        return Path(file_meta["_local_path"]).read_bytes()
+        return file_meta["_local_path"]
     docs_dir = docs_dir or config.LOCAL_DOCS_DIR
-    fp = Path(docs_dir) / file_meta["name"]
-    return fp.read_bytes()
+    return str(Path(docs_dir) / file_meta["name"])
 
 
 def _ext_to_mime(ext: str) -> str:
@@ -166,37 +427,70 @@ def _ext_to_mime(ext: str) -> str:
 
 # ── Unified interface ───────────────────────────────────────────────────────
 
-def list_files() -> List[Dict]:
-    """Pull from all configured Drive folders; fall back to local_docs/."""
-    if config.GOOGLE_DRIVE_FOLDER_IDS and os.path.exists(config.SERVICE_ACCOUNT_FILE):
-        all_files = []
-        for folder_id in config.GOOGLE_DRIVE_FOLDER_IDS:
-            try:
-                files = list_drive_files(folder_id)
-                all_files.extend(files)
-            except Exception as e:
-                logger.warning("Drive folder %s not accessible, skipping (%s)", folder_id, e)
-        if all_files:
-            # Deduplicate by file id
-            seen = set()
-            unique = []
-            for f in all_files:
-                if f["id"] not in seen:
-                    seen.add(f["id"])
-                    unique.append(f)
-            logger.info("Total files from %d Drive folder(s): %d", len(config.GOOGLE_DRIVE_FOLDER_IDS), len(unique))
-            return unique
+def list_files(full_scan: bool = False) -> List[Dict]:
+    """
+    Pull from all configured Drive folders; fall back to local_docs/.
+
+    With DRIVE_DELTA_SYNC the previous listing is brought up to date from the
+    Drive Changes API instead of crawling every folder again; full_scan forces a crawl.
+    """
+    if drive_enabled():
+        # Inaccessible roots are skipped; other listing errors propagate (a partial
+        # listing would make incremental ingestion delete the missing files)
+        if config.DRIVE_DELTA_SYNC:
+            files = sync_files(full_scan=full_scan)
+        else:
+            files = crawl_folders(config.GOOGLE_DRIVE_FOLDER_IDS)
+        if files:
+            logger.info("Total files from %d Drive folder(s): %d", len(config.GOOGLE_DRIVE_FOLDER_IDS), len(files))
+            return files
         logger.warning("All Drive folders returned 0 files, falling back to local docs")
     return list_local_files()
 
 
-def download_file(file_meta: Dict) -> bytes:
-    """Try Google Drive first; fall back to local_docs/."""
+def download_file_to_disk(file_meta: Dict) -> str:
+    """
+    Path of the file's bytes: Google Drive first, falling back to local_docs/.
+    Drive files are streamed to a temp file (release it with discard_download);
+    local files are used in place.
+    """
     if "_local_path" in file_meta:
-        return download_local_file(file_meta)
-    if config.GOOGLE_DRIVE_FOLDER_ID and os.path.exists(config.SERVICE_ACCOUNT_FILE):
+        return local_file_path(file_meta)
+    if drive_enabled():
         try:
-            return download_drive_file(file_meta)
+            return download_drive_file_to_disk(file_meta)
         except Exception as e:
             logger.warning("Drive download failed (%s), falling back to local", e)
-    return download_local_file(file_meta)
+    return local_file_path(file_meta)
+
+
+def _is_download(path: str) -> bool:
+    """True for temp files created by download_drive_file_to_disk (and nothing else in the dir)."""
+    return (
+        os.path.dirname(os.path.abspath(path)) == os.path.abspath(config.DOWNLOAD_TMP_DIR)
+        and os.path.basename(path).startswith(_DOWNLOAD_PREFIX)
+    )
+
+
+def discard_download(path: Optional[str]):
+    """Delete a temp file from download_file_to_disk (local source files are left alone)."""
+    if path and _is_download(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def purge_downloads():
+    """
+    Remove temp downloads left behind by an interrupted run. Only our own files
+    (by prefix) are touched: DOWNLOAD_TMP_DIR may be a shared directory.
+    """
+    try:
+        names = os.listdir(config.DOWNLOAD_TMP_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(config.DOWNLOAD_TMP_DIR, name)
+        if _is_download(path) and os.path.isfile(path):
+            discard_download(path)
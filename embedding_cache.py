@@ -0,0 +1,176 @@
+"""
+Persistent, content-addressed embedding cache.
+
+Vectors are keyed by sha256(model id, dimensions, text) and stored as float32 blobs
+in a local SQLite file, so re-ingesting unchanged chunk text (even after a full
+reindex) does not call Bedrock again. The store is bounded by size: once it grows
+past config.EMBED_CACHE_MAX_MB, least-recently-used entries are evicted.
+"""
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_writes_since_trim = 0
+
+# Check the size bound every this many writes (SUM over the table is not free)
+_TRIM_EVERY = 500
+
+
+def _connect() -> sqlite3.Connection:
+    """One connection per thread (sqlite3 connections are not thread-safe)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        path = Path(config.EMBED_CACHE_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")  # concurrent readers across workers
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        _local.conn = conn
+    return conn
+
+
+def cache_key(text: str, model_id: str = None, dimensions: int = None) -> str:
+    model_id = model_id or config.BEDROCK_EMBED_MODEL_ID
+    dimensions = dimensions or config.EMBEDDING_DIMENSIONS
+    raw = f"{model_id}\0{dimensions}\0{text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _encode(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+def get_many(texts: List[str], dimensions: int = None) -> List[Optional[List[float]]]:
+    """Look up cached vectors; returns None for each miss (order preserved)."""
+    if not config.EMBED_CACHE_ENABLED or not texts:
+        return [None] * len(texts)
+
+    keys = [cache_key(t, dimensions=dimensions) for t in texts]
+    found: Dict[str, bytes] = {}
+    try:
+        conn = _connect()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch,
+            ).fetchall()
+            found.update(rows)
+        if found:
+            now = time.time()
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Embedding cache read failed: %s", e)
+
+    results = [_decode(found[k]) if k in found else None for k in keys]
+    hits = sum(1 for r in results if r is not None)
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += len(results) - hits
+    return results
+
+
+def put_many(texts: List[str], vectors: List[List[float]], dimensions: int = None):
+    """Store vectors for texts, then enforce the size bound now and then."""
+    global _writes_since_trim
+    if not config.EMBED_CACHE_ENABLED or not texts:
+        return
+
+    now = time.time()
+    rows = []
+    for text, vector in zip(texts, vectors):
+        blob = _encode(vector)
+        rows.append((cache_key(text, dimensions=dimensions), blob, len(blob), now))
+    try:
+        conn = _connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows,
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Embedding cache write failed: %s", e)
+        return
+
+    with _stats_lock:
+        _stats["writes"] += len(rows)
+        _writes_since_trim += len(rows)
+        due = _writes_since_trim >= _TRIM_EVERY
+        if due:
+            _writes_since_trim = 0
+    if due:
+        trim()
+
+
+def trim():
+    """Evict least-recently-used entries until the store is under 90% of its cap."""
+    max_bytes = config.EMBED_CACHE_MAX_MB * 1024 * 1024
+    try:
+        conn = _connect()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= max_bytes:
+            return
+        target = int(max_bytes * 0.9)
+        evicted = 0
+        cursor = conn.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC")
+        doomed = []
+        for key, size in cursor:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+            evicted += 1
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Embedding cache eviction failed: %s", e)
+        return
+
+    with _stats_lock:
+        _stats["evictions"] += evicted
+    logger.info("Embedding cache: evicted %d entries", evicted)
+
+
+def stats() -> Dict:
+    """Hit/miss counters for this process plus on-disk entry count and size."""
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / lookups, 4) if lookups else 0.0
+    result["enabled"] = config.EMBED_CACHE_ENABLED
+    if config.EMBED_CACHE_ENABLED:
+        try:
+            count, size = _connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+            ).fetchone()
+            result["entries"] = count
+            result["size_mb"] = round(size / (1024 * 1024), 2)
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache stats failed: %s", e)
+    return result
@@ -0,0 +1,171 @@
+"""
+Persistent extraction cache.
+
+The {"pages": [...]} output of extractor.extract_text is stored as zlib-compressed
+JSON in a local SQLite file, keyed by the file's content hash (the manifest's
+SHA-256), its extension and extractor.EXTRACTOR_VERSION. Re-chunking the corpus
+(e.g. after changing config.CHUNK_SIZE_TOKENS) then skips PyMuPDF / python-docx /
+python-pptx for every file whose bytes have not changed. Bounded by size like the
+embedding cache: past config.EXTRACT_CACHE_MAX_MB, least-recently-used entries go.
+"""
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import config
+import extractor
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "bytes_raw": 0, "bytes_stored": 0}
+_writes_since_trim = 0
+
+# Documents are large compared to embeddings: check the size bound more often
+_TRIM_EVERY = 50
+
+
+def _connect() -> sqlite3.Connection:
+    """One connection per thread (sqlite3 connections are not thread-safe)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        path = Path(config.EXTRACT_CACHE_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            " key TEXT PRIMARY KEY,"
+            " pages BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used)")
+        _local.conn = conn
+    return conn
+
+
+def cache_key(content_hash: str, filename: str) -> str:
+    # The extension picks the parser; the version invalidates entries when parsing changes
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return f"v{extractor.EXTRACTOR_VERSION}:{ext}:{content_hash}"
+
+
+def get(content_hash: str, filename: str) -> Optional[Dict]:
+    """Cached extraction for a file's content, rebuilt in extract_text's shape, or None."""
+    if not config.EXTRACT_CACHE_ENABLED or not content_hash:
+        return None
+
+    key = cache_key(content_hash, filename)
+    row = None
+    try:
+        conn = _connect()
+        row = conn.execute("SELECT pages FROM extractions WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Extraction cache read failed: %s", e)
+
+    pages = None
+    if row is not None:
+        try:
+            pages = json.loads(zlib.decompress(row[0]))
+        except (zlib.error, ValueError) as e:
+            logger.warning("Corrupt extraction cache entry for %s: %s", filename, e)
+
+    with _stats_lock:
+        _stats["hits" if pages is not None else "misses"] += 1
+    if pages is None:
+        return None
+    return {"filename": filename, "pages": pages, "full_text": "\n\n".join(p["text"] for p in pages)}
+
+
+def put(content_hash: str, doc: Dict):
+    """Store an extraction result (empty ones too: a scanned PDF stays text-less)."""
+    global _writes_since_trim
+    if not config.EXTRACT_CACHE_ENABLED or not content_hash:
+        return
+
+    raw = json.dumps(doc["pages"], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    blob = zlib.compress(raw, 6)
+    try:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO extractions (key, pages, size, last_used) VALUES (?, ?, ?, ?)",
+            (cache_key(content_hash, doc["filename"]), blob, len(blob), time.time()),
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Extraction cache write failed: %s", e)
+        return
+
+    with _stats_lock:
+        _stats["writes"] += 1
+        _stats["bytes_raw"] += len(raw)
+        _stats["bytes_stored"] += len(blob)
+        _writes_since_trim += 1
+        due = _writes_since_trim >= _TRIM_EVERY
+        if due:
+            _writes_since_trim = 0
+    if due:
+        trim()
+
+
+def trim():
+    """Evict least-recently-used entries (and other extractor versions) until under 90% of the cap."""
+    max_bytes = config.EXTRACT_CACHE_MAX_MB * 1024 * 1024
+    try:
+        conn = _connect()
+        stale = conn.execute(
+            "DELETE FROM extractions WHERE key NOT LIKE ?", (f"v{extractor.EXTRACTOR_VERSION}:%",),
+        ).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        doomed = []
+        if total > max_bytes:
+            target = int(max_bytes * 0.9)
+            for key, size in conn.execute("SELECT key, size FROM extractions ORDER BY last_used ASC"):
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM extractions WHERE key = ?", doomed)
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Extraction cache eviction failed: %s", e)
+        return
+
+    evicted = stale + len(doomed)
+    if evicted:
+        with _stats_lock:
+            _stats["evictions"] += evicted
+        logger.info("Extraction cache: evicted %d entries", evicted)
+
+
+def stats() -> Dict:
+    """Hit/miss counters for this process, compression ratio, on-disk entry count and size."""
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = round(result["hits"] / lookups, 4) if lookups else 0.0
+    stored = result.pop("bytes_stored")
+    raw = result.pop("bytes_raw")
+    result["compression_ratio"] = round(raw / stored, 2) if stored else 0.0
+    result["enabled"] = config.EXTRACT_CACHE_ENABLED
+    if config.EXTRACT_CACHE_ENABLED:
+        try:
+            count, size = _connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions"
+            ).fetchone()
+            result["entries"] = count
+            result["size_mb"] = round(size / (1024 * 1024), 2)
+        except sqlite3.Error as e:
+            logger.warning("Extraction cache stats failed: %s", e)
+    return result
@@ -1,20 +1,43 @@
 """
 PDF / DOCX / PPTX → plain text + page info.
+
+Sources are raw bytes or a file path; with a path, PyMuPDF and the zip-based
+DOCX/PPTX readers load pages/parts on demand instead of holding the whole file.
+PDFs above config.PDF_PARALLEL_PAGE_THRESHOLD pages are split into page ranges that
+are extracted in worker processes and merged back in page order.
 """
 import io
 import logging
-from typing import Dict, List
+import threading
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
 import fitz  # PyMuPDF
 from docx import Document as DocxDocument
 from pptx import Presentation
 
+import config
+
 logger = logging.getLogger(__name__)
 
+# Bump when extraction output changes (invalidates extraction_cache entries)
+EXTRACTOR_VERSION = 1
+
+# Don't split a PDF into ranges shorter than this (per-task open/pickle overhead)
+_MIN_PAGES_PER_RANGE = 25
+
+# Raw file bytes, or the path of a file on disk
+Source = Union[bytes, str]
 
-def extract_text(file_bytes: bytes, filename: str) -> Dict:
+_page_pool: Optional[ProcessPoolExecutor] = None
+_page_pool_lock = threading.Lock()
+
+
+def extract_text(source: Source, filename: str, executor: Optional[Executor] = None) -> Dict:
     """
-    Extract text from a document.
+    Extract text from a document. Large PDFs are extracted page-parallel on
+    executor (a lazily created process pool when not given).
 
     Returns:
         {
@@ -26,30 +49,105 @@ def extract_text(file_bytes: bytes, filename: str) -> Dict:
     ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
     if ext == "pdf":
-        return _extract_pdf(file_bytes, filename)
+        return _extract_pdf(source, filename, executor)
     elif ext == "docx":
-        return _extract_docx(file_bytes, filename)
+        return _extract_docx(source, filename)
     elif ext == "pptx":
-        return _extract_pptx(file_bytes, filename)
+        return _extract_pptx(source, filename)
     else:
         logger.warning("Unsupported file type: %s", filename)
         return {"filename": filename, "pages": [], "full_text": ""}
 
 
-def _extract_pdf(data: bytes, filename: str) -> Dict:
+def _open_pdf(source: Source) -> fitz.Document:
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def _file_like(source: Source):
+    """Path as-is (zipfile reads members lazily), bytes wrapped in a stream."""
+    return source if isinstance(source, str) else io.BytesIO(source)
+
+
+def _get_page_pool() -> ProcessPoolExecutor:
+    """Lazily create the process pool used when no executor is passed in."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=max(1, config.PDF_PAGE_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _page_pool
+
+
+def pdf_page_ranges(source: Source, filename: str) -> List[Tuple[int, int]]:
+    """
+    [start, end) page ranges for parallel extraction, or [] when the file is not a
+    PDF or is below the page threshold (only the xref is read, not the pages).
+    """
+    if not filename.lower().endswith(".pdf") or config.PDF_PAGE_WORKERS <= 1:
+        return []
+    try:
+        with _open_pdf(source) as doc:
+            page_count = doc.page_count
+    except Exception as e:
+        logger.warning("Could not open %s to count pages: %s", filename, e)
+        return []
+    if page_count <= config.PDF_PARALLEL_PAGE_THRESHOLD:
+        return []
+
+    parts = max(1, min(config.PDF_PAGE_WORKERS, page_count // _MIN_PAGES_PER_RANGE))
+    step, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        end = start + step + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def extract_pdf_pages(source: Source, start: int = 0, end: Optional[int] = None) -> List[Dict]:
+    """Extract non-empty pages in [start, end); page numbers are 1-based and absolute."""
     pages: List[Dict] = []
-    doc = fitz.open(stream=data, filetype="pdf")
-    for i, page in enumerate(doc):
-        text = page.get_text("text")
-        if text.strip():
-            pages.append({"page": i + 1, "text": text})
-    doc.close()
+    with _open_pdf(source) as doc:
+        end = doc.page_count if end is None else min(end, doc.page_count)
+        for i in range(start, end):
+            text = doc[i].get_text("text")
+            if text.strip():
+                pages.append({"page": i + 1, "text": text})
+    return pages
+
+
+def extract_pdf_parallel(
+    source: Source, filename: str, ranges: List[Tuple[int, int]], executor: Optional[Executor] = None,
+) -> Dict:
+    """
+    Extract page ranges concurrently on executor (or the module pool), merged in
+    page order. Pass a path so each worker opens the file rather than receiving a copy.
+    """
+    executor = executor or _get_page_pool()
+    futures = [executor.submit(extract_pdf_pages, source, start, end) for start, end in ranges]
+    pages = [page for future in futures for page in future.result()]
+    logger.info("Extracted %s in %d page ranges", filename, len(ranges))
+    return _pdf_result(filename, pages)
+
+
+def _pdf_result(filename: str, pages: List[Dict]) -> Dict:
     full_text = "\n\n".join(p["text"] for p in pages)
     return {"filename": filename, "pages": pages, "full_text": full_text}
 
 
-def _extract_docx(data: bytes, filename: str) -> Dict:
-    doc = DocxDocument(io.BytesIO(data))
+def _extract_pdf(source: Source, filename: str, executor: Optional[Executor] = None) -> Dict:
+    ranges = pdf_page_ranges(source, filename)
+    if ranges:
+        return extract_pdf_parallel(source, filename, ranges, executor)
+    return _pdf_result(filename, extract_pdf_pages(source))
+
+
+def _extract_docx(source: Source, filename: str) -> Dict:
+    doc = DocxDocument(_file_like(source))
     paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
 
     # DOCX doesn't have real pages; treat the whole doc as page 1
@@ -70,8 +168,8 @@ def _extract_docx(data: bytes, filename: str) -> Dict:
     return {"filename": filename, "pages": pages, "full_text": full_text}
 
 
-def _extract_pptx(data: bytes, filename: str) -> Dict:
-    prs = Presentation(io.BytesIO(data))
+def _extract_pptx(source: Source, filename: str) -> Dict:
+    prs = Presentation(_file_like(source))
     pages: List[Dict] = []
     for i, slide in enumerate(prs.slides):
         texts = []
@@ -0,0 +1,208 @@
+"""
+Local stand-ins for Bedrock Titan embeddings and OpenSearch Serverless, with
+configurable per-call latency, for benchmarking ingestion without AWS:
+
+    bedrock = FakeBedrockRuntime(latency_ms=80)
+    opensearch = FakeOpenSearch(bulk_latency_ms=30)
+    indexer.use_clients(opensearch=opensearch, bedrock=bedrock)
+
+FakeBedrockRuntime.invoke_model returns deterministic unit vectors derived from
+the input text. FakeOpenSearch covers what indexer calls for building and
+swapping index generations: indices exists / create / delete / get / get_alias /
+update_aliases, count, bulk (NDJSON) and term / terms / match_all search.
+Calls and time spent sleeping are counted in `calls` / `latency_seconds`.
+"""
+import io
+import json
+import math
+import time
+import random
+import fnmatch
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from opensearchpy import NotFoundError
+from opensearchpy.serializer import JSONSerializer
+
+
+class _Latency:
+    """Sleeps latency_ms ± jitter per call and keeps count of the time spent."""
+
+    def __init__(self, latency_ms: float, jitter: float):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.latency_ms <= 0:
+            return
+        delay = self.latency_ms / 1000 * random.uniform(1 - self.jitter, 1 + self.jitter)
+        time.sleep(delay)
+        with self._lock:
+            self.seconds += delay
+
+
+class FakeBedrockRuntime:
+    """bedrock-runtime client whose invoke_model mimics Titan Embed v2."""
+
+    def __init__(self, latency_ms: float = 0, jitter: float = 0.2):
+        self.calls = 0
+        self._latency = _Latency(latency_ms, jitter)
+        self._lock = threading.Lock()
+
+    @property
+    def latency_seconds(self) -> float:
+        return self._latency.seconds
+
+    def invoke_model(self, modelId: str, body: str, contentType: str = "", accept: str = "", **kwargs) -> Dict:
+        request = json.loads(body)
+        self._latency.wait()
+        with self._lock:
+            self.calls += 1
+
+        # Deterministic pseudo-embedding: seeded by the text, normalized like Titan's
+        seed = int.from_bytes(hashlib.sha256(request["inputText"].encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0, 1) for _ in range(request.get("dimensions", 1024))]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        payload = {"embedding": [v / norm for v in vector], "inputTextTokenCount": len(request["inputText"].split())}
+        return {"body": io.BytesIO(json.dumps(payload).encode("utf-8"))}
+
+
+class _Indices:
+    def __init__(self, cluster: "FakeOpenSearch"):
+        self._c = cluster
+
+    def exists(self, index: str) -> bool:
+        with self._c._lock:
+            return index in self._c.docs or index in self._c.aliases
+
+    def create(self, index: str, body: Optional[Dict] = None) -> Dict:
+        with self._c._lock:
+            self._c.docs[index] = {}
+            self._c.mappings[index] = body or {}
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index: str) -> Dict:
+        with self._c._lock:
+            if index not in self._c.docs:
+                raise NotFoundError(404, "index_not_found_exception", {})
+            del self._c.docs[index]
+            self._c.mappings.pop(index, None)
+        return {"acknowledged": True}
+
+    def get(self, index: str) -> Dict:
+        with self._c._lock:
+            found = {name: {"mappings": self._c.mappings.get(name, {})} for name in self._c.docs
+                     if fnmatch.fnmatch(name, index)}
+        if not found and "*" not in index:
+            raise NotFoundError(404, "index_not_found_exception", {})
+        return found
+
+    def get_alias(self, name: str) -> Dict:
+        with self._c._lock:
+            target = self._c.aliases.get(name)
+        if target is None:
+            raise NotFoundError(404, "alias_missing", {})
+        return {target: {"aliases": {name: {}}}}
+
+    def update_aliases(self, body: Dict) -> Dict:
+        with self._c._lock:
+            for action in body["actions"]:
+                if "add" in action:
+                    self._c.aliases[action["add"]["alias"]] = action["add"]["index"]
+                elif "remove" in action:
+                    self._c.aliases.pop(action["remove"]["alias"], None)
+                elif "remove_index" in action:
+                    self._c.docs.pop(action["remove_index"]["index"], None)
+        return {"acknowledged": True}
+
+
+class FakeOpenSearch:
+    """In-memory OpenSearch client (documents kept per index, no real scoring)."""
+
+    def __init__(self, bulk_latency_ms: float = 0, search_latency_ms: float = 0, jitter: float = 0.2):
+        self.docs: Dict[str, Dict[str, Dict]] = {}
+        self.mappings: Dict[str, Dict] = {}
+        self.aliases: Dict[str, str] = {}
+        self.calls: Counter = Counter()
+        self.bulk_bytes = 0
+        self.indices = _Indices(self)
+        self.transport = type("Transport", (), {"serializer": JSONSerializer()})()
+        self._bulk_latency = _Latency(bulk_latency_ms, jitter)
+        self._search_latency = _Latency(search_latency_ms, jitter)
+        self._lock = threading.RLock()
+
+    @property
+    def latency_seconds(self) -> float:
+        return self._bulk_latency.seconds + self._search_latency.seconds
+
+    def _resolve(self, index: str) -> str:
+        name = self.aliases.get(index, index)
+        if name not in self.docs:
+            raise NotFoundError(404, "index_not_found_exception", {})
+        return name
+
+    def count(self, index: str) -> Dict:
+        with self._lock:
+            self.calls["count"] += 1
+            return {"count": len(self.docs[self._resolve(index)])}
+
+    def bulk(self, body, index: Optional[str] = None, **kwargs) -> Dict:
+        raw = body if isinstance(body, (str, bytes)) else "\n".join(json.dumps(line) for line in body)
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        lines = [json.loads(line) for line in raw.split("\n") if line]
+        self._bulk_latency.wait()
+
+        items = []
+        with self._lock:
+            self.calls["bulk"] += 1
+            self.bulk_bytes += len(raw)
+            i = 0
+            while i < len(lines):
+                op, meta = next(iter(lines[i].items()))
+                store = self.docs[self._resolve(meta.get("_index", index))]
+                doc_id = meta["_id"]
+                if op == "delete":
+                    status = 200 if store.pop(doc_id, None) is not None else 404
+                    i += 1
+                elif op == "update":
+                    status = 200 if doc_id in store else 404
+                    if status == 200:
+                        store[doc_id].update(lines[i + 1]["doc"])
+                    i += 2
+                else:
+                    status = 200 if doc_id in store else 201
+                    store[doc_id] = lines[i + 1]
+                    i += 2
+                items.append({op: {"_id": doc_id, "status": status}})
+        return {"took": 1, "errors": any(next(iter(it.values()))["status"] >= 300 for it in items), "items": items}
+
+    def search(self, index: str, body: Dict) -> Dict:
+        self._search_latency.wait()
+        with self._lock:
+            self.calls["search"] += 1
+            name = self._resolve(index)
+            query = body.get("query", {"match_all": {}})
+            hits = [
+                {"_index": name, "_id": doc_id, "_score": 1.0, "_source": doc, "sort": [pos]}
+                for pos, (doc_id, doc) in enumerate(self.docs[name].items())
+                if self._matches(query, doc)
+            ]
+        if "search_after" in body:
+            hits = [h for h in hits if h["sort"] > body["search_after"]]
+        return {"hits": {"total": {"value": len(hits)}, "hits": hits[:body.get("size", 10)]}}
+
+    @staticmethod
+    def _matches(query: Dict, doc: Dict) -> bool:
+        if "term" in query:
+            field, value = next(iter(query["term"].items()))
+            return doc.get(field) == value
+        if "terms" in query:
+            field, values = next(iter(query["terms"].items()))
+            return doc.get(field) in values
+        return True
@@ -0,0 +1,218 @@
+"""
+In-memory stand-in for the Google Drive v3 service, for exercising the crawler,
+delta sync and downloads without credentials:
+
+    drive = FakeDriveService()
+    root = drive.add_folder("Sales")
+    drive.add_file("Deck.pdf", root, content=pdf_bytes)
+    config.GOOGLE_DRIVE_FOLDER_IDS = [root]
+    drive_connector.use_service(drive)
+
+Covers what drive_connector calls: files().list (parent / mimeType / trashed
+filters, paging), files().get_media / export_media (ranged media downloads),
+changes().getStartPageToken and changes().list. API calls are counted in `calls`.
+"""
+import re
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _Request:
+    """Mimics googleapiclient.http.HttpRequest.execute()."""
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, num_retries: int = 0):
+        return self._fn()
+
+
+class _MediaResponse(dict):
+    def __init__(self, status: int, headers: Dict):
+        super().__init__(headers)
+        self.status = status
+
+
+class _MediaHttp:
+    """Serves ranged GETs the way MediaIoBaseDownload issues them."""
+
+    def __init__(self, content: bytes):
+        self._content = content
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        start, end = (int(x) for x in headers["range"].split("=", 1)[1].split("-"))
+        body = self._content[start:end + 1]
+        total = len(self._content)
+        if not total:
+            return _MediaResponse(200, {"status": "200", "content-length": "0"}), b""
+        content_range = f"bytes {start}-{start + len(body) - 1}/{total}"
+        return _MediaResponse(206, {"status": "206", "content-range": content_range}), body
+
+
+class _MediaRequest:
+    def __init__(self, content: bytes):
+        self.http = _MediaHttp(content)
+        self.uri = "fake://drive/media"
+        self.headers = {}
+
+
+class _Files:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def list(self, q: str = "", pageSize: int = 100, pageToken: Optional[str] = None, **kwargs):
+        def run():
+            return self._drive._list(q, pageSize, pageToken)
+        return _Request(run)
+
+    def get_media(self, fileId: str, **kwargs):
+        return self._drive._media(fileId)
+
+    def export_media(self, fileId: str, mimeType: str, **kwargs):
+        return self._drive._media(fileId)
+
+
+class _Changes:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        def run():
+            return self._drive._start_page_token()
+        return _Request(run)
+
+    def list(self, pageToken: str, pageSize: int = 100, **kwargs):
+        def run():
+            return self._drive._changes(pageToken, pageSize)
+        return _Request(run)
+
+
+class FakeDriveService:
+    """Thread-safe in-memory Drive with a change log."""
+
+    def __init__(self):
+        self.items: Dict[str, Dict] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.calls: Counter = Counter()
+        self._log: List[str] = []   # file id per change, in order
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    # ── Drive API surface ──
+
+    def files(self) -> _Files:
+        return _Files(self)
+
+    def changes(self) -> _Changes:
+        return _Changes(self)
+
+    # ── mutations (each one is recorded as a change) ──
+
+    def add_folder(self, name: str, parent: Optional[str] = None) -> str:
+        return self._create(name, FOLDER_MIME, parent, b"")
+
+    def add_file(self, name: str, parent: str, mime_type: str = "application/pdf", content: bytes = b"") -> str:
+        return self._create(name, mime_type, parent, content)
+
+    def update_file(self, file_id: str, content: Optional[bytes] = None, name: Optional[str] = None):
+        with self._lock:
+            item = self.items[file_id]
+            if content is not None:
+                self.contents[file_id] = content
+                item["size"] = str(len(content))
+            if name is not None:
+                item["name"] = name
+            self._touch(file_id)
+
+    def move(self, file_id: str, new_parent: str):
+        with self._lock:
+            self.items[file_id]["parents"] = [new_parent]
+            self._touch(file_id)
+
+    def trash(self, file_id: str):
+        with self._lock:
+            self.items[file_id]["trashed"] = True
+            self._touch(file_id)
+
+    def delete(self, file_id: str):
+        with self._lock:
+            self.items.pop(file_id)
+            self.contents.pop(file_id, None)
+            self._log.append(file_id)
+
+    def _create(self, name: str, mime_type: str, parent: Optional[str], content: bytes) -> str:
+        with self._lock:
+            self._next_id += 1
+            file_id = f"fake{self._next_id}"
+            self.items[file_id] = {
+                "id": file_id,
+                "name": name,
+                "mimeType": mime_type,
+                "parents": [parent] if parent else [],
+                "trashed": False,
+                "webViewLink": f"https://drive.example/{file_id}",
+            }
+            if mime_type != FOLDER_MIME:
+                self.contents[file_id] = content
+                self.items[file_id]["size"] = str(len(content))
+            self._touch(file_id)
+            return file_id
+
+    def _touch(self, file_id: str):
+        self.items[file_id]["modifiedTime"] = _now()
+        self._log.append(file_id)
+
+    # ── request handlers ──
+
+    def _list(self, q: str, page_size: int, page_token: Optional[str]) -> Dict:
+        with self._lock:
+            self.calls["files.list"] += 1
+            parents = set(re.findall(r"'([^']+)' in parents", q))
+            mimes = set(re.findall(r"mimeType = '([^']+)'", q))
+            matches = [
+                dict(item) for item in self.items.values()
+                if parents.intersection(item["parents"])
+                and (not mimes or item["mimeType"] in mimes)
+                and not ("trashed = false" in q and item["trashed"])
+            ]
+        start = int(page_token or 0)
+        resp = {"files": matches[start:start + page_size]}
+        if start + page_size < len(matches):
+            resp["nextPageToken"] = str(start + page_size)
+        return resp
+
+    def _media(self, file_id: str) -> _MediaRequest:
+        with self._lock:
+            self.calls["files.media"] += 1
+            return _MediaRequest(self.contents[file_id])
+
+    def _start_page_token(self) -> Dict:
+        with self._lock:
+            self.calls["changes.getStartPageToken"] += 1
+            return {"startPageToken": str(len(self._log))}
+
+    def _changes(self, page_token: str, page_size: int) -> Dict:
+        with self._lock:
+            self.calls["changes.list"] += 1
+            start = int(page_token)
+            window = self._log[start:start + page_size]
+            changes = []
+            for file_id in dict.fromkeys(window):   # latest state, once per file
+                item = self.items.get(file_id)
+                if item is None:
+                    changes.append({"fileId": file_id, "removed": True})
+                else:
+                    changes.append({"fileId": file_id, "removed": False, "file": json.loads(json.dumps(item))})
+            end = start + len(window)
+            if end < len(self._log):
+                return {"changes": changes, "nextPageToken": str(end)}
+            return {"changes": changes, "newStartPageToken": str(end)}
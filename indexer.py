@@ -2,16 +2,26 @@
 Amazon OpenSearch Serverless vector index with Bedrock Titan Embed v2.
 Handles both kNN vector search and BM25 keyword search in a single index.
 """
+import re
 import json
 import time
+import random
 import logging
-from typing import List, Dict, Optional
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Iterable, List, Dict, Optional, Tuple
 
 import boto3
-from opensearchpy import OpenSearch, RequestsHttpConnection, helpers
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+from opensearchpy import NotFoundError, OpenSearch, RequestsHttpConnection, TransportError
 from requests_aws4auth import AWS4Auth
 
 import config
+import embedding_cache
+import query_cache
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +35,18 @@ _drive_links: Dict[str, str] = {}
 
 # ── AWS Clients ─────────────────────────────────────────────────────────────
 
+def use_clients(opensearch=None, bedrock=None):
+    """
+    Route OpenSearch / Bedrock embedding calls to the given clients (e.g. the
+    fake_aws stand-ins) instead of building AWS ones; None leaves a client as is.
+    """
+    global _opensearch_client, _bedrock_client
+    if opensearch is not None:
+        _opensearch_client = opensearch
+    if bedrock is not None:
+        _bedrock_client = bedrock
+
+
 def _get_opensearch_client() -> OpenSearch:
     """Get or create a cached OpenSearch Serverless client with AWS V4 auth."""
     global _opensearch_client
@@ -69,51 +91,256 @@ def _get_bedrock_embed_client():
             region_name=config.AWS_REGION,
             aws_access_key_id=config.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+            config=BotoConfig(
+                max_pool_connections=config.EMBED_MAX_CONCURRENCY,
+                # Throttling and connection errors are retried by _invoke_one so the AIMD limiter sees throttles
+                retries={"total_max_attempts": 1, "mode": "standard"},
+            ),
         )
     return _bedrock_client
 
 
 # ── Embedding ────────────────────────────────────────────────────────────────
 
-def _embed_texts(texts: List[str]) -> List[List[float]]:
+def _embed_texts(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
     """
-    Embed a list of texts using Bedrock Titan Embed v2.
+    Embed a list of texts using Bedrock Titan Embed v2 (at config.EMBEDDING_DIMENSIONS
+    unless given). Texts already in the embedding cache are not sent to Bedrock.
     Returns a list of embedding vectors.
     """
-    client = _get_bedrock_embed_client()
-    vectors = []
-    for text in texts:
-        body = json.dumps({
-            "inputText": text,
-            "dimensions": config.EMBEDDING_DIMENSIONS,
-        })
-        response = client.invoke_model(
-            modelId=config.BEDROCK_EMBED_MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=body,
-        )
-        result = json.loads(response["body"].read())
-        vectors.append(result["embedding"])
+    dimensions = dimensions or config.EMBEDDING_DIMENSIONS
+    vectors = embedding_cache.get_many(texts, dimensions)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = _invoke_titan([texts[i] for i in missing], dimensions)
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        embedding_cache.put_many([texts[i] for i in missing], fresh, dimensions)
     return vectors
 
 
-def embed_query(query: str) -> List[float]:
-    """Embed a single query string (called by retriever for kNN search)."""
-    return _embed_texts([query])[0]
+def two_tier() -> bool:
+    """True when kNN searches compact vectors and rescores against full-size ones."""
+    return 0 < config.EMBEDDING_SEARCH_DIMENSIONS < config.EMBEDDING_DIMENSIONS
+
+
+def search_dimensions() -> int:
+    """Dimension of the vectors in the kNN field."""
+    return config.EMBEDDING_SEARCH_DIMENSIONS if two_tier() else config.EMBEDDING_DIMENSIONS
+
+
+class _AimdLimiter:
+    """
+    Adaptive cap on in-flight Titan requests (additive increase, multiplicative
+    decrease): the limit grows by one after every `limit` successful calls and is
+    halved when Bedrock throttles. Throttles of requests started before the last
+    cut belong to the same congestion event and do not cut again, so a burst of
+    throttled in-flight calls halves the limit once.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.in_flight = 0
+        self.throttles = 0
+        self._successes = 0
+        self._epoch = 0  # bumped on every cut
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        """Wait for a slot; returns the epoch to pass to on_throttle."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_throttle(self, epoch: int):
+        with self._cond:
+            self.throttles += 1
+            self._successes = 0
+            if epoch != self._epoch:
+                return  # already cut for this congestion event
+            self._epoch += 1
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit != self.limit:
+                logger.info("Titan throttled: embedding concurrency %d -> %d", self.limit, new_limit)
+            self.limit = new_limit
+
+
+_embed_limiter = _AimdLimiter(
+    config.EMBED_INITIAL_CONCURRENCY, 1, config.EMBED_MAX_CONCURRENCY,
+)
+_embed_pool: Optional[ThreadPoolExecutor] = None
+_embed_pool_lock = threading.Lock()
+
+_RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+
+def _get_embed_pool() -> ThreadPoolExecutor:
+    global _embed_pool
+    with _embed_pool_lock:
+        if _embed_pool is None:
+            _embed_pool = ThreadPoolExecutor(
+                max_workers=config.EMBED_MAX_CONCURRENCY, thread_name_prefix="titan-embed",
+            )
+    return _embed_pool
+
+
+def _invoke_one(text: str, dimensions: Optional[int] = None) -> List[float]:
+    """
+    One Titan call under the AIMD limiter, retried with full-jitter backoff when
+    throttled or when the connection fails (botocore's own retries are off, see
+    _get_bedrock_embed_client); only throttling lowers the concurrency limit.
+    """
+    client = _get_bedrock_embed_client()
+    body = json.dumps({
+        "inputText": text,
+        "dimensions": dimensions or config.EMBEDDING_DIMENSIONS,
+    })
+
+    for attempt in range(config.EMBED_MAX_RETRIES + 1):
+        epoch = _embed_limiter.acquire()
+        try:
+            response = client.invoke_model(
+                modelId=config.BEDROCK_EMBED_MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=body,
+            )
+            result = json.loads(response["body"].read())
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code", "")
+            if code not in _RETRYABLE_ERRORS or attempt == config.EMBED_MAX_RETRIES:
+                raise
+            _embed_limiter.on_throttle(epoch)
+        except (BotoConnectionError, HTTPClientError) as e:  # endpoint unreachable, read timeout, connection closed
+            if attempt == config.EMBED_MAX_RETRIES:
+                raise
+            logger.warning("Titan connection error (%s), retrying", e)
+        else:
+            _embed_limiter.on_success()
+            return result["embedding"]
+        finally:
+            _embed_limiter.release()
+
+        time.sleep(random.uniform(0, min(20.0, 0.5 * (2 ** attempt))))
+
+    raise RuntimeError("unreachable")
+
+
+def _invoke_titan(texts: List[str], dimensions: Optional[int] = None) -> List[List[float]]:
+    """Embed texts concurrently (one Titan call per text); output order matches input."""
+    if len(texts) == 1:
+        return [_invoke_one(texts[0], dimensions)]
+    pool = _get_embed_pool()
+    return list(pool.map(_invoke_one, texts, [dimensions] * len(texts)))
+
+
+def embedding_client_stats() -> Dict:
+    """Current adaptive concurrency state of the Titan client."""
+    return {
+        "concurrency_limit": _embed_limiter.limit,
+        "in_flight": _embed_limiter.in_flight,
+        "throttles": _embed_limiter.throttles,
+    }
+
+
+def embed_query(query: str, dimensions: Optional[int] = None) -> List[float]:
+    """
+    Embed a single query string (called by retriever for kNN search). With the
+    query cache on, repeated queries skip Titan and the chunk cache.
+    """
+    text = query_cache.normalize(query)
+    if not config.QUERY_CACHE_ENABLED:
+        return _embed_texts([text], dimensions)[0]
+    dimensions = dimensions or config.EMBEDDING_DIMENSIONS
+    vector = query_cache.get(text, dimensions)
+    if vector is None:
+        vector = _invoke_titan([text], dimensions)[0]
+        query_cache.put(text, dimensions, vector)
+    return vector
 
 
 # ── Index Management ─────────────────────────────────────────────────────────
+#
+# config.OPENSEARCH_INDEX_NAME is an alias. Each full rebuild writes a new
+# versioned index ("<alias>-YYYYmmdd-HHMMSS"), then the alias is switched over in
+# one atomic update_aliases call. Queries always read through the alias, so they
+# only ever see a complete generation; the previous one is kept for rollback.
 
-def _ensure_index():
-    """Create the OpenSearch index with kNN mapping if it doesn't exist."""
-    client = _get_opensearch_client()
-    index = config.OPENSEARCH_INDEX_NAME
+_GENERATION_SUFFIX = re.compile(r"-\d{8}-\d{6}$")
 
-    if client.indices.exists(index=index):
-        return
 
-    body = {
+_KNN_ENCODERS = ("none", "fp16", "byte")
+
+
+def _knn_field() -> Dict:
+    """
+    knn_vector mapping from config: HNSW m / ef_construction / ef_search, plus
+    scalar quantization. fp16 uses faiss's SQ encoder (half the memory, server
+    side); byte stores int8 vectors (a quarter), quantized by quantize_vector.
+    """
+    if config.KNN_ENCODER not in _KNN_ENCODERS:
+        raise ValueError(f"KNN_ENCODER must be one of {', '.join(_KNN_ENCODERS)}, not '{config.KNN_ENCODER}'")
+    if two_tier() and config.EMBEDDING_SEARCH_DIMENSIONS not in (256, 512):
+        raise ValueError("EMBEDDING_SEARCH_DIMENSIONS must be 256 or 512 (Titan v2 output sizes)")
+
+    parameters = {"m": config.KNN_HNSW_M, "ef_construction": config.KNN_EF_CONSTRUCTION}
+    if config.KNN_EF_SEARCH > 0:
+        parameters["ef_search"] = config.KNN_EF_SEARCH
+    if config.KNN_ENCODER == "fp16":
+        parameters["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+
+    field = {
+        "type": "knn_vector",
+        "dimension": search_dimensions(),
+        "method": {
+            "name": "hnsw",
+            "space_type": "cosinesimil",
+            "engine": "faiss",
+            "parameters": parameters,
+        },
+    }
+    if config.KNN_ENCODER == "byte":
+        field["data_type"] = "byte"
+    return field
+
+
+def quantize_vector(vector: List[float]) -> List[float]:
+    """
+    Map a vector onto the index's stored type. For byte, components are scaled
+    into [-127, 127] by the largest magnitude (cosine ignores the scale).
+    """
+    if config.KNN_ENCODER != "byte":
+        return vector
+    peak = max((abs(v) for v in vector), default=0.0) or 1.0
+    return [round(v * 127 / peak) for v in vector]
+
+
+def _index_body() -> Dict:
+    """Index settings + kNN mapping for one generation."""
+    return {
         "settings": {
             "index": {
                 "knn": True,
@@ -121,106 +348,459 @@ def _ensure_index():
         },
         "mappings": {
             "properties": {
-                "embedding": {
-                    "type": "knn_vector",
-                    "dimension": config.EMBEDDING_DIMENSIONS,
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "cosinesimil",
-                        "engine": "faiss",
-                    },
-                },
+                "embedding": _knn_field(),
+                # Two-tier mode: full-size vector for exact rescoring; stored only
+                "embedding_full": {"type": "float", "index": False, "doc_values": False},
                 "text": {"type": "text"},
                 "chunk_id": {"type": "keyword"},
+                "file_id": {"type": "keyword"},  # source file (Drive id / local path)
                 "filename": {"type": "keyword"},
                 "doc_type": {"type": "keyword"},
                 "year": {"type": "keyword"},
                 "page": {"type": "integer"},
                 "regions": {"type": "keyword"},  # stored as array of keywords
                 "drive_link": {"type": "keyword", "index": False},
+                # Every (filename, page) a deduplicated chunk appears at; stored only
+                "sources": {"type": "object", "enabled": False},
             }
         },
     }
 
-    client.indices.create(index=index, body=body)
+
+def _wait_for_index(index: str):
+    """Poll until a freshly created index accepts requests (OpenSearch Serverless is eventually consistent)."""
+    client = _get_opensearch_client()
+    deadline = time.time() + config.INDEX_READY_TIMEOUT_SECONDS
+    delay = 0.25
+    while True:
+        try:
+            if client.indices.exists(index=index):
+                client.count(index=index)
+                return
+        except Exception as e:
+            logger.debug("Index '%s' not ready yet: %s", index, e)
+        if time.time() > deadline:
+            raise RuntimeError(f"Index '{index}' did not become ready within {config.INDEX_READY_TIMEOUT_SECONDS}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 2.0)
+
+
+def create_generation() -> str:
+    """Create a new, empty versioned index for a full rebuild. Returns its name."""
+    client = _get_opensearch_client()
+    index = f"{config.OPENSEARCH_INDEX_NAME}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}"
+    while client.indices.exists(index=index):
+        time.sleep(1)  # two rebuilds within the same second
+        index = f"{config.OPENSEARCH_INDEX_NAME}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}"
+
+    client.indices.create(index=index, body=_index_body())
     logger.info("Created OpenSearch index '%s' with kNN mapping, waiting for it to become active...", index)
-    time.sleep(5)  # Give OpenSearch Serverless time to initialize the index
+    _wait_for_index(index)
+    return index
 
 
-# ── Build Index ──────────────────────────────────────────────────────────────
+def list_generations() -> List[str]:
+    """All versioned indices behind the alias, oldest first."""
+    client = _get_opensearch_client()
+    try:
+        indices = client.indices.get(index=f"{config.OPENSEARCH_INDEX_NAME}-*")
+    except NotFoundError:
+        return []
+    prefix = config.OPENSEARCH_INDEX_NAME
+    return sorted(
+        name for name in indices
+        if name.startswith(prefix) and _GENERATION_SUFFIX.fullmatch(name[len(prefix):])
+    )
 
-def build_index(chunks: List[Dict]):
-    """
-    Delete existing docs, embed all chunks, and bulk-index into OpenSearch.
-    """
-    if not chunks:
-        logger.warning("No chunks to index")
-        return
 
+def current_generation() -> Optional[str]:
+    """The index the alias currently points to, or None."""
     client = _get_opensearch_client()
-    index = config.OPENSEARCH_INDEX_NAME
+    try:
+        result = client.indices.get_alias(name=config.OPENSEARCH_INDEX_NAME)
+    except NotFoundError:
+        return None
+    names = sorted(result.keys())
+    return names[-1] if names else None
+
 
-    # Delete and recreate index to clear all existing documents
+def swap_alias(new_index: str):
+    """
+    Atomically point the alias at new_index, then prune generations beyond
+    config.INDEX_GENERATIONS_TO_KEEP (the previous one stays for rollback).
+    """
+    client = _get_opensearch_client()
+    alias = config.OPENSEARCH_INDEX_NAME
+    actions = []
+
+    previous = current_generation()
+    if previous:
+        actions.append({"remove": {"index": previous, "alias": alias}})
+    elif client.indices.exists(index=alias):
+        # Pre-alias deployment: a concrete index occupies the alias name
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+
+    client.indices.update_aliases(body={"actions": actions})
+    logger.info("Alias '%s' now points to '%s' (was '%s')", alias, new_index, previous)
+
+    # Retain the generation we just swapped away from first, then the newest others
+    keep = max(1, config.INDEX_GENERATIONS_TO_KEEP)
+    others = [g for g in reversed(list_generations()) if g not in (new_index, previous)]
+    retained = ([previous] if previous else []) + others
+    for old in retained[keep - 1:]:
+        drop_generation(old)
+
+
+def drop_generation(index: str):
+    """Delete a versioned index that is not (or no longer) behind the alias."""
+    if index == current_generation():
+        raise ValueError(f"Refusing to drop live generation '{index}'")
     try:
-        if client.indices.exists(index=index):
-            client.indices.delete(index=index)
-            logger.info("Deleted existing index '%s'", index)
+        _get_opensearch_client().indices.delete(index=index)
+        logger.info("Deleted index generation '%s'", index)
     except Exception as e:
-        logger.warning("Could not delete index (may not exist): %s", e)
+        logger.warning("Could not delete index generation '%s': %s", index, e)
+
+
+def rollback_generation() -> str:
+    """Point the alias back at the newest generation older than the live one."""
+    live = current_generation()
+    older = [g for g in list_generations() if live is None or g < live]
+    if not older:
+        raise RuntimeError("No previous index generation to roll back to")
+
+    client = _get_opensearch_client()
+    alias = config.OPENSEARCH_INDEX_NAME
+    actions = [{"add": {"index": older[-1], "alias": alias}}]
+    if live:
+        actions.insert(0, {"remove": {"index": live, "alias": alias}})
+    client.indices.update_aliases(body={"actions": actions})
+    logger.info("Rolled alias '%s' back from '%s' to '%s'", alias, live, older[-1])
+    return older[-1]
+
+
+def _ensure_index():
+    """Make sure the alias resolves to an index; bootstraps the first generation."""
+    client = _get_opensearch_client()
+    if client.indices.exists(index=config.OPENSEARCH_INDEX_NAME):
+        return
+    swap_alias(create_generation())
+
+
+# ── Build Index ──────────────────────────────────────────────────────────────
+
+def _chunk_to_doc(chunk: Dict, vector: List[float], search_vector: Optional[List[float]] = None) -> Dict:
+    """
+    Convert a chunker chunk plus its embedding into an OpenSearch document. With a
+    search_vector (two-tier mode) that goes into the kNN field and the full vector
+    is kept alongside for rescoring.
+    """
+    doc = {
+        "embedding": quantize_vector(search_vector if search_vector is not None else vector),
+        "text": chunk["chunk_text"],
+        "chunk_id": chunk["chunk_id"],
+        "file_id": chunk.get("file_id") or chunk["filename"],
+        "filename": chunk["filename"],
+        "doc_type": chunk["doc_type"],
+        "year": chunk.get("year") or "unknown",
+        "page": chunk["page"],
+        "regions": chunk.get("regions", []),  # stored as keyword array directly
+        "drive_link": _drive_links.get(chunk["filename"], ""),
+        "sources": _linked_sources(chunk.get("sources") or [{"filename": chunk["filename"], "page": chunk["page"]}]),
+    }
+    if search_vector is not None:
+        doc["embedding_full"] = vector
+    return doc
+
 
-    _ensure_index()
+def _linked_sources(sources: List[Dict]) -> List[Dict]:
+    return [dict(s, drive_link=_drive_links.get(s["filename"], "")) for s in sources]
 
-    # Embed and index in batches of 25
+
+def embed_chunks(chunks: List[Dict], dimensions: Optional[int] = None) -> List[List[float]]:
+    """Embed chunk texts in batches of 25. Returns vectors in chunk order."""
     batch_size = 25
+    vectors: List[List[float]] = []
+    for i in range(0, len(chunks), batch_size):
+        vectors.extend(_embed_texts([c["chunk_text"] for c in chunks[i:i + batch_size]], dimensions))
+    return vectors
+
+
+def embed_search_vectors(chunks: List[Dict]) -> Optional[List[List[float]]]:
+    """Compact kNN vectors for chunks in two-tier mode, else None."""
+    return embed_chunks(chunks, config.EMBEDDING_SEARCH_DIMENSIONS) if two_tier() else None
+
+
+def bulk_index(chunks: List[Dict], vectors: List[List[float]], index: Optional[str] = None,
+               search_vectors: Optional[List[List[float]]] = None) -> Tuple[int, list]:
+    """
+    Bulk-index already-embedded chunks into `index` (default: the live alias).
+    search_vectors are the compact kNN vectors in two-tier mode.
+    Returns (success_count, errors); each error names the chunk_id that failed.
+    """
+    index = index or config.OPENSEARCH_INDEX_NAME
+    search_vectors = search_vectors or [None] * len(chunks)
+
+    # chunk_id is the document _id: re-indexing a chunk overwrites it instead of duplicating
+    actions = [
+        {"_op_type": "index", "_index": index, "_id": chunk["chunk_id"], "_source": _chunk_to_doc(chunk, vector, sv)}
+        for chunk, vector, sv in zip(chunks, vectors, search_vectors)
+    ]
+
+    # Partial failures are reported per document rather than raised
+    success, errors = _bulk(actions)
+    if errors:
+        logger.warning("  Bulk index errors: %d failed", len(errors))
+    return success, [{"chunk_id": e.pop("_id"), **e} for e in errors]
+
+
+def index_chunks(chunks: List[Dict], index: Optional[str] = None) -> int:
+    """
+    Embed and bulk-index chunks into `index` (default: the live alias), without deletion.
+    The next batch is embedded while the previous one is being written.
+    Returns the number of successfully indexed documents.
+    """
+    if not chunks:
+        return 0
+
+    if index is None:
+        _ensure_index()
+
+    batch_size = 100
     total = len(chunks)
+    indexed = 0
+    in_flight = deque()
+
+    def collect(future, start, end):
+        nonlocal indexed
+        success, _ = future.result()
+        indexed += success
+        logger.info("  Indexed batch %d-%d / %d (%d success)", start, end, total, success)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-writer") as writer:
+        for i in range(0, total, batch_size):
+            batch = chunks[i:i + batch_size]
+            vectors, search_vectors = embed_chunks(batch), embed_search_vectors(batch)
+            in_flight.append((writer.submit(bulk_index, batch, vectors, index, search_vectors), i, i + len(batch)))
+            # Keep at most two embedded batches waiting on the writer
+            while len(in_flight) > 2:
+                collect(*in_flight.popleft())
+        while in_flight:
+            collect(*in_flight.popleft())
+
+    return indexed
+
+
+# ── Bulk writes ─────────────────────────────────────────────────────────────
+#
+# Bulk bodies are split by serialized size (config.BULK_MAX_BYTES) rather than a
+# fixed document count, since 1024-float vectors dominate the payload. Batches
+# go out BULK_CONCURRENCY at a time; documents rejected with 429 / 5xx (or a
+# whole request rejected that way) are retried with full-jitter backoff.
+
+_bulk_pool: Optional[ThreadPoolExecutor] = None
+_bulk_pool_lock = threading.Lock()
+
+_RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def _get_bulk_pool() -> ThreadPoolExecutor:
+    global _bulk_pool
+    with _bulk_pool_lock:
+        if _bulk_pool is None:
+            _bulk_pool = ThreadPoolExecutor(
+                max_workers=max(1, config.BULK_CONCURRENCY), thread_name_prefix="os-bulk",
+            )
+    return _bulk_pool
+
+
+def _serialize_actions(actions: List[Dict]) -> List[Tuple[str, bytes]]:
+    """(_id, NDJSON lines) per action."""
+    dumps = _get_opensearch_client().transport.serializer.dumps
+    lines = []
+    for action in actions:
+        op = action.get("_op_type", "index")
+        meta = {op: {"_index": action["_index"], "_id": action["_id"]}}
+        payload = dumps(meta) + "\n"
+        if op == "update":
+            payload += dumps({"doc": action["doc"]}) + "\n"
+        elif op != "delete":
+            payload += dumps(action["_source"]) + "\n"
+        lines.append((action["_id"], payload.encode("utf-8")))
+    return lines
+
+
+def _size_batches(lines: List[Tuple[str, bytes]]) -> List[List[Tuple[str, bytes]]]:
+    """Group serialized actions into bodies of at most BULK_MAX_BYTES / BULK_MAX_DOCS."""
+    batches, current, size = [], [], 0
+    for line in lines:
+        if current and (size + len(line[1]) > config.BULK_MAX_BYTES or len(current) >= config.BULK_MAX_DOCS):
+            batches.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _send_batch(batch: List[Tuple[str, bytes]]) -> Tuple[int, List[Dict]]:
+    """One _bulk body, retrying throttled documents. Returns (success_count, errors)."""
+    client = _get_opensearch_client()
+    pending = batch
+    success, errors = 0, []
+
+    for attempt in range(config.BULK_MAX_RETRIES + 1):
+        last = attempt == config.BULK_MAX_RETRIES
+        retry = []
+        try:
+            response = client.bulk(body=b"".join(payload for _, payload in pending))
+        except TransportError as e:
+            if e.status_code not in _RETRYABLE_STATUS or last:
+                errors.extend({"_id": _id, "status": e.status_code, "error": str(e.error)} for _id, _ in pending)
+                return success, errors
+            retry = pending
+        else:
+            for item, line in zip(response["items"], pending):
+                result = next(iter(item.values()))
+                status = result.get("status", 500)
+                if 200 <= status < 300:
+                    success += 1
+                elif status in _RETRYABLE_STATUS and not last:
+                    retry.append(line)
+                else:
+                    error = result.get("error")
+                    reason = error.get("type", "") if isinstance(error, dict) else str(error or "")
+                    errors.append({"_id": line[0], "status": status, "error": reason})
+
+        if not retry:
+            break
+        logger.info("  Bulk throttled: retrying %d documents (attempt %d)", len(retry), attempt + 1)
+        pending = retry
+        time.sleep(random.uniform(0, min(10.0, 0.5 * (2 ** attempt))))
+
+    return success, errors
+
+
+def _bulk(actions: List[Dict]) -> Tuple[int, List[Dict]]:
+    """Send actions as size-bounded _bulk requests, several in flight. Returns (success_count, errors)."""
+    if not actions:
+        return 0, []
+    batches = _size_batches(_serialize_actions(actions))
+    if len(batches) == 1:
+        results = [_send_batch(batches[0])]
+    else:
+        results = list(_get_bulk_pool().map(_send_batch, batches))
+    return sum(s for s, _ in results), [e for _, errs in results for e in errs]
+
+
+def _bulk_by_id(actions: List[Dict], what: str) -> int:
+    """Run _id-addressed bulk actions; documents that are already gone are not errors."""
+    success, errors = _bulk(actions)
+    failed = [e for e in errors if e["status"] != 404]
+    if failed:
+        logger.warning("  Bulk %s errors: %d failed", what, len(failed))
+    return success
+
+
+def delete_chunks(chunk_ids: List[str], index: Optional[str] = None) -> int:
+    """Delete indexed documents by chunk_id (their _id). Returns the number deleted."""
+    if not chunk_ids:
+        return 0
 
-    for i in range(0, total, batch_size):
-        batch = chunks[i:i + batch_size]
-        texts = [c["chunk_text"] for c in batch]
-
-        # Embed batch
-        vectors = _embed_texts(texts)
-
-        # Prepare bulk actions
-        actions = []
-        for chunk, vector in zip(batch, vectors):
-            regions = chunk.get("regions", [])
-
-            doc = {
-                "embedding": vector,
-                "text": chunk["chunk_text"],
-                "chunk_id": chunk["chunk_id"],
-                "filename": chunk["filename"],
-                "doc_type": chunk["doc_type"],
-                "year": chunk.get("year") or "unknown",
-                "page": chunk["page"],
-                "regions": regions,  # stored as keyword array directly
-                "drive_link": _drive_links.get(chunk["filename"], ""),
-            }
+    index = index or config.OPENSEARCH_INDEX_NAME
+    deleted = _bulk_by_id(
+        [{"_op_type": "delete", "_index": index, "_id": chunk_id} for chunk_id in chunk_ids], "delete",
+    )
+    logger.info("Deleted %d indexed chunks", deleted)
+    return deleted
+
+
+def update_chunk_sources(sources_by_chunk: Dict[str, List[Dict]], index: Optional[str] = None) -> int:
+    """
+    Replace the `sources` of already-indexed chunks (dedup found more copies after
+    they were written).
+    """
+    if not sources_by_chunk:
+        return 0
+
+    index = index or config.OPENSEARCH_INDEX_NAME
+    updated = _bulk_by_id([
+        {"_op_type": "update", "_index": index, "_id": chunk_id, "doc": {"sources": _linked_sources(sources)}}
+        for chunk_id, sources in sources_by_chunk.items()
+    ], "update")
+    logger.info("Updated sources of %d deduplicated chunks", updated)
+    return updated
+
+
+def document_chunk_ids(file_id: str, index: Optional[str] = None) -> List[str]:
+    """chunk_ids of every indexed document for a source file (paged with search_after)."""
+    client = _get_opensearch_client()
+    body = {
+        "query": {"term": {"file_id": file_id}},
+        "_source": ["chunk_id"],
+        "size": 500,
+        "sort": [{"_doc": "asc"}],
+    }
+    chunk_ids = []
+    while True:
+        hits = client.search(index=index or config.OPENSEARCH_INDEX_NAME, body=body)["hits"]["hits"]
+        if not hits:
+            return chunk_ids
+        chunk_ids.extend(hit["_source"]["chunk_id"] for hit in hits)
+        body["search_after"] = hits[-1]["sort"]
 
-            actions.append({
-                "_index": index,
-                "_source": doc,
-            })
 
-        # Bulk index — raise_on_error=False so partial failures don't crash ingestion
-        success, errors = helpers.bulk(client, actions, refresh=False, raise_on_error=False)
-        logger.info("  Indexed batch %d-%d / %d (%d success)", i, min(i + batch_size, total), total, success)
-        if errors:
-            logger.warning("  Bulk index errors in batch: %d failed", len(errors))
+def upsert_document(file_id: str, chunks: List[Dict], index: Optional[str] = None) -> Dict:
+    """
+    Replace one source file's documents in the index: embed and index its chunks
+    (same chunk_id → overwritten in place), then delete chunks it no longer
+    produces. The old version stays searchable until the new one is written.
+    """
+    index = index or config.OPENSEARCH_INDEX_NAME
+    if index == config.OPENSEARCH_INDEX_NAME:
+        _ensure_index()
+    existing = document_chunk_ids(file_id, index)
+    indexed = index_chunks(chunks, index)
+    keep = {c["chunk_id"] for c in chunks}
+    deleted = delete_chunks([cid for cid in existing if cid not in keep], index)
+    logger.info("Upserted %s: %d chunks indexed, %d stale deleted", file_id, indexed, deleted)
+    return {
+        "file_id": file_id,
+        "indexed_chunks": indexed,
+        "failed_chunks": len(chunks) - indexed,
+        "deleted_chunks": deleted,
+    }
 
-    # OpenSearch Serverless handles refresh automatically (no explicit refresh API)
-    logger.info("OpenSearch index built with %d vectors", total)
+
+def delete_document(file_id: str, known_chunk_ids: Iterable[str] = (), index: Optional[str] = None) -> int:
+    """
+    Delete every indexed document for a source file, plus known_chunk_ids (e.g. the
+    manifest's, covering a partially failed write). Returns the number deleted.
+    """
+    chunk_ids = set(document_chunk_ids(file_id, index)) | set(known_chunk_ids)
+    return delete_chunks(sorted(chunk_ids), index)
 
 
 # ── Query Helpers ────────────────────────────────────────────────────────────
 
+def count_chunks() -> int:
+    """
+    Number of indexed documents; 0 only when the index is confirmed missing.
+    Any other error (auth, throttling, network) is raised.
+    """
+    client = _get_opensearch_client()
+    try:
+        return client.count(index=config.OPENSEARCH_INDEX_NAME)["count"]
+    except NotFoundError:
+        return 0
+
+
 def get_chunk_count() -> int:
-    """Return the number of indexed documents. Works after restart."""
+    """Return the number of indexed documents (0 on any error, for health checks). Works after restart."""
     try:
-        client = _get_opensearch_client()
-        result = client.count(index=config.OPENSEARCH_INDEX_NAME)
-        return result["count"]
+        return count_chunks()
     except Exception:
         return 0
 
@@ -237,7 +817,7 @@ def get_all_chunks() -> List[Dict]:
         chunks = []
         body = {
             "query": {"match_all": {}},
-            "_source": {"excludes": ["embedding"]},
+            "_source": {"excludes": ["embedding", "embedding_full"]},
             "size": 500,
             "sort": [{"_doc": "asc"}],
         }
@@ -269,6 +849,54 @@ def get_all_chunks() -> List[Dict]:
         return []
 
 
+def backfill_embedding_cache() -> int:
+    """
+    Seed the embedding cache from vectors already stored in the live index, so a
+    reindex after a cache loss (or first deployment) does not re-embed anything.
+    Returns the number of vectors written.
+    """
+    # field → dimensions of the vectors it holds (byte-quantized kNN vectors are not usable)
+    fields = {}
+    if config.KNN_ENCODER != "byte":
+        fields["embedding"] = search_dimensions()
+    if two_tier():
+        fields["embedding_full"] = config.EMBEDDING_DIMENSIONS
+    if not fields:
+        logger.warning("Index stores byte-quantized vectors; not backfilling the embedding cache from them")
+        return 0
+
+    client = _get_opensearch_client()
+    body = {
+        "query": {"match_all": {}},
+        "_source": ["text", *fields],
+        "size": 200,
+        "sort": [{"_doc": "asc"}],
+    }
+    written = 0
+
+    while True:
+        response = client.search(index=config.OPENSEARCH_INDEX_NAME, body=body)
+        hits = response["hits"]["hits"]
+        if not hits:
+            break
+
+        for field, dimensions in fields.items():
+            texts, vectors = [], []
+            for hit in hits:
+                src = hit["_source"]
+                vector = src.get(field)
+                if src.get("text") and vector and len(vector) == dimensions:
+                    texts.append(src["text"])
+                    vectors.append(vector)
+            embedding_cache.put_many(texts, vectors, dimensions)
+            written += len(texts)
+
+        body["search_after"] = hits[-1]["sort"]
+
+    logger.info("Backfilled embedding cache with %d vectors from '%s'", written, config.OPENSEARCH_INDEX_NAME)
+    return written
+
+
 # ── Drive Links ──────────────────────────────────────────────────────────────
 
 def set_drive_links(links: Dict[str, str]):
@@ -316,3 +944,11 @@ def get_collection():
     except Exception:
         pass
     return None
+
+
+def get_search_client() -> OpenSearch:
+    """
+    The OpenSearch client without get_collection's document count (a round trip),
+    for query paths that have already checked the index.
+    """
+    return _get_opensearch_client()
@@ -0,0 +1,747 @@
+"""
+Document ingestion pipeline: list → download → extract → chunk → dedup → embed → index.
+
+Incremental by default: the persistent manifest (see manifest.py) is diffed against
+the current file listing so only added, changed or removed files are processed,
+and only their chunks are deleted / re-indexed.
+
+Each stage runs on its own worker threads and hands documents to the next stage
+through a bounded queue, so at most a few documents are held in memory at once and
+every document is searchable as soon as it leaves the index stage. Downloads are
+network-bound threads that stream each file to a temp file, so only paths travel
+between stages and to the workers; extraction and chunking (PyMuPDF, python-docx,
+python-pptx, tiktoken) are dispatched to a process pool.
+
+The API runs ingestion as a background job (start_job); concurrent requests join
+the running job instead of starting a second rebuild.
+"""
+import time
+import uuid
+import queue
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+import drive_connector
+import extractor
+import extraction_cache
+import chunker
+import dedup
+import indexer
+import manifest as manifest_store
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+
+def _detail(filename: str, status: str, chunks: int = 0,
+            doc_type: str = "unknown", year: Optional[str] = None) -> Dict:
+    return {
+        "filename": filename,
+        "doc_type": doc_type,
+        "year": year,
+        "chunks": chunks,
+        "status": status,
+    }
+
+
+def _unchanged_result(file_meta: Dict, previous: Dict, digest: str) -> Dict:
+    entry = manifest_store.make_entry(
+        file_meta, digest, previous.get("chunk_ids", []),
+        previous.get("doc_type", "unknown"), previous.get("year"), previous.get("status", "indexed"),
+        previous.get("peers"),
+    )
+    return {
+        "detail": _detail(file_meta["name"], "unchanged", len(entry["chunk_ids"]), entry["doc_type"], entry["year"]),
+        "entry": entry,
+    }
+
+
+def _chunked_result(file_meta: Dict, digest: str, doc_chunks: Optional[List[Dict]],
+                    doc_type: Optional[str] = None, year: Optional[str] = None) -> Dict:
+    """doc_type / year default to the first chunk's (pass them when dedup left no chunks)."""
+    filename = file_meta["name"]
+    if doc_chunks is None:
+        logger.warning("No text extracted from %s", filename)
+        return {
+            "detail": _detail(filename, "no_text"),
+            "entry": manifest_store.make_entry(file_meta, digest, [], status="no_text"),
+        }
+
+    if doc_type is None:
+        doc_type = doc_chunks[0]["doc_type"] if doc_chunks else "unknown"
+        year = doc_chunks[0].get("year") if doc_chunks else None
+    return {
+        "detail": _detail(filename, "indexed", len(doc_chunks), doc_type, year),
+        "entry": manifest_store.make_entry(
+            file_meta, digest, [c["chunk_id"] for c in doc_chunks], doc_type, year,
+        ),
+    }
+
+
+def _cpu_pool():
+    """Process pool for extraction + chunking (inline executor when disabled)."""
+    if config.INGEST_PROCESS_WORKERS <= 0:
+        return _InlineExecutor()
+    # spawn, not fork: the API process has live threads (uvicorn, boto3 pools)
+    return ProcessPoolExecutor(
+        max_workers=config.INGEST_PROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+class _InlineExecutor:
+    """Executor stand-in that runs tasks synchronously in the calling thread."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+# ── Pipeline stages ─────────────────────────────────────────────────────────
+
+class _Stage:
+    """
+    One pipeline stage: `workers` threads pull items from a bounded inbox, apply
+    `fn`, and push the result to the outbox. `fn` returns None to drop an item
+    (it reached a terminal state early). Time spent waiting on an empty inbox
+    (starved) and blocked on a full outbox (backpressure) is tracked per stage.
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int,
+                 inbox: queue.Queue, outbox: Optional[queue.Queue],
+                 on_error: Callable[[Dict, Exception], None]):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.on_error = on_error
+
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.starved_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self._live = self.workers
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._started = None
+        self._finished = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"ingest-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+        self._finished = time.perf_counter()
+
+    def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            item = self.inbox.get()
+            t1 = time.perf_counter()
+
+            if item is _DONE:
+                self.inbox.put(_DONE)  # let sibling workers see it too
+                with self._lock:
+                    self.starved_seconds += t1 - t0
+                    self._live -= 1
+                    last = self._live == 0
+                if last and self.outbox is not None:
+                    self.outbox.put(_DONE)
+                return
+
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                self.on_error(item, e)
+                result = None
+            t2 = time.perf_counter()
+
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+            t3 = time.perf_counter()
+
+            with self._lock:
+                self.processed += 1
+                self.starved_seconds += t1 - t0
+                self.busy_seconds += t2 - t1
+                self.blocked_seconds += t3 - t2
+
+    def stats(self) -> Dict:
+        elapsed = (self._finished or time.perf_counter()) - self._started if self._started else 0.0
+        with self._lock:
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "processed": self.processed,
+                "per_second": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+                "queued": self.inbox.qsize(),
+                "busy_seconds": round(self.busy_seconds, 2),
+                "starved_seconds": round(self.starved_seconds, 2),
+                "backpressure_seconds": round(self.blocked_seconds, 2),
+            }
+
+
+class _Pipeline:
+    """
+    Streams pending files through the stages and records each file's outcome
+    (detail + manifest entry) as soon as it reaches a terminal state.
+
+    With a target_index (full rebuild) documents go into that new generation and
+    the manifest is only saved once the alias has been switched to it; otherwise
+    they go through the live alias and the manifest is checkpointed as they land.
+    """
+
+    def __init__(self, manifest: Dict, target_index: Optional[str] = None):
+        self.manifest = manifest
+        self.target_index = target_index
+        self.full = target_index is not None
+        self.results: Dict[int, Dict] = {}
+        self.stages: List[_Stage] = []
+        self._lock = threading.Lock()
+        self.deleted_chunks = 0
+        self._last_checkpoint = time.time()
+        self._pool = None
+        self.dedup = dedup.ChunkDeduplicator() if config.DEDUP_ENABLED else None
+        self._indexed_ids: List[str] = []
+        self._orphaned: set = set()
+
+    # ── stage functions (each receives and returns a per-file work dict) ──
+
+    def _download(self, work: Dict) -> Optional[Dict]:
+        file_meta, previous = work["file_meta"], work["previous"]
+        logger.info("Downloading: %s", file_meta["name"])
+        # Streamed to a temp file (or the local file itself): never held in memory
+        path = drive_connector.download_file_to_disk(file_meta)
+        try:
+            work["digest"] = manifest_store.file_hash(path)
+        except Exception:
+            drive_connector.discard_download(path)
+            raise
+
+        unchanged = previous and previous.get("content_hash") == work["digest"] and previous.get("filename") == file_meta["name"]
+        if unchanged and not work.get("force"):
+            drive_connector.discard_download(path)
+            self._finish(work, _unchanged_result(file_meta, previous, work["digest"]))
+            return None
+        work["path"] = path
+        return work
+
+    def _extract(self, work: Dict) -> Dict:
+        path, name = work["path"], work["file_meta"]["name"]
+        try:
+            # Same bytes were parsed before (e.g. re-chunking after a chunk size change)
+            doc = extraction_cache.get(work["digest"], name)
+            if doc is None:
+                ranges = extractor.pdf_page_ranges(path, name)
+                if ranges:
+                    # Large PDF: fan its page ranges out over the shared pool instead of one worker
+                    doc = extractor.extract_pdf_parallel(path, name, ranges, self._pool)
+                else:
+                    doc = self._pool.submit(extractor.extract_text, path, name).result()
+                extraction_cache.put(work["digest"], doc)
+        finally:
+            drive_connector.discard_download(work.pop("path"))
+        work["doc"] = doc if doc["pages"] else None
+        return work
+
+    def _chunk(self, work: Dict) -> Dict:
+        doc = work.pop("doc")
+        work["chunks"] = (
+            self._pool.submit(chunker.chunk_document, doc, work["file_meta"]["id"]).result() if doc else None
+        )
+        return work
+
+    def _dedup(self, work: Dict) -> Dict:
+        chunks = work["chunks"]
+        if chunks:
+            work["doc_type"], work["year"] = chunks[0]["doc_type"], chunks[0].get("year")
+        if chunks and self.dedup is not None:
+            sigs = self._pool.submit(dedup.signatures, [c["chunk_text"] for c in chunks]).result()
+            work["chunks"] = self.dedup.add_document(work["file_meta"]["id"], chunks, sigs)
+            work["deduped"] = True
+        return work
+
+    def _embed(self, work: Dict) -> Dict:
+        if work["chunks"]:
+            work["vectors"] = indexer.embed_chunks(work["chunks"])
+            work["search_vectors"] = indexer.embed_search_vectors(work["chunks"])
+        return work
+
+    def _index(self, work: Dict) -> None:
+        # Write first (same chunk_id → overwritten in place), then delete the chunks
+        # the new version no longer has: the old version stays searchable meanwhile
+        work["writing"] = True
+        errors = []
+        if work["chunks"]:
+            _, errors = indexer.bulk_index(
+                work["chunks"], work.pop("vectors"), self.target_index, work.pop("search_vectors", None),
+            )
+        previous = work["previous"]
+        if previous and not self.full and previous.get("chunk_ids"):
+            stale = set(previous["chunk_ids"]) - {c["chunk_id"] for c in work["chunks"] or []}
+            deleted = indexer.delete_chunks(sorted(stale))
+            with self._lock:
+                self.deleted_chunks += deleted
+        result = _chunked_result(
+            work["file_meta"], work["digest"], work["chunks"], work.get("doc_type"), work.get("year"),
+        )
+        if errors:
+            # Some chunks were rejected: report which, and redo the whole file next run
+            result["detail"]["status"] = f"partial: {len(errors)} of {len(work['chunks'])} chunks not indexed"
+            result["detail"]["index_errors"] = errors
+            manifest_store.invalidate(result["entry"])
+        self._finish(work, result)
+        self._indexed_ids.append(work["file_meta"]["id"])
+        logger.info("Indexed: %s (%d chunks)", work["file_meta"]["name"], len(work["chunks"] or []))
+        return None
+
+    # ── bookkeeping ──
+
+    def _finish(self, work: Dict, result: Dict):
+        with self._lock:
+            self.results[work["pos"]] = result
+            self.manifest["files"][work["file_meta"]["id"]] = result["entry"]
+            if not self.full and time.time() - self._last_checkpoint > config.MANIFEST_CHECKPOINT_SECONDS:
+                manifest_store.save_manifest(self.manifest)
+                self._last_checkpoint = time.time()
+
+    def _fail(self, work: Dict, exc: Exception):
+        file_meta = work["file_meta"]
+        drive_connector.discard_download(work.pop("path", None))
+        if work.get("deduped"):
+            # Files folded into this one's chunks lost their copy: redo them next run
+            orphaned = self.dedup.discard_document(file_meta["id"])
+            with self._lock:
+                self._orphaned |= orphaned
+        logger.error("Failed to process %s: %s", file_meta["name"], exc)
+        with self._lock:
+            self.results[work["pos"]] = {"error": str(exc)}
+            entry = self.manifest["files"].get(file_meta["id"])
+            if entry is not None and (work.get("writing") or work.get("force")):
+                # Part of the new version may be written over the old one, or (for a
+                # file pulled in via shared chunks) its pages may live in a peer's
+                # chunks that are being rebuilt: redo the file next run (its previous
+                # chunk_ids are kept for cleanup)
+                manifest_store.invalidate(entry)
+            # otherwise the previous entry stays as is: keep serving the last good version
+
+    def stats(self) -> List[Dict]:
+        return [stage.stats() for stage in self.stages]
+
+    def finalize(self):
+        """
+        After all stages are done: push sources added to already-indexed canonical
+        chunks, record dedup peers in the manifest, and invalidate files whose
+        folded chunks pointed at a canonical that failed to index.
+        """
+        if self.dedup is None:
+            return
+        late = self.dedup.late_sources()
+        if late:
+            indexer.update_chunk_sources(late, self.target_index)
+        files = self.manifest["files"]
+        for file_id in self._indexed_ids:
+            if file_id in files:
+                files[file_id]["peers"] = self.dedup.peers(file_id)
+        for file_id in self._orphaned:
+            if file_id in files:
+                manifest_store.invalidate(files[file_id])
+        if self.dedup.folded:
+            logger.info("Dedup: %d near-duplicate chunks folded into canonical chunks", self.dedup.folded)
+
+    def run(self, pending: List[Dict]) -> Dict[int, Dict]:
+        """Process pending work items; returns position → result."""
+        if not pending:
+            return self.results
+
+        queues = [queue.Queue(maxsize=config.INGEST_QUEUE_SIZE) for _ in range(6)]
+        cpu_workers = max(1, config.INGEST_PROCESS_WORKERS)
+
+        with _cpu_pool() as pool:
+            self._pool = pool
+            self.stages = [
+                _Stage("download", self._download, config.INGEST_DOWNLOAD_WORKERS, queues[0], queues[1], self._fail),
+                _Stage("extract", self._extract, cpu_workers, queues[1], queues[2], self._fail),
+                _Stage("chunk", self._chunk, cpu_workers, queues[2], queues[3], self._fail),
+                _Stage("dedup", self._dedup, 1, queues[3], queues[4], self._fail),
+                _Stage("embed", self._embed, config.INGEST_EMBED_WORKERS, queues[4], queues[5], self._fail),
+                _Stage("index", self._index, config.INGEST_INDEX_WORKERS, queues[5], None, self._fail),
+            ]
+            for stage in self.stages:
+                stage.start()
+
+            # List stage: feed the listing into the download queue (blocks when full)
+            t0 = time.perf_counter()
+            for work in pending:
+                queues[0].put(work)
+            queues[0].put(_DONE)
+            logger.info("  Stage list     queued=%d backpressure=%.1fs", len(pending), time.perf_counter() - t0)
+
+            for stage in self.stages:
+                stage.join()
+
+        for s in self.stats():
+            logger.info(
+                "  Stage %-8s processed=%d busy=%.1fs starved=%.1fs backpressure=%.1fs",
+                s["stage"], s["processed"], s["busy_seconds"], s["starved_seconds"], s["backpressure_seconds"],
+            )
+        return self.results
+
+
+# ── Entry point ─────────────────────────────────────────────────────────────
+
+def run_ingestion(full: bool = False, job: Optional["IngestionJob"] = None) -> Dict:
+    """
+    Run one ingestion pass (blocking).
+
+    Args:
+        full: ignore the manifest and rebuild the whole index from scratch.
+              Also forced when there is no manifest yet or the index is empty.
+        job: optional background job to report progress to.
+
+    Returns:
+        {"status", "documents_processed", "total_chunks", "details", "changes", "stages"}
+    """
+    start = time.time()
+    logger.info("Starting document ingestion (%s)...", "full" if full else "incremental")
+
+    drive_connector.purge_downloads()  # temp files left by an interrupted run
+
+    # 1. List files
+    if job:
+        job.phase = "listing"
+    files = drive_connector.list_files(full_scan=full)
+    if not files:
+        return {
+            "status": "warning",
+            "documents_processed": 0,
+            "total_chunks": 0,
+            "details": [],
+            "changes": {},
+            "stages": [],
+        }
+
+    manifest = manifest_store.load_manifest()
+    if not full and not manifest["files"]:
+        logger.info("No manifest yet, running a full rebuild")
+        full = True
+    elif not full and indexer.count_chunks() == 0:  # raises (aborting the run) if OpenSearch is unreachable
+        logger.info("Index is empty but manifest is not, falling back to a full rebuild")
+        full = True
+    elif not full and manifest.get("index_generation") != indexer.current_generation():
+        # e.g. after a rollback: the manifest describes a different generation
+        logger.info("Manifest does not match the live index generation, falling back to a full rebuild")
+        full = True
+    target_index = None
+    if full:
+        # Build into a fresh generation; queries keep reading the live one
+        manifest = {"version": manifest_store.MANIFEST_VERSION, "files": {}}
+        target_index = indexer.create_generation()
+
+    plan = manifest_store.plan_changes(files, manifest)
+    # Files sharing deduplicated chunks with a changed file are rebuilt with it
+    forced = manifest_store.expand_peers(plan, manifest)
+    known = dict(manifest["files"])
+    logger.info(
+        "Ingestion plan: %d added, %d modified (%d via shared chunks), %d unchanged, %d removed",
+        len(plan["added"]), len(plan["modified"]), len(forced), len(plan["unchanged"]), len(plan["removed"]),
+    )
+
+    # 2. Drop removed files first
+    stale_chunk_ids = [cid for entry in plan["removed"] for cid in entry.get("chunk_ids", [])]
+    if stale_chunk_ids:
+        indexer.delete_chunks(stale_chunk_ids)
+    for entry in plan["removed"]:
+        logger.info("Removed from source: %s", entry["filename"])
+        manifest["files"].pop(entry["file_id"], None)
+
+    # 3. Stream added / modified files through the pipeline; results are merged
+    #    back in listing order, so details stay deterministic
+    indexer.set_drive_links({f["name"]: f["webViewLink"] for f in files if f.get("webViewLink")})
+    to_process = {f["id"] for f in plan["added"] + plan["modified"]}
+    pending = [
+        {"pos": pos, "file_meta": f, "previous": known.get(f["id"]), "force": f["id"] in forced}
+        for pos, f in enumerate(files) if f["id"] in to_process
+    ]
+    pipeline = _Pipeline(manifest, target_index)
+    if job:
+        job.phase = "processing"
+        job.files_total = len(pending)
+        job.pipeline = pipeline
+    outcomes = pipeline.run(pending)
+    if job:
+        job.phase = "finalizing"
+    pipeline.finalize()
+
+    details = []
+    reindexed_chunks = 0
+    for pos, file_meta in enumerate(files):
+        if file_meta["id"] not in to_process:
+            previous = known[file_meta["id"]]
+            details.append(_detail(
+                previous["filename"], "unchanged", len(previous.get("chunk_ids", [])),
+                previous.get("doc_type", "unknown"), previous.get("year"),
+            ))
+            continue
+
+        result = outcomes[pos]
+        if "error" in result:
+            details.append(_detail(file_meta["name"], f"error: {result['error']}"))
+            continue
+        details.append(result["detail"])
+        if result["detail"]["status"] == "indexed":
+            reindexed_chunks += result["detail"]["chunks"]
+
+    for entry in plan["removed"]:
+        details.append(_detail(entry["filename"], "removed", 0, entry.get("doc_type", "unknown"), entry.get("year")))
+
+    if target_index:
+        if not manifest["files"]:
+            # Nothing made it into the new generation: keep serving the old one
+            logger.warning("Full rebuild produced no documents, keeping the live index generation")
+            indexer.drop_generation(target_index)
+            return {
+                "status": "warning",
+                "documents_processed": 0,
+                "total_chunks": 0,
+                "details": details,
+                "changes": {},
+                "stages": pipeline.stats(),
+            }
+        indexer.swap_alias(target_index)
+        manifest["index_generation"] = target_index
+
+    manifest["last_ingestion"] = datetime.now(timezone.utc).isoformat()
+    manifest_store.save_manifest(manifest)
+
+    total_chunks = sum(len(e.get("chunk_ids", [])) for e in manifest["files"].values())
+    elapsed = time.time() - start
+    logger.info(
+        "Ingestion complete: %d docs, %d new chunks (%d total) in %.1fs",
+        len(details), reindexed_chunks, total_chunks, elapsed,
+    )
+
+    return {
+        "status": "success",
+        "documents_processed": len([d for d in details if d["status"] in ("indexed", "unchanged")]),
+        "total_chunks": total_chunks,
+        "details": details,
+        "changes": {
+            "added": len(plan["added"]),
+            "modified": len(plan["modified"]),
+            "unchanged": len(plan["unchanged"]),
+            "removed": len(plan["removed"]),
+            "reindexed_chunks": reindexed_chunks,
+            "deleted_chunks": len(stale_chunk_ids) + pipeline.deleted_chunks,
+            "deduplicated_chunks": pipeline.dedup.folded if pipeline.dedup else 0,
+        },
+        "stages": pipeline.stats(),
+    }
+
+
+# ── Background jobs ─────────────────────────────────────────────────────────
+
+class IngestionJob:
+    """One background ingestion run with live progress."""
+
+    def __init__(self, full: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.full = full
+        self.status = "running"
+        self.phase = "queued"
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.files_total = 0
+        self.pipeline: Optional[_Pipeline] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+    def snapshot(self) -> Dict:
+        """JSON-serialisable progress view for GET /ingest/{job_id}."""
+        end = self.finished_at or datetime.now(timezone.utc)
+        elapsed = (end - self.started_at).total_seconds()
+        files_done = len(self.pipeline.results) if self.pipeline else 0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "full": self.full,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "files_total": self.files_total,
+            "files_done": files_done,
+            "files_per_second": round(files_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "stages": self.pipeline.stats() if self.pipeline else [],
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+_jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_active_job: Optional[IngestionJob] = None
+
+# Held while the index + manifest are being written (a job run or a single-document operation)
+_write_lock = threading.Lock()
+
+
+def start_job(full: bool = False, on_complete: Optional[Callable[[Dict], None]] = None) -> Tuple[IngestionJob, bool]:
+    """
+    Start ingestion on a background thread, or join the one already running.
+    Returns (job, joined) where joined is True if an existing job was returned.
+    """
+    global _active_job
+    with _jobs_lock:
+        if _active_job is not None and _active_job.status == "running":
+            return _active_job, True
+
+        job = IngestionJob(full)
+        _jobs[job.id] = job
+        while len(_jobs) > config.INGEST_JOB_HISTORY:
+            _jobs.popitem(last=False)
+        _active_job = job
+
+    thread = threading.Thread(target=_run_job, args=(job, on_complete), name=f"ingest-job-{job.id}", daemon=True)
+    thread.start()
+    return job, False
+
+
+def _run_job(job: IngestionJob, on_complete: Optional[Callable[[Dict], None]]):
+    try:
+        with _write_lock:
+            job.result = run_ingestion(full=job.full, job=job)
+        job.status = job.result["status"]
+        if on_complete:
+            on_complete(job.result)
+    except Exception as e:
+        logger.exception("Ingestion job %s failed", job.id)
+        job.error = str(e)
+        job.status = "error"
+    finally:
+        job.phase = "done"
+        job.finished_at = datetime.now(timezone.utc)
+
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+# ── Single documents ────────────────────────────────────────────────────────
+
+class IngestionBusy(RuntimeError):
+    """A single-document change was asked for while an ingestion job holds the index."""
+
+
+class DocumentNotFound(LookupError):
+    """No source file with the requested id."""
+
+
+@contextmanager
+def _exclusive():
+    if not _write_lock.acquire(blocking=False):
+        raise IngestionBusy("An ingestion job is running; try again when it has finished")
+    try:
+        yield
+    finally:
+        _write_lock.release()
+
+
+def _invalidate_peers(manifest: Dict, entry: Optional[Dict]):
+    """Files sharing deduplicated chunks with entry get rebuilt by the next run."""
+    for peer in (entry or {}).get("peers", []):
+        if peer in manifest["files"]:
+            manifest_store.invalidate(manifest["files"][peer])
+
+
+def reingest_document(file_id: str) -> Dict:
+    """
+    Download, extract, chunk and upsert one source file by id (Drive file id, or
+    the path under local_docs/) without an ingestion run, e.g. after fixing a
+    mis-extracted file, and update its manifest entry. Only this file is
+    deduplicated; files that shared chunks with it are invalidated so the next
+    run rebuilds them together.
+    """
+    with _exclusive():
+        files = drive_connector.list_files()
+        file_meta = next((f for f in files if f["id"] == file_id), None)
+        if file_meta is None:
+            raise DocumentNotFound(f"No source file with id '{file_id}'")
+        indexer.set_drive_links({f["name"]: f["webViewLink"] for f in files if f.get("webViewLink")})
+        filename = file_meta["name"]
+
+        path = drive_connector.download_file_to_disk(file_meta)
+        try:
+            digest = manifest_store.file_hash(path)
+            doc = extraction_cache.get(digest, filename)
+            if doc is None:
+                doc = extractor.extract_text(path, filename)
+                extraction_cache.put(digest, doc)
+        finally:
+            drive_connector.discard_download(path)
+
+        chunks = chunker.chunk_document(doc, file_id) if doc["pages"] else None
+        doc_type, year = (chunks[0]["doc_type"], chunks[0].get("year")) if chunks else (None, None)
+        if chunks and config.DEDUP_ENABLED:
+            chunks = dedup.deduplicate(chunks)
+        # Chunk ids derive from the file id, so a renamed file is overwritten in place too
+        result = indexer.upsert_document(file_id, chunks or [])
+        result["filename"] = filename
+
+        manifest = manifest_store.load_manifest()
+        _invalidate_peers(manifest, manifest["files"].get(file_id))
+        entry = _chunked_result(file_meta, digest, chunks, doc_type, year)["entry"]
+        if result["failed_chunks"]:
+            manifest_store.invalidate(entry)  # the next run retries it
+        manifest["files"][file_id] = entry
+        manifest_store.save_manifest(manifest)
+
+    if chunks is None:
+        result["status"] = "no_text"
+    else:
+        result["status"] = "partial" if result["failed_chunks"] else "indexed"
+    return result
+
+
+def remove_document(file_id: str) -> Dict:
+    """
+    Delete one source file's chunks from the index. Its manifest entry is kept
+    (with no chunks) so incremental runs leave it out until the source file
+    changes or a full rebuild runs.
+    """
+    with _exclusive():
+        manifest = manifest_store.load_manifest()
+        entry = manifest["files"].get(file_id)
+        # Indexed chunks plus any the manifest still knows of (e.g. a partially failed write)
+        deleted = indexer.delete_document(file_id, (entry or {}).get("chunk_ids", []))
+        if entry is not None:
+            _invalidate_peers(manifest, entry)
+            entry.update(chunk_ids=[], peers=[], status="removed")
+        manifest_store.save_manifest(manifest)
+    return {"file_id": file_id, "filename": (entry or {}).get("filename"), "deleted_chunks": deleted}
@@ -0,0 +1,152 @@
+"""
+Precompiled multi-keyword matching for metadata detection (regions, doc types).
+
+Each KeywordMatcher compiles its whole vocabulary into one trie-shaped regex, so a
+text is scanned once regardless of how many keywords there are, instead of once per
+keyword. The matchers are built at import time and shared by the chunker (document
+metadata) and the retriever (query filters).
+"""
+import re
+from typing import Dict, List, Optional, Set
+
+_WORD = re.compile(r"\w")
+
+
+# ── Vocabularies ────────────────────────────────────────────────────────────
+
+REGION_KEYWORDS = {
+    "south india": [
+        "tamil nadu", "chennai", "karnataka", "bangalore", "bengaluru",
+        "kerala", "kochi", "thiruvananthapuram", "andhra pradesh",
+        "hyderabad", "telangana", "south india", "south indian", "coimbatore",
+        "mysore", "madurai", "visakhapatnam", "vijayawada",
+    ],
+    "north india": [
+        "delhi", "ncr", "uttar pradesh", "haryana", "gurgaon", "gurugram",
+        "noida", "punjab", "rajasthan", "north india", "north indian", "lucknow",
+        "jaipur", "chandigarh",
+    ],
+    "west india": [
+        "mumbai", "maharashtra", "pune", "gujarat", "ahmedabad",
+        "surat", "goa", "west india", "west indian",
+    ],
+    "east india": [
+        "kolkata", "west bengal", "odisha", "bhubaneswar",
+        "bihar", "jharkhand", "east india", "east indian",
+    ],
+}
+
+# Filename cues, in priority order (first matching type wins)
+FILENAME_DOC_TYPE_KEYWORDS = {
+    "case_study": [
+        "case study", "case-study", "case_study", "case studies",
+        "success story", "success stories", " ss ", "ss_",
+        "gadgeon ss", "gadgeon_ss",
+    ],
+    "whitepaper": ["whitepaper", "white paper", "white-paper"],
+    "proposal": ["proposal"],
+    "pitch_deck": ["pitch", "deck"],
+    "service_presentation": [
+        "offering", "services", "overview", "corp overview",
+        "engineering stack", "delivery model",
+        "execution", "governance", "engineering",
+        "monitoring", "analytics", "platform",
+        "medical device", "e-mobility", "edge",
+        "remote", "radar", "robotic", "drone",
+        "pharma", "telehealth", "iot", "ai",
+        "product engineering",
+    ],
+}
+
+# Query cues, in priority order
+QUERY_DOC_TYPE_KEYWORDS = {
+    "case_study": ["case study", "case studies", "case-study", "success story", "success stories"],
+    "whitepaper": ["whitepaper", "white paper", "whitepapers", "white papers"],
+    "proposal": ["proposal", "proposals"],
+    "pitch_deck": ["pitch", "deck", "pitch deck"],
+    "service_presentation": ["service presentation", "offerings", "service overview"],
+}
+
+
+# ── Matcher ─────────────────────────────────────────────────────────────────
+
+class KeywordMatcher:
+    """
+    Case-insensitive matcher over labelled keyword groups.
+
+    With word_boundary=True a keyword only matches as a whole word ("goa" does not
+    match "goals"); a boundary is only required on edges where the keyword itself
+    starts or ends with a word character, so keywords like " ss " still work.
+    Group order is the label priority used by first().
+    """
+
+    def __init__(self, groups: Dict[str, List[str]], word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        self._priority = {label: i for i, label in enumerate(groups)}
+        self._labels: Dict[str, Set[str]] = {}
+        for label, keywords in groups.items():
+            for kw in keywords:
+                self._labels.setdefault(kw.lower(), set()).add(label)
+
+        # The regex returns the longest keyword at each position; also credit
+        # shorter keywords that are prefixes of it (and would match on their own)
+        self._hit_labels: Dict[str, Set[str]] = {}
+        for kw in self._labels:
+            labels = set()
+            for prefix, prefix_labels in self._labels.items():
+                if kw.startswith(prefix) and self._prefix_matches(prefix, kw):
+                    labels |= prefix_labels
+            self._hit_labels[kw] = labels
+
+        # Zero-width lookahead so overlapping keywords are all seen in one pass
+        self._pattern = re.compile("(?=(%s))" % self._build(self._trie()))
+
+    def _prefix_matches(self, prefix: str, kw: str) -> bool:
+        if len(prefix) == len(kw) or not self.word_boundary:
+            return True
+        return not (_WORD.match(prefix[-1]) and _WORD.match(kw[len(prefix)]))
+
+    def _trie(self) -> Dict:
+        root: Dict = {}
+        for kw in self._labels:
+            node = root
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = kw
+        return root
+
+    def _build(self, node: Dict, depth: int = 0) -> str:
+        alternatives = []
+        for ch in sorted(k for k in node if k):
+            edge = re.escape(ch)
+            if depth == 0 and self.word_boundary and _WORD.match(ch):
+                edge = r"\b" + edge
+            alternatives.append(edge + self._build(node[ch], depth + 1))
+        if "" in node:
+            # Keyword ends here; listed last so longer keywords are preferred
+            ends_in_word = _WORD.match(node[""][-1])
+            alternatives.append(r"\b" if self.word_boundary and ends_in_word else "")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:%s)" % "|".join(alternatives)
+
+    def labels(self, text: str) -> Set[str]:
+        """All labels with at least one keyword in text."""
+        found: Set[str] = set()
+        for m in self._pattern.finditer(text.lower()):
+            found |= self._hit_labels[m.group(1)]
+            if len(found) == len(self._priority):
+                break
+        return found
+
+    def first(self, text: str) -> Optional[str]:
+        """Highest-priority label found in text, or None."""
+        found = self.labels(text)
+        if not found:
+            return None
+        return min(found, key=self._priority.__getitem__)
+
+
+REGION_MATCHER = KeywordMatcher(REGION_KEYWORDS, word_boundary=True)
+FILENAME_DOC_TYPE_MATCHER = KeywordMatcher(FILENAME_DOC_TYPE_KEYWORDS)
+QUERY_DOC_TYPE_MATCHER = KeywordMatcher(QUERY_DOC_TYPE_KEYWORDS)
@@ -0,0 +1,204 @@
+"""
+Watch mode for the local_docs/ connector.
+
+Watches config.LOCAL_DOCS_DIR for added, changed, moved or deleted documents and,
+once events have been quiet for LOCAL_WATCH_DEBOUNCE_SECONDS, starts an incremental
+ingestion job. The manifest diff means only the affected files are re-extracted,
+chunked and embedded. Uses watchdog (inotify on Linux) when installed and falls
+back to polling file mtimes / sizes otherwise.
+"""
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import config
+import drive_connector
+import ingestion
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+
+def _relevant(path: str, is_directory: bool = False) -> bool:
+    # Directory events matter too: a folder moved in or out carries files with it
+    if is_directory:
+        return True
+    name = os.path.basename(path)
+    return not name.startswith("~$") and os.path.splitext(name)[1].lower() in drive_connector.LOCAL_EXTENSIONS
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "LocalDocsWatcher"):
+        super().__init__()
+        self._watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path and _relevant(path, event.is_directory):
+                self._watcher.notify(path)
+
+
+class LocalDocsWatcher:
+    """
+    Collects file events for a directory and triggers debounced incremental
+    ingestion runs. If a run is already in progress when the quiet period ends,
+    the watcher waits for it and then starts another one, because the running
+    job may have listed the folder before the change.
+    """
+
+    def __init__(self, docs_dir: str = None, on_complete: Optional[Callable[[Dict], None]] = None):
+        self.docs_dir = docs_dir or config.LOCAL_DOCS_DIR
+        self.on_complete = on_complete
+        self.backend = "inotify" if Observer is not None else "polling"
+        self.events = 0
+        self.runs = 0
+        self.last_job_id: Optional[str] = None
+        self._dirty: Set[str] = set()
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+        self._threads = []
+
+    def start(self):
+        os.makedirs(self.docs_dir, exist_ok=True)
+        if Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.docs_dir, recursive=True)
+            self._observer.start()
+        else:
+            self._spawn(self._poll_loop, "local-watch-poll")
+        self._spawn(self._trigger_loop, "local-watch-trigger")
+        logger.info("Watching %s for document changes (%s)", self.docs_dir, self.backend)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for t in self._threads:
+            t.join()
+
+    def notify(self, path: str):
+        """Record a changed path and restart the quiet period."""
+        with self._cond:
+            self._dirty.add(path)
+            self._last_event = time.monotonic()
+            self.events += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            pending = len(self._dirty)
+        return {
+            "docs_dir": self.docs_dir,
+            "backend": self.backend,
+            "events": self.events,
+            "pending_paths": pending,
+            "runs": self.runs,
+            "last_job_id": self.last_job_id,
+        }
+
+    def _spawn(self, target: Callable, name: str):
+        t = threading.Thread(target=target, name=name, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    # ── debounce + trigger ──
+
+    def _wait_for_quiet(self) -> Optional[Set[str]]:
+        """Block until there are changes and no new event for the debounce period."""
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._dirty:
+                    self._cond.wait()
+                    continue
+                quiet_for = time.monotonic() - self._last_event
+                if quiet_for >= config.LOCAL_WATCH_DEBOUNCE_SECONDS:
+                    paths, self._dirty = self._dirty, set()
+                    return paths
+                self._cond.wait(config.LOCAL_WATCH_DEBOUNCE_SECONDS - quiet_for)
+        return None
+
+    def _trigger_loop(self):
+        while True:
+            paths = self._wait_for_quiet()
+            if paths is None:
+                return
+            job, joined = ingestion.start_job(full=False, on_complete=self.on_complete)
+            self.last_job_id = job.id
+            if not joined:
+                self.runs += 1
+                logger.info("Local docs changed (%d path(s)), started ingestion job %s", len(paths), job.id)
+                continue
+            # Another run was already going: re-queue and go again once it is done
+            with self._cond:
+                self._dirty |= paths
+            while job.status == "running" and not self._stop.is_set():
+                self._stop.wait(0.5)
+
+    # ── polling fallback ──
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for root, _, names in os.walk(self.docs_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if not _relevant(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _poll_loop(self):
+        previous = self._snapshot()
+        while not self._stop.wait(config.LOCAL_WATCH_POLL_SECONDS):
+            current = self._snapshot()
+            for path in previous.keys() | current.keys():
+                if previous.get(path) != current.get(path):
+                    self.notify(path)
+            previous = current
+
+
+_watcher: Optional[LocalDocsWatcher] = None
+
+
+def start_watcher(on_complete: Optional[Callable[[Dict], None]] = None) -> Optional[LocalDocsWatcher]:
+    """Start the module-level watcher (no-op when documents come from Google Drive)."""
+    global _watcher
+    if _watcher is not None:
+        return _watcher
+    if drive_connector.drive_enabled():
+        logger.info("Google Drive is configured; local_docs watch mode not started")
+        return None
+    _watcher = LocalDocsWatcher(on_complete=on_complete)
+    _watcher.start()
+    return _watcher
+
+
+def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
+
+
+def watcher_stats() -> Dict:
+    if _watcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **_watcher.stats()}
@@ -6,6 +6,7 @@ import sys
 import time
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -18,10 +19,12 @@ import uvicorn
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import config
-import drive_connector
-import extractor
-import chunker
+import embedding_cache
+import extraction_cache
 import indexer
+import ingestion
+import local_watcher
+import query_cache
 import retriever
 import agent
 import guardrails
@@ -36,10 +39,19 @@ logger = logging.getLogger("sales_copilot")
 logger.info("Bedrock LLM model: %s (region: %s)", config.BEDROCK_MODEL_ID, config.BEDROCK_LLM_REGION)
 
 # ── App ─────────────────────────────────────────────────────────────────────
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.LOCAL_WATCH_ENABLED:
+        local_watcher.start_watcher(on_complete=_record_ingestion)
+    yield
+    local_watcher.stop_watcher()
+
+
 app = FastAPI(
     title="Sales Co-Pilot API",
     description="AI-powered sales assistant with RAG over proposals, case studies & whitepapers",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -97,10 +109,26 @@ class HistoryResponse(BaseModel):
 
 
 class IngestResponse(BaseModel):
+    job_id: str
     status: str
-    documents_processed: int
-    total_chunks: int
-    details: list
+    joined: bool
+    full: bool
+
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
+    phase: str
+    full: bool
+    started_at: str
+    finished_at: Optional[str]
+    elapsed_seconds: float
+    files_total: int
+    files_done: int
+    files_per_second: float
+    stages: list
+    result: Optional[dict]
+    error: Optional[str]
 
 
 class PipelineResponse(BaseModel):
@@ -149,110 +177,42 @@ async def get_session_history(session_id: str):
     }
 
 
-@app.post("/ingest", response_model=IngestResponse)
-async def ingest():
-    """
-    Triggers document ingestion from Google Drive (or local fallback).
-    Downloads files, extracts text, chunks, embeds, and indexes.
-    """
-    start = time.time()
-    logger.info("Starting document ingestion...")
-
-    try:
-        # 1. List files
-        files = drive_connector.list_files()
-        if not files:
-            return {
-                "status": "warning",
-                "documents_processed": 0,
-                "total_chunks": 0,
-                "details": [],
-            }
-
-        # 2. Process each file
-        all_chunks = []
-        details = []
-        drive_links = {}
-
-        for file_meta in files:
-            filename = file_meta["name"]
-            logger.info("Processing: %s", filename)
-
-            try:
-                # Download
-                file_bytes = drive_connector.download_file(file_meta)
-
-                # Extract text
-                doc = extractor.extract_text(file_bytes, filename)
-                if not doc["pages"]:
-                    logger.warning("No text extracted from %s", filename)
-                    details.append({
-                        "filename": filename,
-                        "doc_type": "unknown",
-                        "year": None,
-                        "chunks": 0,
-                        "status": "no_text",
-                    })
-                    continue
-
-                # Chunk
-                doc_chunks = chunker.chunk_document(doc)
-                all_chunks.extend(doc_chunks)
-
-                # Store drive link
-                if file_meta.get("webViewLink"):
-                    drive_links[filename] = file_meta["webViewLink"]
-
-                # Record detail
-                doc_type = doc_chunks[0]["doc_type"] if doc_chunks else "unknown"
-                year = doc_chunks[0].get("year") if doc_chunks else None
-                details.append({
-                    "filename": filename,
-                    "doc_type": doc_type,
-                    "year": year,
-                    "chunks": len(doc_chunks),
-                    "status": "indexed",
-                })
-
-            except Exception as e:
-                logger.error("Failed to process %s: %s", filename, e)
-                details.append({
-                    "filename": filename,
-                    "doc_type": "unknown",
-                    "year": None,
-                    "chunks": 0,
-                    "status": f"error: {str(e)}",
-                })
-
-        # 3. Build index
-        if all_chunks:
-            indexer.set_drive_links(drive_links)
-            indexer.build_index(all_chunks)
-
-        elapsed = time.time() - start
-        logger.info(
-            "Ingestion complete: %d docs, %d chunks in %.1fs",
-            len(details), len(all_chunks), elapsed,
-        )
-
-        # Update state
+def _record_ingestion(result: dict):
+    """Job completion callback: keep the last successful run for /admin/pipeline."""
+    if result["status"] == "success":
         _ingestion_state.update({
             "last_ingestion": datetime.now(timezone.utc).isoformat(),
-            "documents_processed": len([d for d in details if d["status"] == "indexed"]),
-            "total_chunks": len(all_chunks),
-            "details": details,
+            "documents_processed": result["documents_processed"],
+            "total_chunks": result["total_chunks"],
+            "details": result["details"],
         })
 
-        return {
-            "status": "success",
-            "documents_processed": _ingestion_state["documents_processed"],
-            "total_chunks": len(all_chunks),
-            "details": details,
-        }
 
-    except Exception as e:
-        logger.error("Ingestion failed: %s", e)
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
+@app.post("/ingest", response_model=IngestResponse, status_code=202)
+async def ingest(full: bool = False):
+    """
+    Starts document ingestion from Google Drive (or local fallback) as a background
+    job and returns its id immediately. Only files added, changed or removed since
+    the last run are processed; pass ?full=true to rebuild the whole index.
+    If a job is already running, the request joins it instead of starting another.
+    """
+    job, joined = ingestion.start_job(full=full, on_complete=_record_ingestion)
+    logger.info("Ingestion job %s %s", job.id, "joined" if joined else "started")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "joined": joined,
+        "full": job.full,
+    }
+
+
+@app.get("/ingest/{job_id}", response_model=IngestJobResponse)
+async def ingest_status(job_id: str):
+    """Returns per-stage progress and throughput of an ingestion job (and its result once finished)."""
+    job = ingestion.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.snapshot()
 
 
 @app.post("/query", response_model=QueryResponse)
@@ -323,6 +283,84 @@ async def admin_pipeline():
     }
 
 
+@app.get("/admin/index")
+async def admin_index():
+    """Lists index generations behind the alias and which one is live."""
+    return {
+        "alias": config.OPENSEARCH_INDEX_NAME,
+        "live": indexer.current_generation(),
+        "generations": indexer.list_generations(),
+    }
+
+
+@app.post("/admin/index/rollback")
+async def admin_index_rollback():
+    """Points the alias back at the previous index generation."""
+    try:
+        live = indexer.rollback_generation()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "alias": config.OPENSEARCH_INDEX_NAME,
+        "live": live,
+        "generations": indexer.list_generations(),
+    }
+
+
+@app.get("/admin/cache")
+async def admin_cache():
+    """Embedding, query and extraction cache hit rates and sizes, plus the Titan client's adaptive concurrency."""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "embedding_client": indexer.embedding_client_stats(),
+    }
+
+
+@app.post("/admin/cache/backfill")
+async def admin_cache_backfill():
+    """Seeds the embedding cache from vectors already stored in the live index."""
+    try:
+        written = await asyncio.get_running_loop().run_in_executor(None, indexer.backfill_embedding_cache)
+    except Exception as e:
+        logger.error("Embedding cache backfill failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Backfill failed: {str(e)}")
+    return {"backfilled": written, "embedding_cache": embedding_cache.stats()}
+
+
+@app.put("/admin/documents/{file_id:path}")
+async def admin_upsert_document(file_id: str):
+    """Re-extracts, re-chunks and re-indexes one source file (by Drive file id or local path) in place."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, ingestion.reingest_document, file_id)
+    except ingestion.DocumentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ingestion.IngestionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Re-ingesting %s failed: %s", file_id, e)
+        raise HTTPException(status_code=500, detail=f"Re-ingest failed: {str(e)}")
+
+
+@app.delete("/admin/documents/{file_id:path}")
+async def admin_delete_document(file_id: str):
+    """Removes one source file's chunks from the index; it stays out until the source file changes."""
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, ingestion.remove_document, file_id)
+    except ingestion.IngestionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error("Deleting %s failed: %s", file_id, e)
+        raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
+
+
+@app.get("/admin/watcher")
+async def admin_watcher():
+    """Local docs watch mode status (backend, events seen, runs triggered)."""
+    return local_watcher.watcher_stats()
+
+
 # ── Startup ─────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+"""
+Persistent document manifest for incremental ingestion.
+
+One entry per source file (keyed by Drive file id / path under local_docs/) recording the
+Drive metadata, content hash and the chunk ids currently indexed for it, so a run
+only re-processes files that were added, changed or removed since the last one.
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 2: chunk_id became the OpenSearch _id (older indexes need one full rebuild)
+# 3: local files keyed by relative path, chunk ids derived from the source file id,
+#    entries record peers (files sharing deduplicated chunks)
+MANIFEST_VERSION = 3
+
+
+def _empty() -> Dict:
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+
+def load_manifest(path: str = None) -> Dict:
+    """Load the manifest from disk. Missing or unreadable files yield an empty manifest."""
+    path = Path(path or config.MANIFEST_PATH)
+    if not path.exists():
+        return _empty()
+    try:
+        data = json.loads(path.read_text())
+    except Exception as e:
+        logger.warning("Could not read manifest %s (%s), starting fresh", path, e)
+        return _empty()
+    if data.get("version") != MANIFEST_VERSION:
+        logger.warning("Manifest version mismatch (%s), starting fresh", data.get("version"))
+        return _empty()
+    data.setdefault("files", {})
+    return data
+
+
+def save_manifest(manifest: Dict, path: str = None):
+    """Atomically write the manifest (write to temp file, then rename)."""
+    path = Path(path or config.MANIFEST_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def file_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file on disk, streamed in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_entry(
+    file_meta: Dict,
+    content_hash: Optional[str],
+    chunk_ids: List[str],
+    doc_type: str = "unknown",
+    year: Optional[str] = None,
+    status: str = "indexed",
+    peers: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Build a manifest entry from Drive-like file metadata and processing results.
+    peers are the files sharing deduplicated chunks with this one (see dedup.py).
+    """
+    return {
+        "file_id": file_meta["id"],
+        "filename": file_meta["name"],
+        "modified_time": file_meta.get("modifiedTime"),
+        "size": _size(file_meta),
+        "content_hash": content_hash,
+        "chunk_ids": list(chunk_ids),
+        "drive_link": file_meta.get("webViewLink") or "",
+        "doc_type": doc_type,
+        "year": year,
+        "status": status,
+        "peers": list(peers or []),
+    }
+
+
+def _size(file_meta: Dict) -> Optional[str]:
+    # Drive returns size as a string; local files report an int
+    size = file_meta.get("size")
+    return str(size) if size is not None else None
+
+
+def is_modified(file_meta: Dict, entry: Dict) -> bool:
+    """True when listing metadata differs from the manifest (or cannot be compared)."""
+    if entry.get("filename") != file_meta["name"]:
+        return True
+    modified = file_meta.get("modifiedTime")
+    if not modified or modified != entry.get("modified_time"):
+        return True
+    return _size(file_meta) != entry.get("size")
+
+
+def invalidate(entry: Dict):
+    """Force the file to be reprocessed next run, keeping its chunk ids for cleanup."""
+    entry["modified_time"] = None
+    entry["content_hash"] = None
+
+
+def expand_peers(plan: Dict[str, List], manifest: Dict) -> Set[str]:
+    """
+    Move unchanged files that share deduplicated chunks (transitively) with an
+    added, modified or removed file into plan["modified"], so the shared chunks are
+    rebuilt together. Returns the ids moved (their content hash alone must not
+    short-circuit reprocessing).
+    """
+    known = manifest.get("files", {})
+    frontier = [e["file_id"] for e in plan["removed"]]
+    frontier += [f["id"] for f in plan["added"] + plan["modified"]]
+    reached: Set[str] = set()
+    while frontier:
+        file_id = frontier.pop()
+        for peer in known.get(file_id, {}).get("peers", []):
+            if peer not in reached:
+                reached.add(peer)
+                frontier.append(peer)
+
+    forced = set()
+    still_unchanged = []
+    for file_meta in plan["unchanged"]:
+        if file_meta["id"] in reached:
+            plan["modified"].append(file_meta)
+            forced.add(file_meta["id"])
+        else:
+            still_unchanged.append(file_meta)
+    plan["unchanged"] = still_unchanged
+    return forced
+
+
+def plan_changes(files: List[Dict], manifest: Dict) -> Dict[str, List]:
+    """
+    Diff the current file listing against the manifest.
+
+    Returns:
+        {
+            "added":     [file_meta, ...],   # not in manifest
+            "modified":  [file_meta, ...],   # metadata changed (content may still match)
+            "unchanged": [file_meta, ...],   # metadata identical
+            "removed":   [entry, ...],       # in manifest but no longer listed
+        }
+    """
+    known = manifest.get("files", {})
+    plan = {"added": [], "modified": [], "unchanged": [], "removed": []}
+    listed = set()
+
+    for file_meta in files:
+        listed.add(file_meta["id"])
+        entry = known.get(file_meta["id"])
+        if entry is None:
+            plan["added"].append(file_meta)
+        elif is_modified(file_meta, entry):
+            plan["modified"].append(file_meta)
+        else:
+            plan["unchanged"].append(file_meta)
+
+    for file_id, entry in known.items():
+        if file_id not in listed:
+            plan["removed"].append(entry)
+
+    return plan
@@ -0,0 +1,162 @@
+"""
+Query embedding cache.
+
+Sales users ask the same questions over and over (demo scripts, the golden Q&A
+set), and every query embedding is a Titan round trip. Vectors are kept per query
+(whitespace collapsed, which is also what gets embedded with the cache off, so
+caching never changes a vector; case is kept, as "AI" and "ai" embed differently)
+in an in-process LRU with a TTL. Setting config.QUERY_CACHE_PATH adds a SQLite
+tier shared by all workers on the host: an in-process miss looks there before
+calling Bedrock.
+"""
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import config
+import embedding_cache
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()  # key -> (vector, stored_at)
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+_writes_since_prune = 0
+_local = threading.local()
+
+# Drop expired rows from the shared tier every this many writes
+_PRUNE_EVERY = 200
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+def _key(text: str, dimensions: int) -> str:
+    return embedding_cache.cache_key(text, dimensions=dimensions)
+
+
+def _connect() -> sqlite3.Connection:
+    """One connection per thread (sqlite3 connections are not thread-safe)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        path = Path(config.QUERY_CACHE_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")  # concurrent readers across workers
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+
+def _disk_get(key: str, now: float) -> Optional[Tuple[List[float], float]]:
+    try:
+        row = _connect().execute(
+            "SELECT vector, stored_at FROM query_embeddings WHERE key = ? AND stored_at > ?",
+            (key, now - config.QUERY_CACHE_TTL_SECONDS),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Query cache read failed: %s", e)
+        return None
+    if row is None:
+        return None
+    vector = array("f")
+    vector.frombytes(row[0])
+    return vector.tolist(), row[1]
+
+
+def _disk_put(key: str, vector: List[float], now: float):
+    global _writes_since_prune
+    try:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO query_embeddings (key, vector, stored_at) VALUES (?, ?, ?)",
+            (key, array("f", vector).tobytes(), now),
+        )
+        with _lock:
+            _writes_since_prune += 1
+            due = _writes_since_prune >= _PRUNE_EVERY
+            if due:
+                _writes_since_prune = 0
+        if due:
+            conn.execute(
+                "DELETE FROM query_embeddings WHERE stored_at <= ?", (now - config.QUERY_CACHE_TTL_SECONDS,),
+            )
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Query cache write failed: %s", e)
+
+
+def _remember(key: str, vector: List[float], stored_at: float):
+    """Insert into the in-process LRU (caller holds _lock)."""
+    _memory[key] = (vector, stored_at)
+    _memory.move_to_end(key)
+    while len(_memory) > config.QUERY_CACHE_SIZE:
+        _memory.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def get(text: str, dimensions: int) -> Optional[List[float]]:
+    """Cached vector for a (normalized) query at the given dimensions, or None."""
+    key = _key(text, dimensions)
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if now - entry[1] < config.QUERY_CACHE_TTL_SECONDS:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return entry[0]
+            del _memory[key]
+            _stats["expired"] += 1
+
+    entry = _disk_get(key, now) if config.QUERY_CACHE_PATH else None
+    with _lock:
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _stats["disk_hits"] += 1
+        _remember(key, *entry)
+    return entry[0]
+
+
+def put(text: str, dimensions: int, vector: List[float]):
+    """Store a freshly embedded query vector in both tiers."""
+    key = _key(text, dimensions)
+    now = time.time()
+    with _lock:
+        _remember(key, vector, now)
+        _stats["writes"] += 1
+    if config.QUERY_CACHE_PATH:
+        _disk_put(key, vector, now)
+
+
+def stats() -> Dict:
+    """Hit/miss counters for this process, in-process entry count, shared tier size."""
+    with _lock:
+        result = dict(_stats)
+        result["entries"] = len(_memory)
+    hits = result["memory_hits"] + result["disk_hits"]
+    lookups = hits + result["misses"]
+    result["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+    result["enabled"] = config.QUERY_CACHE_ENABLED
+    result["capacity"] = config.QUERY_CACHE_SIZE
+    result["ttl_seconds"] = config.QUERY_CACHE_TTL_SECONDS
+    result["shared"] = bool(config.QUERY_CACHE_PATH)
+    if config.QUERY_CACHE_PATH:
+        try:
+            result["shared_entries"] = _connect().execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning("Query cache stats failed: %s", e)
+    return result
@@ -3,15 +3,32 @@ Hybrid search: vector (OpenSearch kNN) + keyword (OpenSearch BM25) with Reciproc
 Includes metadata pre-filtering and confidence scoring.
 """
 import re
+import math
+import time
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 
 import config
 import indexer
+import keyword_matcher
 
 logger = logging.getLogger(__name__)
 
+# Threads for work that overlaps a query's OpenSearch calls (e.g. the full-size embedding)
+_query_pool: Optional[ThreadPoolExecutor] = None
+_query_pool_lock = threading.Lock()
+
+
+def _get_query_pool() -> ThreadPoolExecutor:
+    global _query_pool
+    with _query_pool_lock:
+        if _query_pool is None:
+            _query_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieve")
+    return _query_pool
+
 
 # ── Metadata filter extraction ──────────────────────────────────────────────
 
@@ -29,26 +46,14 @@ def _extract_metadata_filters(query: str) -> Dict:
         filters["year"] = year_match.group(1)
 
     # Doc type detection
-    if any(kw in q_lower for kw in ("case study", "case studies", "case-study", "success story", "success stories")):
-        filters["doc_type"] = "case_study"
-    elif any(kw in q_lower for kw in ("whitepaper", "white paper", "whitepapers", "white papers")):
-        filters["doc_type"] = "whitepaper"
-    elif any(kw in q_lower for kw in ("proposal", "proposals")):
-        filters["doc_type"] = "proposal"
-    elif any(kw in q_lower for kw in ("pitch", "deck", "pitch deck")):
-        filters["doc_type"] = "pitch_deck"
-    elif any(kw in q_lower for kw in ("service presentation", "offerings", "service overview")):
-        filters["doc_type"] = "service_presentation"
+    doc_type = keyword_matcher.QUERY_DOC_TYPE_MATCHER.first(q_lower)
+    if doc_type:
+        filters["doc_type"] = doc_type
 
     # Region detection
-    from chunker import REGION_KEYWORDS
-    for region, keywords in REGION_KEYWORDS.items():
-        for kw in keywords:
-            if kw in q_lower:
-                filters["region"] = region
-                break
-        if "region" in filters:
-            break
+    region = keyword_matcher.REGION_MATCHER.first(q_lower)
+    if region:
+        filters["region"] = region
 
     return filters
 
@@ -71,45 +76,82 @@ def _build_opensearch_filter(filters: Dict) -> Optional[Dict]:
     return {"bool": {"must": conditions}}
 
 
+# Stored fields returned with every hit: what the prompt and citations need, so
+# results can be assembled from the search responses without a separate fetch
+_RESULT_FIELDS = ["chunk_id", "text", "filename", "doc_type", "year", "page", "regions", "drive_link", "sources"]
+
+
 # ── Vector search ───────────────────────────────────────────────────────────
 
-def _vector_search(query: str, os_filter: Optional[Dict], top_k: int) -> List[Tuple[str, float]]:
+def _query_vectors(query: str) -> Tuple[List[float], Optional[Future]]:
     """
-    OpenSearch kNN search. Returns list of (chunk_id, similarity_score).
-    Cosinesimil scores are already in [0, 1] range.
+    The kNN query vector, plus (two-tier mode) a future for the full-size query
+    embedding, which is only needed for rescoring and is fetched meanwhile.
     """
-    client = indexer.get_collection()
-    if client is None:
-        return []
+    full_vector = _get_query_pool().submit(indexer.embed_query, query) if indexer.two_tier() else None
+    return indexer.quantize_vector(indexer.embed_query(query, indexer.search_dimensions())), full_vector
 
-    query_vector = indexer.embed_query(query)
+
+def _knn_body(query_vector: List[float], os_filter: Optional[Dict], top_k: int,
+              ef_search: Optional[int] = None) -> Dict:
+    """
+    kNN request body. The graph is searched for top_k × config.KNN_OVERSAMPLE
+    neighbours (better recall on quantized or filtered indexes); ef_search (default
+    config.KNN_EF_SEARCH) widens the HNSW candidate list. In two-tier mode enough
+    candidates for rescoring are fetched, with their full-size vectors.
+    """
+    two_tier = indexer.two_tier()
+    k = max(top_k, math.ceil(top_k * config.KNN_OVERSAMPLE))
+    if two_tier:
+        k = max(k, config.EMBEDDING_RESCORE_CANDIDATES)
 
     knn_body = {
-        "size": top_k,
+        "size": k,
         "query": {
             "knn": {
                 "embedding": {
                     "vector": query_vector,
-                    "k": top_k,
+                    "k": k,
                 }
             }
         },
-        "_source": ["chunk_id"],
+        "_source": _RESULT_FIELDS + ["embedding_full"] if two_tier else _RESULT_FIELDS,
     }
 
+    ef_search = ef_search or config.KNN_EF_SEARCH
+    if ef_search > 0:
+        knn_body["query"]["knn"]["embedding"]["method_parameters"] = {"ef_search": max(ef_search, k)}
+
     # Add filter if present
     if os_filter:
         knn_body["query"]["knn"]["embedding"]["filter"] = os_filter
 
+    return knn_body
+
+
+def _knn_hits(query_vector: List[float], os_filter: Optional[Dict], top_k: int,
+              ef_search: Optional[int] = None) -> List[Dict]:
+    """Raw kNN hits for a query vector (see _knn_body). Callers check the index first."""
+    client = indexer.get_search_client()
     try:
-        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=knn_body)
+        results = client.search(
+            index=config.OPENSEARCH_INDEX_NAME, body=_knn_body(query_vector, os_filter, top_k, ef_search),
+        )
     except Exception as e:
         logger.warning("OpenSearch kNN query with filter failed (%s), retrying without filter", e)
-        knn_body["query"]["knn"]["embedding"].pop("filter", None)
-        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=knn_body)
+        results = client.search(
+            index=config.OPENSEARCH_INDEX_NAME, body=_knn_body(query_vector, None, top_k, ef_search),
+        )
+    return results["hits"]["hits"]
+
+
+def _score_hits(hits: List[Dict], top_k: int, full_vector: Optional[List[float]] = None) -> List[Tuple[str, float]]:
+    """(chunk_id, similarity) for the best top_k hits; rescored when full_vector is given."""
+    if full_vector is not None:
+        return _rescore(full_vector, hits, top_k)
 
     scored = []
-    for hit in results["hits"]["hits"]:
+    for hit in hits[:top_k]:
         chunk_id = hit["_source"]["chunk_id"]
         score = hit["_score"]  # cosinesimil: higher is more similar
         scored.append((chunk_id, score))
@@ -117,20 +159,32 @@ def _vector_search(query: str, os_filter: Optional[Dict], top_k: int) -> List[Tu
     return scored
 
 
-# ── BM25 search ─────────────────────────────────────────────────────────────
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
 
-def _bm25_search(query: str, os_filter: Optional[Dict], top_k: int) -> List[Tuple[str, float]]:
+
+def _rescore(query_vector: List[float], hits: List[Dict], top_k: int) -> List[Tuple[str, float]]:
     """
-    OpenSearch BM25 keyword search on the 'text' field.
-    Scores are normalized to [0, 1] range.
+    Exact full-dimension similarity for kNN candidates, on the same [0, 1] scale as
+    OpenSearch cosinesimil scores ((1 + cos) / 2), so confidence thresholds still apply.
     """
-    client = indexer.get_collection()
-    if client is None:
-        return []
+    scored = []
+    for hit in hits:
+        full = hit["_source"].get("embedding_full")
+        score = (1 + _cosine(query_vector, full)) / 2 if full else hit["_score"]
+        scored.append((hit["_source"]["chunk_id"], score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:top_k]
+
 
-    # Build query body
+# ── BM25 search ─────────────────────────────────────────────────────────────
+
+def _bm25_body(query: str, os_filter: Optional[Dict], top_k: int) -> Dict:
+    """BM25 request body on the 'text' field, with the metadata filter if any."""
     if os_filter:
-        search_body = {
+        return {
             "size": top_k,
             "query": {
                 "bool": {
@@ -138,33 +192,33 @@ def _bm25_search(query: str, os_filter: Optional[Dict], top_k: int) -> List[Tupl
                     "filter": os_filter if isinstance(os_filter, list) else [os_filter],
                 }
             },
-            "_source": ["chunk_id"],
-        }
-    else:
-        search_body = {
-            "size": top_k,
-            "query": {
-                "match": {"text": query}
-            },
-            "_source": ["chunk_id"],
+            "_source": _RESULT_FIELDS,
         }
+    return {
+        "size": top_k,
+        "query": {
+            "match": {"text": query}
+        },
+        "_source": _RESULT_FIELDS,
+    }
 
+
+def _bm25_hits(query: str, os_filter: Optional[Dict], top_k: int) -> List[Dict]:
+    """Raw BM25 hits (see _bm25_body). Callers check the index first."""
+    client = indexer.get_search_client()
     try:
-        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=search_body)
+        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=_bm25_body(query, os_filter, top_k))
     except Exception as e:
         logger.warning("OpenSearch BM25 query failed (%s), retrying without filter", e)
-        search_body = {
-            "size": top_k,
-            "query": {"match": {"text": query}},
-            "_source": ["chunk_id"],
-        }
-        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=search_body)
+        results = client.search(index=config.OPENSEARCH_INDEX_NAME, body=_bm25_body(query, None, top_k))
+    return results["hits"]["hits"]
 
-    hits = results["hits"]["hits"]
+
+def _bm25_scores(hits: List[Dict]) -> List[Tuple[str, float]]:
+    """(chunk_id, score) with scores normalized to [0, 1] range."""
     if not hits:
         return []
 
-    # Normalize scores to [0, 1]
     max_score = hits[0]["_score"] if hits[0]["_score"] > 0 else 1.0
     scored = []
     for hit in hits:
@@ -197,9 +251,150 @@ def _reciprocal_rank_fusion(
     return merged
 
 
+# ── Search strategies ───────────────────────────────────────────────────────
+# Both return (vector_results, bm25_results, {chunk_id: _source}) where the sources
+# come straight from the hits.
+
+_SearchResult = Tuple[List[Tuple[str, float]], List[Tuple[str, float]], Dict[str, Dict]]
+
+
+def _finish(knn_hits: List[Dict], bm25_hits: List[Dict], full_vector: Optional[Future]) -> _SearchResult:
+    full = full_vector.result() if full_vector else None
+    docs = {hit["_source"]["chunk_id"]: hit["_source"] for hit in knn_hits + bm25_hits}
+    return _score_hits(knn_hits, config.VECTOR_TOP_K, full), _bm25_scores(bm25_hits), docs
+
+
+def _index_missing(error) -> bool:
+    kind = error.get("type", "") if isinstance(error, dict) else str(error)
+    return "index_not_found" in kind
+
+
+def _msearch_responses(client, bodies: List[Dict]) -> List[Dict]:
+    request = [line for body in bodies for line in ({}, body)]
+    return client.msearch(index=config.OPENSEARCH_INDEX_NAME, body=request)["responses"]
+
+
+def _response_hits(response: Dict, label: str, filtered: bool) -> Optional[List[Dict]]:
+    """Hits of one _msearch response; None when a filtered search failed (retry it unfiltered)."""
+    error = response.get("error")
+    if error and _index_missing(error):
+        return []
+    if error and filtered:
+        logger.warning("OpenSearch %s query with filter failed (%s), using unfiltered results", label, error)
+        return None
+    if error:
+        raise RuntimeError(f"OpenSearch {label} query failed: {error}")
+    return response["hits"]["hits"]
+
+
+def _msearch(query: str, os_filter: Optional[Dict], ef_search: Optional[int] = None) -> _SearchResult:
+    """
+    One _msearch round trip after the query is embedded: filtered kNN and BM25.
+    Only when the filter is too narrow (both legs empty) or a filtered leg errors
+    does a second _msearch run the unfiltered counterparts. A missing index
+    (reported per search, not as a failed request) gives no results, like
+    get_collection() returning None on the fan-out path. Falls back to _fan_out
+    if an _msearch request itself fails. No count check.
+    """
+    client = indexer.get_search_client()
+    query_vector, full_vector = _query_vectors(query)
+    labels = ["kNN", "BM25"]
+    bodies = [
+        _knn_body(query_vector, os_filter, config.VECTOR_TOP_K, ef_search),
+        _bm25_body(query, os_filter, config.BM25_TOP_K),
+    ]
+
+    started = time.perf_counter()
+    try:
+        responses = _msearch_responses(client, bodies)
+    except Exception as e:
+        logger.warning("OpenSearch _msearch failed (%s), running the searches separately", e)
+        return _fan_out(query, os_filter, ef_search)
+    if any(_index_missing(r["error"]) for r in responses if r.get("error")):
+        return [], [], {}
+    results = [_response_hits(r, label, bool(os_filter)) for r, label in zip(responses, labels)]
+
+    if os_filter and not any(results):
+        logger.info("Filtered search returned 0 results, retrying without filters")
+        retry = [0, 1]
+    else:
+        retry = [i for i, hits in enumerate(results) if hits is None]
+    if retry:
+        unfiltered = [
+            _knn_body(query_vector, None, config.VECTOR_TOP_K, ef_search),
+            _bm25_body(query, None, config.BM25_TOP_K),
+        ]
+        try:
+            responses = _msearch_responses(client, [unfiltered[i] for i in retry])
+        except Exception as e:
+            logger.warning("OpenSearch _msearch failed (%s), running the searches separately", e)
+            return _fan_out(query, os_filter, ef_search)
+        for i, response in zip(retry, responses):
+            results[i] = _response_hits(response, labels[i], False)
+    logger.debug(
+        "Retrieval _msearch: %d requests, %.0f ms", 2 if retry else 1, (time.perf_counter() - started) * 1000,
+    )
+    return _finish(results[0], results[1], full_vector)
+
+
+def _fan_out(query: str, os_filter: Optional[Dict], ef_search: Optional[int] = None) -> _SearchResult:
+    """
+    Separate searches, with independent calls overlapped:
+
+        BM25 (filtered) ─────────────────────────────┐
+        embed query ──> kNN (filtered) ──────────────┼─> results
+        [unfiltered BM25 + kNN, started speculatively]┘
+
+    BM25 runs while the query is being embedded. The unfiltered fallback (used
+    only when both filtered legs come back empty) starts as soon as one filtered
+    leg is empty, or right away with config.RETRIEVE_EAGER_FALLBACK. Pool tasks
+    never wait on each other: embedding and rescoring happen on this thread.
+    """
+    if indexer.get_collection() is None:
+        return [], [], {}
+
+    pool = _get_query_pool()
+    started = time.perf_counter()
+    bm25 = pool.submit(_bm25_hits, query, os_filter, config.BM25_TOP_K)
+    fallback: Dict[str, Future] = {}
+
+    def start_fallback(query_vector: Optional[List[float]]):
+        if not os_filter:
+            return
+        if "bm25" not in fallback:
+            fallback["bm25"] = pool.submit(_bm25_hits, query, None, config.BM25_TOP_K)
+        if query_vector is not None and "knn" not in fallback:
+            fallback["knn"] = pool.submit(_knn_hits, query_vector, None, config.VECTOR_TOP_K, ef_search)
+
+    if config.RETRIEVE_EAGER_FALLBACK:
+        start_fallback(None)
+
+    query_vector, full_vector = _query_vectors(query)
+    embedded = time.perf_counter()
+    knn = pool.submit(_knn_hits, query_vector, os_filter, config.VECTOR_TOP_K, ef_search)
+    if config.RETRIEVE_EAGER_FALLBACK or (bm25.done() and not bm25.result()):
+        start_fallback(query_vector)
+
+    bm25_hits = bm25.result()
+    if not bm25_hits:
+        start_fallback(query_vector)
+    knn_hits = knn.result()
+
+    if not knn_hits and not bm25_hits and os_filter:
+        logger.info("Filtered search returned 0 results, retrying without filters")
+        start_fallback(query_vector)
+        knn_hits, bm25_hits = fallback["knn"].result(), fallback["bm25"].result()
+
+    logger.debug(
+        "Retrieval fan-out: embed %.0f ms, total %.0f ms, fallback legs %d",
+        (embedded - started) * 1000, (time.perf_counter() - started) * 1000, len(fallback),
+    )
+    return _finish(knn_hits, bm25_hits, full_vector)
+
+
 # ── Main retrieval function ─────────────────────────────────────────────────
 
-def retrieve(query: str, top_k: int = config.FINAL_TOP_K) -> List[Dict]:
+def retrieve(query: str, top_k: int = config.FINAL_TOP_K, ef_search: Optional[int] = None) -> List[Dict]:
     """
     Full hybrid retrieval pipeline:
     1. Extract metadata filters from query
@@ -208,6 +403,10 @@ def retrieve(query: str, top_k: int = config.FINAL_TOP_K) -> List[Dict]:
     4. RRF fusion
     5. Return top-k results with full metadata
 
+    Steps 2-3 go out as one _msearch (config.RETRIEVE_MSEARCH) or as concurrent
+    searches; either way the hits carry the stored fields, so no fetch follows.
+    ef_search overrides config.KNN_EF_SEARCH for this query's kNN searches.
+
     Returns list of dicts with: chunk_id, chunk_text, filename, doc_type,
     year, page, relevance_score, drive_link, regions
     """
@@ -216,17 +415,9 @@ def retrieve(query: str, top_k: int = config.FINAL_TOP_K) -> List[Dict]:
     os_filter = _build_opensearch_filter(filters)
     logger.info("Query filters: %s", filters)
 
-    # Step 2: vector search
-    vector_results = _vector_search(query, os_filter, config.VECTOR_TOP_K)
-
-    # Step 3: BM25 search
-    bm25_results = _bm25_search(query, os_filter, config.BM25_TOP_K)
-
-    # Fallback: if filters returned nothing, retry without filters
-    if not vector_results and not bm25_results and os_filter:
-        logger.info("Filtered search returned 0 results, retrying without filters")
-        vector_results = _vector_search(query, None, config.VECTOR_TOP_K)
-        bm25_results = _bm25_search(query, None, config.BM25_TOP_K)
+    # Steps 2-3: vector + BM25 search
+    search = _msearch if config.RETRIEVE_MSEARCH else _fan_out
+    vector_results, bm25_results, docs = search(query, os_filter, ef_search)
 
     # Step 4: RRF fusion
     fused = _reciprocal_rank_fusion(vector_results, bm25_results)
@@ -234,40 +425,10 @@ def retrieve(query: str, top_k: int = config.FINAL_TOP_K) -> List[Dict]:
     # Build score lookup from vector results for confidence
     vector_score_map = {cid: score for cid, score in vector_results}
 
-    # Fetch full documents for the fused top-k chunk IDs
-    client = indexer.get_collection()
-    if client is None:
-        return []
-
-    # Get top candidate IDs
-    top_ids = [cid for cid, _ in fused[:top_k * 2]]  # fetch extra in case some miss
-
-    # Batch fetch from OpenSearch using terms query on chunk_id field
-    results = []
-    doc_map = {}
-    if top_ids:
-        try:
-            fetch_response = client.search(
-                index=config.OPENSEARCH_INDEX_NAME,
-                body={
-                    "query": {"terms": {"chunk_id": top_ids}},
-                    "_source": {"excludes": ["embedding"]},
-                    "size": len(top_ids),
-                },
-            )
-            for hit in fetch_response["hits"]["hits"]:
-                src = hit["_source"]
-                doc_map[src["chunk_id"]] = src
-        except Exception as e:
-            logger.warning("Batch fetch failed: %s", e)
-            doc_map = {}
-
     # Step 5: assemble top-k results
+    results = []
     for chunk_id, rrf_score in fused[:top_k]:
-        src = doc_map.get(chunk_id)
-        if not src:
-            continue
-
+        src = docs[chunk_id]
         vec_score = vector_score_map.get(chunk_id, 0.0)
 
         results.append({
@@ -280,13 +441,27 @@ def retrieve(query: str, top_k: int = config.FINAL_TOP_K) -> List[Dict]:
             "regions": src.get("regions", []),
             "relevance_score": round(vec_score, 4),
             "rrf_score": round(rrf_score, 4),
-            "drive_link": indexer.get_drive_link(src["filename"]),
+            "drive_link": src.get("drive_link") or None,
+            "sources": _sources(src),
         })
 
     logger.info("Retrieved %d chunks for query (filters=%s)", len(results), filters)
     return results
 
 
+def _sources(src: Dict) -> List[Dict]:
+    """Every (filename, page) the chunk's text appears at (more than one when deduplicated)."""
+    sources = src.get("sources") or [{"filename": src["filename"], "page": src.get("page", 0)}]
+    return [
+        {
+            "filename": s["filename"],
+            "page": s.get("page", 0),
+            "drive_link": s.get("drive_link") or None,
+        }
+        for s in sources
+    ]
+
+
 def compute_confidence(results: List[Dict]) -> Tuple[str, float]:
     """
     Compute confidence level from top-3 retrieval scores.
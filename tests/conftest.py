@@ -0,0 +1,52 @@
+"""
+Shared fixtures: the flat modules are imported from the repo root, every test
+gets its own state dir, and AWS / Drive are replaced by the in-process fakes.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+import drive_connector  # noqa: E402
+import fake_aws  # noqa: E402
+import fake_drive  # noqa: E402
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Manifest, sync state and downloads under tmp_path; caches off so runs are independent."""
+    state = tmp_path / "state"
+    monkeypatch.setattr(config, "MANIFEST_PATH", str(state / "manifest.json"))
+    monkeypatch.setattr(config, "DRIVE_SYNC_STATE_PATH", str(state / "drive_sync.json"))
+    monkeypatch.setattr(config, "DOWNLOAD_TMP_DIR", str(state / "downloads"))
+    monkeypatch.setattr(config, "EMBED_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "EXTRACT_CACHE_ENABLED", False)
+    return state
+
+
+@pytest.fixture
+def drive(state_dir, monkeypatch):
+    """A FakeDriveService with one root folder ("Sales") configured as the only Drive folder."""
+    service = fake_drive.FakeDriveService()
+    root = service.add_folder("Sales")
+    service.root = root
+    monkeypatch.setattr(config, "GOOGLE_DRIVE_FOLDER_IDS", [root])
+    monkeypatch.setattr(config, "DRIVE_DELTA_SYNC", True)
+    drive_connector.use_service(service)
+    yield service
+    drive_connector.use_service(None)
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """fake_aws stand-ins for Bedrock and OpenSearch (no latency)."""
+    import indexer
+
+    opensearch = fake_aws.FakeOpenSearch()
+    bedrock = fake_aws.FakeBedrockRuntime(latency_ms=0)
+    monkeypatch.setattr(indexer, "_opensearch_client", opensearch)
+    monkeypatch.setattr(indexer, "_bedrock_client", bedrock)
+    return opensearch, bedrock
@@ -0,0 +1,145 @@
+import config
+import drive_connector
+
+PDF = "application/pdf"
+
+
+def _names(files):
+    return sorted(f["name"] for f in files)
+
+
+def test_crawl_lists_nested_supported_files(drive):
+    sub = drive.add_folder("2023", drive.root)
+    deeper = drive.add_folder("Chennai", sub)
+    drive.add_file("Deck.pdf", drive.root)
+    drive.add_file("Case Study.pdf", sub)
+    drive.add_file("Proposal", deeper, mime_type="application/vnd.google-apps.document")
+    drive.add_file("notes.txt", sub, mime_type="text/plain")
+    trashed = drive.add_file("Old.pdf", sub)
+    drive.trash(trashed)
+
+    folders = set()
+    files = drive_connector.crawl_folders([drive.root], folders)
+
+    assert _names(files) == ["Case Study.pdf", "Deck.pdf", "Proposal.docx"]
+    assert folders == {drive.root, sub, deeper}
+
+
+def test_crawl_skips_inaccessible_root(drive):
+    drive.add_file("Deck.pdf", drive.root)
+    assert _names(drive_connector.crawl_folders([drive.root, "missing-folder"])) == ["Deck.pdf"]
+
+
+def test_crawl_returns_files_in_several_folders_once(drive):
+    other = drive.add_folder("Shared")
+    file_id = drive.add_file("Deck.pdf", drive.root)
+    drive.items[file_id]["parents"].append(other)
+
+    files = drive_connector.crawl_folders([drive.root, other])
+    assert [f["id"] for f in files] == [file_id]
+
+
+def test_first_sync_crawls_then_uses_changes(drive):
+    drive.add_file("Deck.pdf", drive.root)
+    assert _names(drive_connector.sync_files()) == ["Deck.pdf"]
+    assert drive.calls["files.list"] == 1
+
+    drive.add_file("Proposal.pdf", drive.root)
+    assert _names(drive_connector.sync_files()) == ["Deck.pdf", "Proposal.pdf"]
+    assert drive.calls["files.list"] == 1  # no second crawl
+    assert drive.calls["changes.list"] == 1
+
+
+def test_sync_applies_modify_rename_and_trash(drive):
+    deck = drive.add_file("Deck.pdf", drive.root, content=b"v1")
+    old = drive.add_file("Old.pdf", drive.root)
+    drive_connector.sync_files()
+
+    drive.update_file(deck, content=b"version 2", name="Deck v2.pdf")
+    drive.trash(old)
+    files = drive_connector.sync_files()
+
+    assert _names(files) == ["Deck v2.pdf"]
+    assert files[0]["size"] == str(len(b"version 2"))
+    assert files[0]["modifiedTime"] == drive.items[deck]["modifiedTime"]
+
+
+def test_sync_drops_file_moved_out_of_tree(drive):
+    outside = drive.add_folder("Personal")
+    deck = drive.add_file("Deck.pdf", drive.root)
+    drive_connector.sync_files()
+
+    drive.move(deck, outside)
+    assert drive_connector.sync_files() == []
+
+
+def test_sync_crawls_folder_moved_into_tree(drive):
+    outside = drive.add_folder("Archive")
+    drive.add_file("Archived.pdf", outside)
+    drive_connector.sync_files()
+
+    drive.move(outside, drive.root)
+    assert _names(drive_connector.sync_files()) == ["Archived.pdf"]
+
+
+def test_sync_recrawls_when_a_known_folder_is_trashed(drive):
+    sub = drive.add_folder("2023", drive.root)
+    drive.add_file("Deck.pdf", sub)
+    drive.add_file("Top.pdf", drive.root)
+    drive_connector.sync_files()
+    crawls = drive.calls["files.list"]
+
+    drive.trash(sub)
+    assert _names(drive_connector.sync_files()) == ["Top.pdf"]
+    assert drive.calls["files.list"] > crawls
+
+
+def test_apply_changes_ignores_unsupported_and_out_of_scope_files(drive):
+    state = {"roots": [drive.root], "folders": [drive.root], "files": {}}
+    changes = [
+        {"fileId": "a", "file": {"id": "a", "name": "a.txt", "mimeType": "text/plain", "parents": [drive.root]}},
+        {"fileId": "b", "file": {"id": "b", "name": "b.pdf", "mimeType": PDF, "parents": ["elsewhere"]}},
+        {"fileId": "c", "file": {"id": "c", "name": "c.pdf", "mimeType": PDF, "parents": [drive.root],
+                                 "modifiedTime": "2024-01-01T00:00:00Z", "trashed": False}},
+    ]
+    assert drive_connector._apply_changes(state, changes)
+    assert list(state["files"]) == ["c"]
+    assert state["files"]["c"]["name"] == "c.pdf"
+
+
+def test_apply_changes_removed_known_folder_needs_crawl(drive):
+    sub = drive.add_folder("2023", drive.root)
+    state = {"roots": [drive.root], "folders": [drive.root, sub], "files": {}}
+    assert not drive_connector._apply_changes(state, [{"fileId": sub, "removed": True}])
+
+
+def test_sync_resumes_from_saved_page_token(drive, monkeypatch):
+    monkeypatch.setattr(config, "DRIVE_PAGE_SIZE", 2)  # several changes.list pages per sync
+    drive.add_file("Deck.pdf", drive.root)
+    drive_connector.sync_files()
+    token = drive_connector._load_sync_state()["page_token"]
+
+    for n in range(5):
+        drive.add_file(f"New {n}.pdf", drive.root)
+    files = drive_connector.sync_files()
+    state = drive_connector._load_sync_state()
+
+    assert len(files) == 6
+    assert int(state["page_token"]) > int(token)
+    assert drive.calls["changes.list"] == 3  # 5 changes, 2 per page
+
+    # Nothing changed since the stored token: one empty page, same listing
+    assert _names(drive_connector.sync_files()) == _names(files)
+    assert drive.calls["changes.list"] == 4
+    assert drive.calls["files.list"] == 1
+
+
+def test_changed_roots_force_a_crawl(drive, monkeypatch):
+    drive.add_file("Deck.pdf", drive.root)
+    drive_connector.sync_files()
+    other = drive.add_folder("Marketing")
+    drive.add_file("Brochure.pdf", other)
+
+    monkeypatch.setattr(config, "GOOGLE_DRIVE_FOLDER_IDS", [drive.root, other])
+    assert _names(drive_connector.sync_files()) == ["Brochure.pdf", "Deck.pdf"]
+    assert drive_connector._load_sync_state()["roots"] == [drive.root, other]
@@ -0,0 +1,198 @@
+import os
+
+import pytest
+from docx import Document as DocxDocument
+
+import config
+import extractor
+import indexer
+import ingestion
+import manifest as manifest_store
+
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _docx_bytes(path, paragraphs):
+    doc = DocxDocument()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(path)
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+def _paragraphs(label, count=30):
+    return [f"{label} delivery programme {n}. Plant automation rollout in Chennai, phase {n}." for n in range(count)]
+
+
+@pytest.fixture
+def docs(tmp_path, state_dir, aws, monkeypatch):
+    """local_docs/ under tmp_path, ingested inline (no process pool) against fake_aws."""
+    docs_dir = tmp_path / "local_docs"
+    docs_dir.mkdir()
+    monkeypatch.setattr(config, "LOCAL_DOCS_DIR", str(docs_dir))
+    monkeypatch.setattr(config, "GOOGLE_DRIVE_FOLDER_IDS", [])
+    monkeypatch.setattr(config, "INGEST_PROCESS_WORKERS", 0)
+    monkeypatch.setattr(config, "DEDUP_ENABLED", False)
+
+    def write(name, paragraphs):
+        path = docs_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _docx_bytes(str(path), paragraphs)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # always a new modifiedTime
+
+    write.dir = docs_dir
+    return write
+
+
+def _indexed(file_id):
+    return sorted(indexer.document_chunk_ids(file_id))
+
+
+def test_incremental_run_skips_unchanged_files(docs, aws):
+    opensearch, bedrock = aws
+    docs("Case Study A 2023.docx", _paragraphs("Alpha"))
+    docs("Proposal B 2024.docx", _paragraphs("Beta"))
+
+    first = ingestion.run_ingestion(full=True)
+    assert first["status"] == "success"
+    assert first["changes"]["added"] == 2
+    assert first["total_chunks"] == opensearch.count(config.OPENSEARCH_INDEX_NAME)["count"] > 0
+    assert [s["stage"] for s in first["stages"]] == ["download", "extract", "chunk", "dedup", "embed", "index"]
+    embed_calls, bulks = bedrock.calls, opensearch.calls["bulk"]
+
+    second = ingestion.run_ingestion()
+    assert second["changes"]["unchanged"] == 2
+    assert second["changes"]["reindexed_chunks"] == 0
+    assert bedrock.calls == embed_calls
+    assert opensearch.calls["bulk"] == bulks
+
+
+def test_touched_file_with_same_content_is_not_reembedded(docs, aws):
+    _, bedrock = aws
+    docs("Case Study A 2023.docx", _paragraphs("Alpha"))
+    ingestion.run_ingestion(full=True)
+    path = docs.dir / "Case Study A 2023.docx"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    embed_calls = bedrock.calls
+
+    result = ingestion.run_ingestion()
+
+    assert result["changes"]["modified"] == 1
+    assert result["details"][0]["status"] == "unchanged"
+    assert bedrock.calls == embed_calls
+
+
+def test_modified_file_replaces_only_its_chunks(docs):
+    docs("Case Study A 2023.docx", _paragraphs("Alpha", 60))
+    docs("Proposal B 2024.docx", _paragraphs("Beta"))
+    ingestion.run_ingestion(full=True)
+    before_a, before_b = _indexed("Case Study A 2023.docx"), _indexed("Proposal B 2024.docx")
+
+    docs("Case Study A 2023.docx", _paragraphs("Alpha v2", 5))
+    result = ingestion.run_ingestion()
+
+    after_a = _indexed("Case Study A 2023.docx")
+    assert result["changes"]["modified"] == 1
+    assert result["changes"]["deleted_chunks"] == len(set(before_a) - set(after_a)) > 0
+    assert len(after_a) < len(before_a)
+    assert _indexed("Proposal B 2024.docx") == before_b
+    assert manifest_store.load_manifest()["files"]["Case Study A 2023.docx"]["chunk_ids"] == after_a
+
+
+def test_removed_file_is_deleted_from_index(docs):
+    docs("Case Study A 2023.docx", _paragraphs("Alpha"))
+    docs("Proposal B 2024.docx", _paragraphs("Beta"))
+    ingestion.run_ingestion(full=True)
+
+    os.remove(docs.dir / "Proposal B 2024.docx")
+    result = ingestion.run_ingestion()
+
+    assert result["changes"]["removed"] == 1
+    assert _indexed("Proposal B 2024.docx") == []
+    assert _indexed("Case Study A 2023.docx")
+    assert "Proposal B 2024.docx" not in manifest_store.load_manifest()["files"]
+
+
+def test_same_name_in_two_folders_are_separate_documents(docs):
+    docs("east/Case Study 2023.docx", _paragraphs("East"))
+    docs("west/Case Study 2023.docx", _paragraphs("West"))
+    ingestion.run_ingestion(full=True)
+    east = _indexed("east/Case Study 2023.docx")
+
+    docs("west/Case Study 2023.docx", _paragraphs("West v2", 3))
+    ingestion.run_ingestion()
+
+    assert _indexed("east/Case Study 2023.docx") == east
+    assert not set(east) & set(_indexed("west/Case Study 2023.docx"))
+
+
+def test_failed_write_keeps_previous_version_and_retries(docs, aws, monkeypatch):
+    opensearch, _ = aws
+    docs("Case Study A 2023.docx", _paragraphs("Alpha"))
+    ingestion.run_ingestion(full=True)
+    live = indexer.current_generation()
+    before = dict(opensearch.docs[live])
+
+    docs("Case Study A 2023.docx", _paragraphs("Alpha v2", 10))
+
+    def bulk_down(*args, **kwargs):
+        raise RuntimeError("bulk down")
+
+    with monkeypatch.context() as m:
+        m.setattr(indexer, "bulk_index", bulk_down)
+        failed = ingestion.run_ingestion()
+    assert failed["details"][0]["status"] == "error: bulk down"
+    assert opensearch.docs[live] == before
+    assert manifest_store.load_manifest()["files"]["Case Study A 2023.docx"]["content_hash"] is None
+
+    retried = ingestion.run_ingestion()
+    assert retried["details"][0]["status"] == "indexed"
+    entry = manifest_store.load_manifest()["files"]["Case Study A 2023.docx"]
+    assert _indexed("Case Study A 2023.docx") == sorted(entry["chunk_ids"])
+
+
+def test_failed_forced_peer_is_rebuilt_next_run(docs, monkeypatch):
+    monkeypatch.setattr(config, "DEDUP_ENABLED", True)
+    docs("Case Study A 2023.docx", _paragraphs("Shared"))
+    docs("Case Study B 2023.docx", _paragraphs("Shared"))
+    ingestion.run_ingestion(full=True)
+    files = manifest_store.load_manifest()["files"]
+    assert files["Case Study A 2023.docx"]["peers"] == ["Case Study B 2023.docx"]
+    assert files["Case Study B 2023.docx"]["chunk_ids"] == []  # all folded into A's chunks
+
+    docs("Case Study A 2023.docx", _paragraphs("Alpha only", 5))
+    extract = extractor.extract_text
+
+    def fail_b(path, filename, *args, **kwargs):
+        if filename == "Case Study B 2023.docx":
+            raise RuntimeError("extract down")
+        return extract(path, filename, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(extractor, "extract_text", fail_b)
+        ingestion.run_ingestion()
+    # B's pages lived in A's old chunks, which are gone: B must not look unchanged
+    assert manifest_store.load_manifest()["files"]["Case Study B 2023.docx"]["content_hash"] is None
+
+    result = ingestion.run_ingestion()
+    assert result["changes"]["modified"] >= 1
+    assert _indexed("Case Study B 2023.docx")
+
+
+def test_drive_files_are_downloaded_and_cleaned_up(state_dir, aws, drive, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "INGEST_PROCESS_WORKERS", 0)
+    content = _docx_bytes(str(tmp_path / "deck.docx"), _paragraphs("Drive"))
+    file_id = drive.add_file("Case Study Drive 2023.docx", drive.root, mime_type=DOCX, content=content)
+
+    result = ingestion.run_ingestion(full=True)
+
+    assert result["details"][0]["status"] == "indexed"
+    assert _indexed(file_id)
+    assert drive.calls["files.media"] == 1
+    assert os.listdir(config.DOWNLOAD_TMP_DIR) == []
+
+    assert ingestion.run_ingestion()["changes"]["unchanged"] == 1
+    assert drive.calls["files.media"] == 1
@@ -0,0 +1,92 @@
+import manifest as manifest_store
+
+
+def _meta(file_id, name=None, modified="2024-01-01T00:00:00Z", size="100"):
+    return {"id": file_id, "name": name or f"{file_id}.pdf", "modifiedTime": modified, "size": size}
+
+
+def _manifest(*entries):
+    return {"version": manifest_store.MANIFEST_VERSION, "files": {e["file_id"]: e for e in entries}}
+
+
+def _entry(file_id, peers=(), **meta):
+    return manifest_store.make_entry(_meta(file_id, **meta), "hash", [f"{file_id}_p1_c0"], peers=list(peers))
+
+
+def _ids(files):
+    return sorted(f["id"] if "id" in f else f["file_id"] for f in files)
+
+
+def test_plan_changes_classifies_files():
+    manifest = _manifest(_entry("same"), _entry("touched"), _entry("renamed"), _entry("resized"), _entry("gone"))
+    files = [
+        _meta("same"),
+        _meta("touched", modified="2024-02-01T00:00:00Z"),
+        _meta("renamed", name="New name.pdf"),
+        _meta("resized", size="200"),
+        _meta("new"),
+    ]
+
+    plan = manifest_store.plan_changes(files, manifest)
+
+    assert _ids(plan["added"]) == ["new"]
+    assert _ids(plan["modified"]) == ["renamed", "resized", "touched"]
+    assert _ids(plan["unchanged"]) == ["same"]
+    assert _ids(plan["removed"]) == ["gone"]
+
+
+def test_plan_changes_invalidated_entry_is_modified():
+    entry = _entry("a")
+    manifest_store.invalidate(entry)
+
+    plan = manifest_store.plan_changes([_meta("a")], _manifest(entry))
+
+    assert _ids(plan["modified"]) == ["a"]
+    assert entry["chunk_ids"] == ["a_p1_c0"]  # kept for cleanup
+
+
+def test_plan_changes_without_modified_time_is_modified():
+    plan = manifest_store.plan_changes([_meta("a", modified=None)], _manifest(_entry("a", modified=None)))
+    assert _ids(plan["modified"]) == ["a"]
+
+
+def test_expand_peers_pulls_in_transitive_peers():
+    manifest = _manifest(
+        _entry("a", peers=["b"]), _entry("b", peers=["a", "c"]), _entry("c", peers=["b"]), _entry("d"),
+    )
+    files = [_meta("a", modified="2024-03-01T00:00:00Z"), _meta("b"), _meta("c"), _meta("d")]
+    plan = manifest_store.plan_changes(files, manifest)
+
+    forced = manifest_store.expand_peers(plan, manifest)
+
+    assert forced == {"b", "c"}
+    assert _ids(plan["modified"]) == ["a", "b", "c"]
+    assert _ids(plan["unchanged"]) == ["d"]
+
+
+def test_expand_peers_of_removed_file():
+    manifest = _manifest(_entry("gone", peers=["b"]), _entry("b", peers=["gone"]))
+    plan = manifest_store.plan_changes([_meta("b")], manifest)
+
+    assert manifest_store.expand_peers(plan, manifest) == {"b"}
+    assert _ids(plan["modified"]) == ["b"]
+
+
+def test_expand_peers_does_not_force_already_changed_files():
+    manifest = _manifest(_entry("a", peers=["b"]), _entry("b", peers=["a"]))
+    files = [_meta("a", size="1"), _meta("b", size="2")]
+    plan = manifest_store.plan_changes(files, manifest)
+
+    assert manifest_store.expand_peers(plan, manifest) == set()
+    assert _ids(plan["modified"]) == ["a", "b"]
+
+
+def test_manifest_round_trip_and_version_mismatch(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = _manifest(_entry("a"))
+    manifest_store.save_manifest(manifest, path)
+    assert manifest_store.load_manifest(path) == manifest
+
+    manifest["version"] = manifest_store.MANIFEST_VERSION - 1
+    manifest_store.save_manifest(manifest, path)
+    assert manifest_store.load_manifest(path)["files"] == {}
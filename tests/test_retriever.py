@@ -0,0 +1,66 @@
+import pytest
+
+import indexer
+import retriever
+
+FILTER = {"term": {"year": "2023"}}
+HIT = {
+    "_id": "c1",
+    "_score": 1.0,
+    "_source": {"chunk_id": "c1", "text": "x", "filename": "a.pdf", "doc_type": "Case Study",
+                "year": "2023", "page": 1, "regions": []},
+}
+
+
+def _ok(*hits):
+    return {"hits": {"hits": list(hits)}}
+
+
+class _MsearchClient:
+    """Answers each _msearch from a scripted list of responses and records how many searches it carried."""
+
+    def __init__(self, *rounds):
+        self.rounds = list(rounds)
+        self.sent = []
+
+    def msearch(self, index, body):
+        self.sent.append(list(body[1::2]))
+        return {"responses": self.rounds.pop(0)}
+
+
+@pytest.fixture
+def client(aws, monkeypatch):
+    def install(*rounds):
+        stub = _MsearchClient(*rounds)
+        monkeypatch.setattr(indexer, "get_search_client", lambda: stub)
+        return stub
+    return install
+
+
+def test_filtered_results_need_one_request(client):
+    stub = client([_ok(HIT), _ok()])
+    knn, bm25, docs = retriever._msearch("case studies 2023", FILTER)
+    assert len(stub.sent) == 1 and len(stub.sent[0]) == 2
+    assert list(docs) == ["c1"]
+
+
+def test_empty_filtered_results_fall_back_to_unfiltered(client):
+    stub = client([_ok(), _ok()], [_ok(HIT), _ok(HIT)])
+    _, _, docs = retriever._msearch("case studies 2019", FILTER)
+    assert [len(bodies) for bodies in stub.sent] == [2, 2]
+    assert "filter" not in str(stub.sent[1])
+    assert list(docs) == ["c1"]
+
+
+def test_failed_filtered_leg_is_retried_alone(client):
+    stub = client([{"error": {"type": "search_phase_execution_exception"}}, _ok(HIT)], [_ok(HIT)])
+    retriever._msearch("case studies 2023", FILTER)
+    assert [len(bodies) for bodies in stub.sent] == [2, 1]
+    assert "knn" in stub.sent[1][0]["query"]
+
+
+def test_missing_index_gives_no_results(client):
+    missing = {"error": {"type": "index_not_found_exception"}}
+    stub = client([missing, missing])
+    assert retriever._msearch("anything", FILTER) == ([], [], {})
+    assert len(stub.sent) == 1